@@ -0,0 +1,198 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+from typing import Hashable, Iterable, Optional
+import logging
+
+from api import models
+from api.config import settings
+from api.episodes import EpisodeIndex, episode_index
+
+
+logger = logging.getLogger("cache:catalog")
+
+
+@dataclass(frozen=True)
+class CachedShow:
+    id: int
+    name: str
+    description: str
+    gender: str
+    episodes: tuple[int, ...]
+
+    @property
+    def index(self) -> EpisodeIndex:
+        return episode_index(self.episodes)
+
+    @classmethod
+    def from_model(cls, show: models.Show) -> "CachedShow":
+        return cls(
+            id=show.id,
+            name=show.name,
+            description=show.description,
+            gender=show.gender,
+            episodes=tuple(show.episodes),
+        )
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "CachedShow":
+        """Builds it from a row of SHOW_COLUMNS, skipping the ORM entirely."""
+        id, name, description, gender, episodes = row
+        return cls(id, name, description, gender, tuple(episodes))
+
+
+SHOW_COLUMNS = (models.Show.id, models.Show.name, models.Show.description, models.Show.gender, models.Show.episodes)
+
+
+class ShowCatalogCache:
+    """
+    Bounded LRU cache for the (almost read-only) show catalog.
+
+    Holds single shows by id and materialized show lists (full catalog or pages).
+    Each entry weighs the number of shows it holds, and the least recently used
+    entries are evicted once the total weight goes over `max_size`.
+
+    `invalidate` only reaches this process. Catalog writes from elsewhere (another
+    worker, a catalog load) bump the version persisted in the database, and `sync`
+    drops every entry when it finds that version changed. The catalog routes sync on
+    every request (their ETag is that version); `get` and `get_many`, used by the
+    session routes, sync at most once every `sync_interval` seconds.
+    """
+
+    def __init__(self, max_size: int = 10_000, sync_interval: float = 1.0):
+        self.max_size = max_size
+        self.sync_interval = sync_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.version = 0
+        self.db_version: Optional[int] = None
+        self._synced_at = float("-inf")
+        self._entries: OrderedDict[Hashable, tuple[object, int]] = OrderedDict()
+        self._weight = 0
+        self._lock = Lock()
+
+    def _lookup(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _store(self, key: Hashable, value: object, weight: int, version: int):
+        if weight > self.max_size:
+            return
+        with self._lock:
+            if version != self.version:
+                # catalog changed while the value was being loaded
+                return
+            if key in self._entries:
+                self._weight -= self._entries.pop(key)[1]
+            self._entries[key] = (value, weight)
+            self._weight += weight
+            while self._weight > self.max_size:
+                _, (_, evicted_weight) = self._entries.popitem(last=False)
+                self._weight -= evicted_weight
+                self.evictions += 1
+
+    def _sync_if_due(self, db: Session):
+        if monotonic() - self._synced_at >= self.sync_interval:
+            self.sync(db)
+
+    def get(self, db: Session, show_id: int) -> Optional[CachedShow]:
+        self._sync_if_due(db)
+        key = ("show", show_id)
+        show = self._lookup(key)
+        if show is not None:
+            return show
+        version = self.version
+        db_show = db.get(models.Show, show_id)
+        if db_show is None:
+            return None
+        show = CachedShow.from_model(db_show)
+        self._store(key, show, 1, version)
+        return show
+
+    def get_many(self, db: Session, show_ids: Iterable[int]) -> dict[int, CachedShow]:
+        self._sync_if_due(db)
+        shows, missing = {}, []
+        for show_id in show_ids:
+            show = self._lookup(("show", show_id))
+            if show is None:
+                missing.append(show_id)
+            else:
+                shows[show_id] = show
+        if missing:
+            version = self.version
+            for db_show in db.query(models.Show).filter(models.Show.id.in_(missing)):
+                show = CachedShow.from_model(db_show)
+                self._store(("show", show.id), show, 1, version)
+                shows[show.id] = show
+        return shows
+
+    def get_list(self, key: Hashable):
+        return self._lookup(("list", key))
+
+    def put_list(self, key: Hashable, shows: list[CachedShow], version: int):
+        for show in shows:
+            self._store(("show", show.id), show, 1, version)
+        # stored last so that, when the list alone nearly fills the cache, evictions hit single shows and not the list
+        self._store(("list", key), shows, max(len(shows), 1), version)
+
+    def invalidate(self, show_id: Optional[int] = None):
+        with self._lock:
+            self.version += 1
+            stale = [key for key in self._entries if key[0] == "list" or show_id is None or key == ("show", show_id)]
+            for key in stale:
+                self._weight -= self._entries.pop(key)[1]
+        logger.debug("Catalog cache invalidated (show_id=%s, version=%s)", show_id, self.version)
+
+    def sync(self, db: Session) -> Optional[int]:
+        """
+        Reads the catalog version persisted in the database (one single-row query), drops the
+        cache when it changed since the last call and returns it. None on databases without it.
+        """
+        if db.get_bind().dialect.name != "sqlite":
+            return None
+        db_version = db.execute(text("SELECT version FROM catalog_version WHERE id = 1")).scalar()
+        self._synced_at = monotonic()
+        if db_version != self.db_version:
+            if self.db_version is not None:
+                logger.debug("Catalog changed in the database (version %s -> %s)", self.db_version, db_version)
+            self.invalidate()
+            self.db_version = db_version
+        return db_version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+            self.hits = self.misses = self.evictions = 0
+            self.version += 1
+            self.db_version = None
+            self._synced_at = float("-inf")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "weight": self._weight,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "version": self.version,
+                "db_version": self.db_version,
+            }
+
+
+catalog_cache = ShowCatalogCache(max_size=settings.catalog_cache_size, sync_interval=settings.catalog_cache_sync_interval)
@@ -0,0 +1,104 @@
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+import os
+
+
+def _parse(raw: str, field):
+    args = getattr(field.type, "__args__", ())
+    if type(None) in args and raw.strip().lower() in {"", "none"}:
+        return None
+    kind = next((arg for arg in args if arg is not type(None)), field.type)
+    if kind is bool:
+        return raw.strip().lower() in {"1", "true", "yes", "on"}
+    return kind(raw)
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: str = "sqlite:///./shows.db"
+    # read-only routes use their own engine and pool on this url (a replica, or the same database by default)
+    read_database_url: Optional[str] = None
+
+    # per-user sessions: 0 keeps them in the main database, N spreads them over N shard databases
+    session_shards: int = 0
+    session_shard_url: str = "sqlite:///./sessions-{shard}.db"
+
+    # connection pool (ignored for in-memory SQLite)
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    read_pool_size: int = 10
+    read_max_overflow: int = 20
+
+    # startup: apply pending migrations, or with schema_upgrade off only check the schema version
+    schema_upgrade: bool = True
+    # preload the catalog cache and open the pool connections before serving requests
+    warm_up: bool = False
+
+    # SQLite pragmas applied on every new connection (None keeps the SQLite default)
+    sqlite_journal_mode: Optional[str] = "WAL"
+    sqlite_synchronous: Optional[str] = "NORMAL"
+    sqlite_busy_timeout: Optional[int] = 5000
+    sqlite_cache_size: Optional[int] = -64000
+    sqlite_mmap_size: Optional[int] = 268435456
+
+    catalog_cache_size: int = 10_000
+    # seconds the session routes may go on with cached shows before checking the catalog version again
+    catalog_cache_sync_interval: float = 1.0
+    # seconds clients may reuse a catalog response before revalidating its ETag
+    catalog_max_age: int = 0
+    # build list responses straight from rows and encode them with orjson (when installed)
+    fast_serialization: bool = False
+
+    # group commit: session mutations arriving within the window share one transaction
+    group_commit: bool = False
+    group_commit_window_us: int = 500
+    group_commit_max_batch: int = 64
+
+    # watch history: events are buffered and appended in batches by a writer thread
+    watch_events_batch_size: int = 500
+    watch_events_flush_interval: float = 1.0
+    watch_events_max_pending: int = 10_000
+    # seconds a request waits for room in a full buffer before dropping its event
+    watch_events_put_timeout: float = 0.5
+
+    # logging: LOG_LEVELS overrides single loggers, e.g. "crud:session=WARNING,routers:show=INFO"
+    log_level: str = "INFO"
+    log_levels: str = ""
+    log_async: bool = True
+    log_sample_rate: float = 1.0
+
+    # SQL instrumentation
+    debug: bool = False
+    slow_query_ms: float = 100.0
+    explain_slow_queries: bool = True
+    enforce_query_budget: bool = False
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "Settings":
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(field.name.upper())
+            if raw is not None:
+                values[field.name] = _parse(raw, field)
+        return cls(**values)
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.database_url.startswith("sqlite")
+
+    @property
+    def effective_read_database_url(self) -> str:
+        return self.read_database_url or self.database_url
+
+    def describe(self) -> dict:
+        described = asdict(self)
+        for name in ("database_url", "read_database_url"):
+            scheme, sep, rest = (described[name] or "").partition("://")
+            if "@" in rest:
+                # hide credentials when reporting the url
+                described[name] = f"{scheme}{sep}***@{rest.rsplit('@', 1)[1]}"
+        return described
+
+
+settings = Settings.from_env()
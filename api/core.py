@@ -1,6 +1,10 @@
 from enum import Enum
 
 
+# owner of the sessions created through the routes that take no user (/sessions, /shows/{id}/start)
+DEFAULT_USER_ID = 0
+
+
 class SessionState(str, Enum):
     watching = "watching"
     finished = "finished"
\ No newline at end of file
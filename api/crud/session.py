@@ -1,161 +1,502 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, lazyload
 from fastapi import HTTPException, status
 
-from typing import Optional
+from typing import Iterable, Optional
+from dataclasses import dataclass, replace
 from datetime import datetime
 import logging
 
 from api import models
 from api import schemas
-from api.core import SessionState
+from api.core import DEFAULT_USER_ID, SessionState
+from api.cache import CachedShow, catalog_cache
+from api.group_commit import group_committer
+from api.history import watch_events
 
 
 logger = logging.getLogger("crud:session")
 
 
+MAX_UPDATE_ATTEMPTS = 5
+
+
+def _record_event(session, action: str):
+    watch_events.record(
+        user_id=session.user_id, session_id=session.id, show_id=session.show_id, action=action,
+        season=session.season, episode=session.episode, state=session.state, created_at=session.last_watched_at,
+    )
+
+
 def raise_error_if_finished(session: models.Session):
     if session.state == SessionState.finished:
-        logger.warning(f"Attempted to navigate through finished session (id={session.id})")
+        logger.warning("Attempted to navigate through finished session (id=%s)", session.id)
         raise HTTPException(status_code=400, detail=f"Session with id {session.id} is marked as 'finished'. To navigate through episodes please restart it.")
 
 
+# Reads below are scoped to one user, by default the user of the routes without a user
+# (DEFAULT_USER_ID): sessions of other users are never listed, returned or changed by them.
 
-def get_sessions(db: Session, state: Optional[SessionState] = None):
-    logger.debug(f"Fetching all session from database")
-    query = db.query(models.Session)
+def get_sessions(db: Session, state: Optional[SessionState] = None, user_id: int = DEFAULT_USER_ID):
+    logger.debug("Fetching all session from database")
+    query = db.query(models.Session).filter(models.Session.user_id == user_id)
     if state:
-        logger.debug(f"Applying filter to fetch session: state={state}")
+        logger.debug("Applying filter to fetch session: state=%s", state)
         query = query.filter(models.Session.state == state)
     sessions = query.all()
-    logger.debug(f"Sessions fetched from database: {len(sessions)}")
+    logger.debug("Sessions fetched from database: %s", len(sessions))
+    return sessions
+
+
+def get_sessions_page(db: Session, limit: int, after: Optional[int] = None, state: Optional[SessionState] = None, user_id: int = DEFAULT_USER_ID):
+    logger.debug("Fetching page of sessions from database (limit=%s, after=%s)", limit, after)
+    query = db.query(models.Session).filter(models.Session.user_id == user_id).order_by(models.Session.id)
+    if state:
+        logger.debug("Applying filter to fetch session: state=%s", state)
+        query = query.filter(models.Session.state == state)
+    if after is not None:
+        query = query.filter(models.Session.id > after)
+    sessions = query.limit(limit + 1).all()
+    has_more = len(sessions) > limit
+    logger.debug("Sessions fetched from database: %s (has_more=%s)", min(len(sessions), limit), has_more)
+    return sessions[:limit], has_more
+
+
+SESSION_ROW_COLUMNS = (
+    models.Session.id, models.Session.user_id, models.Session.show_id, models.Session.season, models.Session.episode, models.Session.state,
+    models.Session.start_date, models.Session.end_date, models.Session.last_watched_at,
+    models.Show.id, models.Show.name, models.Show.description, models.Show.gender, models.Show.episodes,
+)
+
+
+def get_session_rows(db: Session, state: Optional[SessionState] = None, limit: Optional[int] = None, after: Optional[int] = None, user_id: int = DEFAULT_USER_ID):
+    """Same listing as get_sessions/get_sessions_page, as plain (session..., show...) tuples: no ORM objects built."""
+    logger.debug("Fetching session rows from database (limit=%s, after=%s, state=%s)", limit, after, state)
+    query = (
+        select(*SESSION_ROW_COLUMNS)
+        .outerjoin(models.Show, models.Session.show_id == models.Show.id)
+        .where(models.Session.user_id == user_id)
+    )
+    if state:
+        query = query.where(models.Session.state == state)
+    if after is not None:
+        query = query.where(models.Session.id > after)
+    if limit is not None:
+        query = query.order_by(models.Session.id).limit(limit + 1)
+    rows = db.execute(query).all()
+    logger.debug("Session rows fetched from database: %s", len(rows))
+    return rows
+
+
+def get_continue_watching(db: Session, limit: int, user_id: int = DEFAULT_USER_ID):
+    """Top `limit` watching sessions by last activity, walked in order on ix_sessions_user_id_state_last_watched_at."""
+    logger.debug("Fetching the %s most recently watched sessions from database", limit)
+    sessions = (
+        db.query(models.Session)
+        .filter(models.Session.user_id == user_id, models.Session.state == SessionState.watching)
+        .order_by(models.Session.last_watched_at.desc(), models.Session.id.desc())
+        .limit(limit)
+        .all()
+    )
+    logger.debug("Sessions fetched from database: %s", len(sessions))
     return sessions
 
 
-def get_session_by_id(db: Session, session_id: int):
-    logger.debug(f"Fetching session with id={session_id} from database")
-    session = db.query(models.Session).filter(models.Session.id == session_id).first()
+def get_session_history(db: Session, session_id: int, limit: int, after: Optional[int] = None, user_id: int = DEFAULT_USER_ID):
+    """Watch events of a session in the order they happened, keyset paginated on ix_watch_events_user_id_session_id_id."""
+    logger.debug("Fetching history of session with id=%s from database (limit=%s, after=%s)", session_id, limit, after)
+    query = (
+        db.query(models.WatchEvent)
+        .filter(models.WatchEvent.user_id == user_id, models.WatchEvent.session_id == session_id)
+        .order_by(models.WatchEvent.id)
+    )
+    if after is not None:
+        query = query.filter(models.WatchEvent.id > after)
+    events = query.limit(limit + 1).all()
+    has_more = len(events) > limit
+    logger.debug("Watch events fetched from database: %s (has_more=%s)", min(len(events), limit), has_more)
+    return events[:limit], has_more
+
+
+def get_sessions_by_ids(db: Session, session_ids: Iterable[int], user_id: int = DEFAULT_USER_ID, state: Optional[SessionState] = None):
+    session_ids = list(session_ids)
+    logger.debug("Fetching %s sessions by id from database with filter state=%s", len(session_ids), state)
+    query = db.query(models.Session).filter(models.Session.user_id == user_id, models.Session.id.in_(session_ids))
+    if state:
+        query = query.filter(models.Session.state == state)
+    return query.order_by(models.Session.id).all()
+
+
+def get_session_by_id(db: Session, session_id: int, user_id: int = DEFAULT_USER_ID):
+    logger.debug("Fetching session with id=%s from database", session_id)
+    session = db.query(models.Session).filter(models.Session.id == session_id, models.Session.user_id == user_id).first()
     if not session:
-        logger.error(f"Unexisting session (id={session_id})")
+        logger.error("Unexisting session (id=%s)", session_id)
         raise HTTPException(status_code=404, detail=f"Session with id {session_id} not found")
     logger.debug("Session fetched from database")
     return session
 
 
-def delete_session_by_id(db: Session, session_id: int):
-    session = get_session_by_id(db, session_id)
+def delete_session_by_id(db: Session, session_id: int, user_id: int = DEFAULT_USER_ID):
+    session = get_session_by_id(db, session_id, user_id)
     db.delete(session)
     db.commit()
-    logger.debug(f"Session with id={session_id} succesfully removed from database")
+    logger.debug("Session with id=%s succesfully removed from database", session_id)
     return None
 
 
 def create_session(db: Session, session: schemas.SessionCreate):
 
-    logger.debug(f"Trying to create a session for show={session.show_id}")
-    existing_session_with_same_showid = db.query(models.Session).filter(models.Session.show_id == session.show_id).first()
-    if existing_session_with_same_showid:
-        logger.warning(f"Trying to create a session for show={session.show_id} which is already in another session (id={existing_session_with_same_showid.id})")
-        raise HTTPException(status_code=409, detail=f"Show with id {session.show_id} already started in session {existing_session_with_same_showid.id}")
-
-    db_session = models.Session(**session.model_dump())
+    logger.debug("Trying to create a session for show=%s", session.show_id)
+    db_session = models.Session(**session.model_dump(), last_watched_at=session.start_date)
     db.add(db_session)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # unique index on sessions (user_id, show_id): one session per show and user
+        db.rollback()
+        existing_session_id = (
+            db.query(models.Session.id)
+            .filter(models.Session.user_id == session.user_id, models.Session.show_id == session.show_id)
+            .scalar()
+        )
+        if existing_session_id is None:
+            raise
+        logger.warning("Trying to create a session for show=%s which is already in another session (id=%s)", session.show_id, existing_session_id)
+        raise HTTPException(status_code=409, detail=f"Show with id {session.show_id} already started in session {existing_session_id}")
+
     db.refresh(db_session)
-    logger.debug(f"Session succesfully loaded to database (id={db_session.id})")
+    _record_event(db_session, "start")
+    logger.debug("Session succesfully loaded to database (id=%s)", db_session.id)
     return db_session
 
 
-def next_episode(db: Session, session_id: int):
-
-    session = get_session_by_id(db, session_id)
-
+def _move_next(session: models.Session, show: CachedShow):
     raise_error_if_finished(session)
 
-    logger.debug(f"Advancing session={session.id} to the next episode")
-    show = session.show
-    total_seasons = len(show.episodes)
-    season = session.season
-    episode = session.episode
-    episodes_in_season = show.episodes[season - 1]
+    logger.debug("Advancing session=%s to the next episode", session.id)
+    index = show.index
+    position = index.to_absolute(session.season, session.episode)
 
-    if episode < episodes_in_season:
-        session.episode += 1
-        logger.info(f"Session with id={session.id} advanced one episode")
-    else:
-        if season < total_seasons:
-            session.season += 1
-            session.episode = 1
-            logger.info(f"Session with id={session.id} advanced to the next season")
+    if position < index.total:
+        season, episode = index.from_absolute(position + 1)
+        if season == session.season:
+            logger.info("Session with id=%s advanced one episode", session.id)
         else:
-            session.end_date = datetime.today()
-            session.state = SessionState.finished
-            logger.info(f"Session with id={session.id} marked as finished")
-
-    db.commit()
-    db.refresh(session)
-    logger.debug("Session succesfully updated")
-    return session
-
+            logger.info("Session with id=%s advanced to the next season", session.id)
+        session.season, session.episode = season, episode
+    else:
+        session.end_date = datetime.today()
+        session.state = SessionState.finished
+        logger.info("Session with id=%s marked as finished", session.id)
 
-def previous_episode(db: Session, session_id: int):
-    session = get_session_by_id(db, session_id)
 
+def _move_previous(session: models.Session, show: CachedShow):
     raise_error_if_finished(session)
 
-    logger.debug(f"Moving back session={session.id} to the previous episode")
-    show = session.show
+    logger.debug("Moving back session=%s to the previous episode", session.id)
+    index = show.index
+    position = index.to_absolute(session.season, session.episode)
 
-    if session.episode > 1:
-        session.episode -= 1
-        logger.info(f"Session with id={session.id} moved back one episode")
-    elif session.season > 1:
-        session.season -= 1
-        session.episode = show.episodes[session.season - 1]
-        logger.info(f"Session with id={session.id} moved back to the previous season")
-    else:
-        logger.warning(f"Session with id={session.id} is already on the first episode of the show")
+    if position <= 1:
+        logger.warning("Session with id=%s is already on the first episode of the show", session.id)
         raise HTTPException(status_code=400, detail="Already at first episode of the show")
 
-    db.commit()
-    db.refresh(session)
-    logger.debug("Session succesfully updated")
-    return session
-
+    season, episode = index.from_absolute(position - 1)
+    if season == session.season:
+        logger.info("Session with id=%s moved back one episode", session.id)
+    else:
+        logger.info("Session with id=%s moved back to the previous season", session.id)
+    session.season, session.episode = season, episode
 
-def goto_episode(db: Session, session_id: int, season: int, episode: int):
-    session = get_session_by_id(db, session_id)
 
+def _move_to(session: models.Session, show: CachedShow, season: int, episode: int):
     raise_error_if_finished(session)
 
-    logger.debug(f"Moving session with id={session.id} to season {season} and episode {episode}")
-    show = session.show
+    logger.debug("Moving session with id=%s to season %s and episode %s", session.id, season, episode)
 
-    if season < 1 or season > len(show.episodes):
-        logger.error(f"Session with id={session.id} does not have season {season}")
+    if not show.index.has_season(season):
+        logger.error("Session with id=%s does not have season %s", session.id, season)
         raise HTTPException(status_code=404, detail=f"Season {season} does not exists. Show '{show.name}' only has {len(show.episodes)} seasons")
 
-    if episode < 1 or episode > show.episodes[season - 1]:
-        logger.error(f"Session with id={session.id} does not have episode {episode} for season {season}")
+    if not show.index.has_episode(season, episode):
+        logger.error("Session with id=%s does not have episode %s for season %s", session.id, episode, season)
         raise HTTPException(status_code=404, detail=f"Episode {episode} of season {season} does not exists. Season {season} of '{show.name}' only have {show.episodes[season - 1]} episodes.")
 
     session.season = season
     session.episode = episode
     session.state = SessionState.watching
 
-    db.commit()
-    db.refresh(session)
-    logger.debug("Session succesfully updated")
-    return session
 
+def _skip(session: models.Session, show: CachedShow, n: int):
+    raise_error_if_finished(session)
+
+    logger.debug("Skipping %s episodes in session=%s", n, session.id)
+    index = show.index
+    target = index.to_absolute(session.season, session.episode) + n
+
+    if target < 1:
+        logger.warning("Session with id=%s cannot move back %s episodes", session.id, -n)
+        raise HTTPException(status_code=400, detail=f"Cannot move back {-n} episodes: it would go before the first episode of the show")
 
-def restart_show(db: Session, session_id: int):
-    session = get_session_by_id(db, session_id)
-    logger.debug(f"Restarting session with id={session.id}")
+    if target > index.total:
+        # same as calling next past the last episode: stay on it and finish the show
+        session.season, session.episode = index.from_absolute(index.total)
+        session.end_date = datetime.today()
+        session.state = SessionState.finished
+        logger.info("Session with id=%s marked as finished", session.id)
+    else:
+        session.season, session.episode = index.from_absolute(target)
+        logger.info("Session with id=%s moved to S%sE%s", session.id, session.season, session.episode)
+
+
+def _seek(session: models.Session, show: CachedShow, absolute: int):
+    raise_error_if_finished(session)
+
+    logger.debug("Moving session with id=%s to absolute episode %s", session.id, absolute)
+
+    if not 1 <= absolute <= show.index.total:
+        logger.error("Session with id=%s does not have absolute episode %s", session.id, absolute)
+        raise HTTPException(status_code=404, detail=f"Episode {absolute} does not exists. Show '{show.name}' only has {show.index.total} episodes")
+
+    session.season, session.episode = show.index.from_absolute(absolute)
+    session.state = SessionState.watching
+
+
+def _restart(session: models.Session, show: CachedShow):
+    logger.debug("Restarting session with id=%s", session.id)
     session.season = 1
     session.episode = 1
     session.end_date = None
     session.state = models.SessionState.watching
+
+
+SESSION_ACTIONS = {
+    "next": _move_next,
+    "previous": _move_previous,
+    "goto": _move_to,
+    "skip": _skip,
+    "seek": _seek,
+    "restart": _restart,
+}
+
+
+@dataclass
+class SessionRecord:
+    id: int
+    show_id: int
+    season: int
+    episode: int
+    state: SessionState
+    start_date: Optional[datetime]
+    end_date: Optional[datetime]
+    last_watched_at: Optional[datetime]
+    user_id: int
+    show: Optional[CachedShow] = None
+
+
+SESSION_RECORD_COLUMNS = (
+    models.Session.id,
+    models.Session.show_id,
+    models.Session.season,
+    models.Session.episode,
+    models.Session.state,
+    models.Session.start_date,
+    models.Session.end_date,
+    models.Session.last_watched_at,
+    models.Session.user_id,
+)
+
+
+def _session_not_found(session_id: int) -> HTTPException:
+    logger.error("Unexisting session (id=%s)", session_id)
+    return HTTPException(status_code=404, detail=f"Session with id {session_id} not found")
+
+
+def _load_session_record(db: Session, session_id: int, user_id: Optional[int] = None) -> SessionRecord:
+    # identity map first, show comes from the catalog cache so it is not joined
+    session = db.get(models.Session, session_id, options=[lazyload(models.Session.show)])
+    if not session or (user_id is not None and session.user_id != user_id):
+        raise _session_not_found(session_id)
+    return SessionRecord(*(getattr(session, column.key) for column in SESSION_RECORD_COLUMNS))
+
+
+def _records_with_shows(db: Session, rows) -> list[SessionRecord]:
+    shows = catalog_cache.get_many(db, {row.show_id for row in rows})
+    return [SessionRecord(*row, show=shows.get(row.show_id)) for row in rows]
+
+
+# Per-user reads. Sessions may live in a shard database without the catalog, so they are
+# never joined with shows: their shows come from the catalog cache instead.
+
+def get_user_sessions(db: Session, user_id: int, state: Optional[SessionState] = None, limit: Optional[int] = None, after: Optional[int] = None):
+    logger.debug("Fetching sessions of user=%s from database (limit=%s, after=%s, state=%s)", user_id, limit, after, state)
+    query = select(*SESSION_RECORD_COLUMNS).where(models.Session.user_id == user_id).order_by(models.Session.id)
+    if state:
+        query = query.where(models.Session.state == state)
+    if after is not None:
+        query = query.where(models.Session.id > after)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    sessions = _records_with_shows(db, db.execute(query).all())
+    logger.debug("Sessions fetched from database: %s", len(sessions))
+    if limit is None:
+        return sessions, False
+    return sessions[:limit], len(sessions) > limit
+
+
+def get_user_session(db: Session, user_id: int, session_id: int) -> SessionRecord:
+    logger.debug("Fetching session with id=%s of user=%s from database", session_id, user_id)
+    record = _load_session_record(db, session_id, user_id)
+    record.show = catalog_cache.get(db, record.show_id)
+    return record
+
+
+def delete_user_session(db: Session, user_id: int, session_id: int):
+    deleted = db.execute(
+        delete(models.Session).where(models.Session.id == session_id, models.Session.user_id == user_id)
+    ).rowcount
+    if not deleted:
+        db.rollback()
+        logger.error("Unexisting session (id=%s, user=%s)", session_id, user_id)
+        raise HTTPException(status_code=404, detail=f"Session with id {session_id} not found")
+    db.commit()
+    logger.debug("Session with id=%s of user=%s succesfully removed from database", session_id, user_id)
+
+
+def _compare_and_swap(db: Session, session_id: int, user_id: Optional[int], action: str, **args) -> Optional[SessionRecord]:
+    """Applies `action` to the session as read. Returns None, without writing, if someone moved it in between."""
+    current = _load_session_record(db, session_id, user_id)
+    current.show = catalog_cache.get(db, current.show_id)
+    return _swap(db, current, action, **args)
+
+
+def _swap(db: Session, current: SessionRecord, action: str, **args) -> Optional[SessionRecord]:
+    show = current.show
+    updated = replace(current)
+    SESSION_ACTIONS[action](updated, show, **args)
+    updated.last_watched_at = datetime.today()
+
+    # compare-and-swap: only applies if nobody moved the session since `current` was read
+    row = db.execute(
+        update(models.Session)
+        .where(
+            models.Session.id == current.id,
+            models.Session.season == current.season,
+            models.Session.episode == current.episode,
+            models.Session.state == current.state,
+        )
+        .values(
+            season=updated.season, episode=updated.episode, state=updated.state,
+            end_date=updated.end_date, last_watched_at=updated.last_watched_at,
+        )
+        .returning(*SESSION_RECORD_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).first()
+    return SessionRecord(*row, show=show) if row is not None else None
+
+
+def _concurrent_update_error(session_id: int) -> HTTPException:
+    logger.error("Could not update session with id=%s after %s attempts", session_id, MAX_UPDATE_ATTEMPTS)
+    return HTTPException(status_code=409, detail=f"Session with id {session_id} was modified concurrently, please retry")
+
+
+def _apply_in_transaction(db: Session, session_id: int, user_id: Optional[int], action: str, **args) -> SessionRecord:
+    # runs inside the caller's transaction (a group commit or a batch): no commit or rollback here.
+    # SQLite only begins that transaction at its first write, so a session can still be moved
+    # between the read and the first UPDATE. A failed UPDATE takes the write lock all the same:
+    # the retry then reads the latest committed row and, nobody else being able to write, succeeds
+    for attempt in range(1, MAX_UPDATE_ATTEMPTS + 1):
+        record = _compare_and_swap(db, session_id, user_id, action, **args)
+        if record is not None:
+            return record
+        db.expire_all()
+        logger.warning("Concurrent update detected on session with id=%s (attempt %s/%s)", session_id, attempt, MAX_UPDATE_ATTEMPTS)
+    raise _concurrent_update_error(session_id)
+
+
+def _apply_action(db: Session, session_id: int, user_id: Optional[int], action: str, **args):
+    # shard sessions carry their own committer, the main database uses the global one
+    committer = db.info.get("group_committer", group_committer)
+    if committer.running:
+        record = committer.submit(lambda group_db: _apply_in_transaction(group_db, session_id, user_id, action, **args))
+        logger.debug("Session succesfully updated in a group commit")
+        _record_event(record, action)
+        return record
+
+    for attempt in range(1, MAX_UPDATE_ATTEMPTS + 1):
+        record = _compare_and_swap(db, session_id, user_id, action, **args)
+        if record is not None:
+            db.commit()
+            logger.debug("Session succesfully updated")
+            _record_event(record, action)
+            return record
+
+        db.rollback()
+        logger.warning("Concurrent update detected on session with id=%s (attempt %s/%s)", session_id, attempt, MAX_UPDATE_ATTEMPTS)
+
+    raise _concurrent_update_error(session_id)
+
+
+# `user_id` scopes the lookup to that user's sessions (404 otherwise); None accepts any session
+
+def next_episode(db: Session, session_id: int, user_id: Optional[int] = None):
+    return _apply_action(db, session_id, user_id, "next")
+
+
+def previous_episode(db: Session, session_id: int, user_id: Optional[int] = None):
+    return _apply_action(db, session_id, user_id, "previous")
+
+
+def goto_episode(db: Session, session_id: int, season: int, episode: int, user_id: Optional[int] = None):
+    return _apply_action(db, session_id, user_id, "goto", season=season, episode=episode)
+
+
+def skip_episodes(db: Session, session_id: int, n: int, user_id: Optional[int] = None):
+    return _apply_action(db, session_id, user_id, "skip", n=n)
+
+
+def seek_episode(db: Session, session_id: int, absolute: int, user_id: Optional[int] = None):
+    return _apply_action(db, session_id, user_id, "seek", absolute=absolute)
+
+
+def restart_show(db: Session, session_id: int, user_id: Optional[int] = None):
+    return _apply_action(db, session_id, user_id, "restart")
+
+
+def apply_batch(db: Session, operations: list[schemas.SessionOperation], user_id: int = DEFAULT_USER_ID):
+    """
+    Applies every operation with the same compare-and-swap as the single-session actions,
+    all in one transaction, so a batch racing a single action never loses its update.
+    The sessions and their shows are loaded once for the whole batch: each operation then
+    only costs its UPDATE, and reads its session again only if someone else moved it.
+    """
+    logger.debug("Applying batch of %s session operations", len(operations))
+    rows = db.execute(
+        select(*SESSION_RECORD_COLUMNS)
+        .where(models.Session.id.in_({operation.id for operation in operations}), models.Session.user_id == user_id)
+    ).all()
+    records = {record.id: record for record in _records_with_shows(db, rows)}
+
+    results = []
+    for operation in operations:
+        try:
+            current = records.get(operation.id)
+            if current is None:
+                raise _session_not_found(operation.id)
+            record = _swap(db, current, operation.action, **operation.args)
+            if record is None:
+                record = _apply_in_transaction(db, operation.id, user_id, operation.action, **operation.args)
+            # later operations on the same session start from this one's result
+            records[operation.id] = record
+            results.append(schemas.SessionOperationResult(id=operation.id, status_code=200, session=schemas.Session.model_validate(record)))
+        except HTTPException as e:
+            results.append(schemas.SessionOperationResult(id=operation.id, status_code=e.status_code, error=e.detail))
+
     db.commit()
-    db.refresh(session)
-    logger.debug("Session succesfully updated")
-    return session
\ No newline at end of file
+    for operation, result in zip(operations, results):
+        if result.ok:
+            _record_event(result.session, operation.action)
+    logger.debug("Batch committed (%s/%s operations succeeded)", sum(result.ok for result in results), len(results))
+    return results
@@ -1,37 +1,161 @@
+from sqlalchemy import column, func, select, table, text
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
+from typing import Optional
 import logging
+import re
 
 from api import models
 from api import schemas
+from api.cache import SHOW_COLUMNS, CachedShow, catalog_cache
+from api.genres import genre_key, sync_show_genres
 
 
 logger = logging.getLogger("crud:show")
 
 
+# FTS5 index kept in sync with shows by triggers (see migration 3)
+shows_fts = table("shows_fts", column("rowid"))
+
+# bm25 weights for (name, description, gender): a hit in the title matters most
+SEARCH_RANK = text("bm25(shows_fts, 10.0, 1.0, 2.0)")
+
+
 def get_all_shows(db: Session):
-    logger.debug(f"Fetching all shows from database")
-    shows = db.query(models.Show).all()
-    logger.debug(f"Shows fetched from databaset: {len(shows)}")
+    shows = catalog_cache.get_list("all")
+    if shows is not None:
+        logger.debug("Shows fetched from catalog cache: %s", len(shows))
+        return shows
+    logger.debug("Fetching all shows from database")
+    version = catalog_cache.version
+    shows = [CachedShow.from_row(row) for row in db.execute(select(*SHOW_COLUMNS))]
+    catalog_cache.put_list("all", shows, version)
+    logger.debug("Shows fetched from databaset: %s", len(shows))
     return shows
 
 
+def get_shows_page(db: Session, limit: int, after: Optional[int] = None):
+    cache_key = ("page", limit, after)
+    shows = catalog_cache.get_list(cache_key)
+    if shows is None:
+        logger.debug("Fetching page of shows from database (limit=%s, after=%s)", limit, after)
+        version = catalog_cache.version
+        query = select(*SHOW_COLUMNS).order_by(models.Show.id)
+        if after is not None:
+            query = query.where(models.Show.id > after)
+        shows = [CachedShow.from_row(row) for row in db.execute(query.limit(limit + 1))]
+        catalog_cache.put_list(cache_key, shows, version)
+    has_more = len(shows) > limit
+    logger.debug("Shows fetched: %s (has_more=%s)", min(len(shows), limit), has_more)
+    return shows[:limit], has_more
+
+
+def get_shows_by_genre(db: Session, genres: list[str], match_all: bool = False, limit: Optional[int] = None, after: Optional[int] = None):
+    """Shows tagged with any (or all, with `match_all`) of `genres`, in id order, answered from the show_genres index."""
+    keys = tuple(sorted({genre_key(genre) for genre in genres} - {""}))
+    if not keys:
+        return [], False
+
+    cache_key = ("genre", keys, match_all, limit, after)
+    shows = catalog_cache.get_list(cache_key)
+    if shows is None:
+        logger.debug("Fetching shows by genre from database (genres=%s, match_all=%s, limit=%s, after=%s)", keys, match_all, limit, after)
+        version = catalog_cache.version
+        matching = (
+            select(models.ShowGenre.show_id)
+            .join(models.Genre, models.Genre.id == models.ShowGenre.genre_id)
+            .where(models.Genre.key.in_(keys))
+        )
+        if match_all:
+            matching = matching.group_by(models.ShowGenre.show_id).having(func.count() == len(keys))
+        query = select(*SHOW_COLUMNS).where(models.Show.id.in_(matching)).order_by(models.Show.id)
+        if after is not None:
+            query = query.where(models.Show.id > after)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        shows = [CachedShow.from_row(row) for row in db.execute(query)]
+        catalog_cache.put_list(cache_key, shows, version)
+    if limit is None:
+        return shows, False
+    has_more = len(shows) > limit
+    logger.debug("Shows fetched: %s (has_more=%s)", min(len(shows), limit), has_more)
+    return shows[:limit], has_more
+
+
+def get_genres(db: Session):
+    logger.debug("Fetching genres with their show count from database")
+    count = func.count(models.ShowGenre.show_id)
+    query = (
+        select(models.Genre.name, models.Genre.key, count.label("shows"))
+        .join(models.ShowGenre, models.ShowGenre.genre_id == models.Genre.id)
+        .group_by(models.Genre.id)
+        .order_by(count.desc(), models.Genre.key)
+    )
+    genres = db.execute(query).all()
+    logger.debug("Genres fetched: %s", len(genres))
+    return genres
+
+
+def fts_query(q: str) -> Optional[str]:
+    """Turns free text into an FTS5 query where every word must match, the last one as a prefix."""
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+
+def search_shows(db: Session, q: str, limit: int, offset: int = 0):
+    if db.get_bind().dialect.name != "sqlite":
+        raise HTTPException(status_code=501, detail="Full-text search is only available on SQLite")
+    match = fts_query(q)
+    if match is None:
+        return [], False
+
+    cache_key = ("search", match, limit, offset)
+    shows = catalog_cache.get_list(cache_key)
+    if shows is None:
+        logger.debug("Searching shows in database (match=%s, limit=%s, offset=%s)", match, limit, offset)
+        version = catalog_cache.version
+        query = (
+            select(*SHOW_COLUMNS)
+            .join(shows_fts, shows_fts.c.rowid == models.Show.id)
+            .where(text("shows_fts MATCH :match").bindparams(match=match))
+            .order_by(SEARCH_RANK, models.Show.id)
+            .limit(limit + 1)
+            .offset(offset)
+        )
+        shows = [CachedShow.from_row(row) for row in db.execute(query)]
+        catalog_cache.put_list(cache_key, shows, version)
+    has_more = len(shows) > limit
+    logger.debug("Shows found: %s (has_more=%s)", min(len(shows), limit), has_more)
+    return shows[:limit], has_more
+
+
+def get_shows_by_ids(db: Session, show_ids: list[int]):
+    logger.debug("Fetching %s shows by id from catalog", len(show_ids))
+    shows = catalog_cache.get_many(db, show_ids)
+    return [shows[show_id] for show_id in dict.fromkeys(show_ids) if show_id in shows]
+
+
 def get_show_by_id(db: Session, show_id: int):
-    logger.debug(f"Fetching show with id={show_id} from database")
-    show = db.query(models.Show).filter(models.Show.id == show_id).first()
+    logger.debug("Fetching show with id=%s from catalog", show_id)
+    show = catalog_cache.get(db, show_id)
     if not show:
-        logger.error(f"Show with id={show_id} not found")
+        logger.error("Show with id=%s not found", show_id)
         raise HTTPException(status_code=404, detail=f"Show with id {show_id} not found")
-    logger.info(f"Show with id={show_id} fetched from database")
+    logger.info("Show with id=%s fetched from catalog", show_id)
     return show
 
 
 def create_show(db: Session, show: schemas.ShowCreate):
-    logger.debug(f"Trying to create a show")
+    logger.debug("Trying to create a show")
     db_show = models.Show(**show.model_dump())
     db.add(db_show)
+    db.flush()
+    sync_show_genres(db.connection(), [(db_show.id, db_show.gender)])
     db.commit()
     db.refresh(db_show)
-    logger.info(f"Show succesfully created (id={db_show.id}, name={db_show.name})")
+    catalog_cache.invalidate(db_show.id)
+    logger.info("Show succesfully created (id=%s, name=%s)", db_show.id, db_show.name)
     return db_show
\ No newline at end of file
@@ -1,18 +1,95 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = "sqlite:///./shows.db"
+import logging
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+from api.config import Settings, settings
+from api.instrumentation import instrument_engine
+
+
+logger = logging.getLogger("database")
+
+
+SQLITE_PRAGMAS = ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size")
+
+
+def _is_memory_url(url: str) -> bool:
+    return url in {"sqlite://", "sqlite:///:memory:"} or "mode=memory" in url
+
+
+def create_db_engine(settings: Settings, read_only: bool = False) -> Engine:
+    """
+    Engine for `settings.database_url`, or with `read_only` for the read url with the read pool
+    sizes. Read-only SQLite connections run with PRAGMA query_only, so a write sent through them
+    fails instead of taking the database write lock. The read url may also be a read-only URI
+    such as "sqlite:///file:shows.db?mode=ro&uri=true".
+    """
+    url = settings.effective_read_database_url if read_only else settings.database_url
+    is_sqlite = url.startswith("sqlite")
+    connect_args = {}
+    engine_args = {}
+    if is_sqlite:
+        connect_args["check_same_thread"] = False
+    if not _is_memory_url(url):
+        engine_args.update(
+            pool_size=settings.read_pool_size if read_only else settings.pool_size,
+            max_overflow=settings.read_max_overflow if read_only else settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+        )
+
+    engine = create_engine(url, connect_args=connect_args, **engine_args)
+    instrument_engine(engine)
+
+    if is_sqlite:
+        pragmas = {name: getattr(settings, f"sqlite_{name}") for name in SQLITE_PRAGMAS}
+        pragmas = {name: value for name, value in pragmas.items() if value is not None}
+        if read_only:
+            # the journal mode is persistent and set by the write engine
+            pragmas.pop("journal_mode", None)
+            pragmas["query_only"] = "ON"
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return engine
+
+
+def read_sqlite_pragmas(engine: Engine) -> dict:
+    with engine.connect() as connection:
+        return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in SQLITE_PRAGMAS}
+
+
+DATABASE_URL = settings.database_url
+
+engine = create_db_engine(settings)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# an in-memory database only exists on its own engine, so reads can't get a separate one
+if _is_memory_url(settings.database_url) and settings.read_database_url is None:
+    read_engine = engine
+else:
+    read_engine = create_db_engine(settings, read_only=True)
+
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db():
+    """For routes that only read: their queries go to the read engine and can't write."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,44 @@
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import accumulate
+
+
+class EpisodeIndex:
+    """
+    Prefix sums over the episodes per season of a show, used to convert between
+    (season, episode) and the absolute episode number (both 1-based).
+    """
+
+    def __init__(self, episodes: tuple[int, ...]):
+        self.episodes = episodes
+        self.offsets = (0, *accumulate(episodes))
+        self.total = self.offsets[-1]
+
+    @property
+    def seasons(self) -> int:
+        return len(self.episodes)
+
+    def has_season(self, season: int) -> bool:
+        return 1 <= season <= self.seasons
+
+    def has_episode(self, season: int, episode: int) -> bool:
+        return self.has_season(season) and 1 <= episode <= self.episodes[season - 1]
+
+    def to_absolute(self, season: int, episode: int) -> int:
+        return self.offsets[season - 1] + episode
+
+    def from_absolute(self, number: int) -> tuple[int, int]:
+        if not 1 <= number <= self.total:
+            raise ValueError(f"Absolute episode {number} out of range 1..{self.total}")
+        season = bisect_left(self.offsets, number)
+        return season, number - self.offsets[season - 1]
+
+    def progress(self, season: int, episode: int) -> float:
+        if not self.total:
+            return 0.0
+        return (self.to_absolute(season, episode) - 1) / self.total
+
+
+@lru_cache(maxsize=4096)
+def episode_index(episodes: tuple[int, ...]) -> EpisodeIndex:
+    return EpisodeIndex(episodes)
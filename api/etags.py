@@ -0,0 +1,62 @@
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from typing import Optional
+import hashlib
+import uuid
+
+from api.config import settings
+from api.cache import catalog_cache
+
+
+# Catalog tags come from the catalog version persisted in the database, which every
+# worker and the catalog loader bump alike. Only databases without it fall back to the
+# in-memory counter of this process, with a per-process id so that a copy served by
+# another worker or before a restart never validates.
+BOOT_ID = uuid.uuid4().hex[:8]
+
+CATALOG_CACHE_CONTROL = f"public, max-age={settings.catalog_max_age}" if settings.catalog_max_age else "public, no-cache"
+SESSION_CACHE_CONTROL = "private, no-cache"
+
+
+def _digest(*parts) -> str:
+    return hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+
+
+def catalog_etag(request: Request, db: Session) -> str:
+    """
+    Tag for any catalog read: the catalog version plus the route and query that shaped the
+    payload. Checking the version also drops the catalog cache if another process changed it.
+    """
+    db_version = catalog_cache.sync(db)
+    version = f"{BOOT_ID}-{catalog_cache.version}" if db_version is None else db_version
+    return f'"{version}-{_digest(request.url.path, request.url.query)}"'
+
+
+def session_etag(session: object) -> str:
+    """Tag for a single session, built from every field its response depends on (progress included)."""
+    return '"{}"'.format(_digest(
+        session.id, session.user_id, session.show_id, session.season, session.episode, str(session.state),
+        session.start_date, session.end_date, session.last_watched_at, tuple(session.show.episodes),
+    ))
+
+
+def _matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def check_etag(request: Request, response: Response, etag: str, cache_control: str) -> Optional[Response]:
+    """
+    Sets ETag and Cache-Control on `response`. Returns a 304 to send instead when the
+    client's If-None-Match already holds `etag`, so the endpoint can skip the body entirely.
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return None
@@ -0,0 +1,69 @@
+from sqlalchemy import delete, insert, select
+from sqlalchemy.engine import Connection
+
+from typing import Iterable
+import re
+import unicodedata
+
+from api import models
+
+
+GENRE_SEPARATORS = re.compile(r"[/,|]")
+
+
+def genre_key(name: str) -> str:
+    """Normalized genre name used for lookups: case and accents don't matter ("Acción" -> "accion")."""
+    decomposed = unicodedata.normalize("NFKD", name.strip())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+def parse_genres(gender: str) -> dict[str, str]:
+    """Splits a free-form genre string ("Acción / Satira") into {key: display name}, keeping the order."""
+    genres = {}
+    for name in GENRE_SEPARATORS.split(gender):
+        name = " ".join(name.split())
+        if name:
+            genres.setdefault(genre_key(name), name)
+    return genres
+
+
+def sync_show_genres(connection: Connection, shows: Iterable[tuple[int, str]]):
+    """
+    Rewrites the genre associations of `shows` ((id, gender) pairs) from their gender
+    string, creating the genres seen for the first time. Runs in the caller's transaction.
+    """
+    parsed = {show_id: parse_genres(gender) for show_id, gender in shows}
+    if not parsed:
+        return
+    names = {}
+    for genres in parsed.values():
+        for key, name in genres.items():
+            names.setdefault(key, name)
+
+    genre_ids = {}
+    if names:
+        query = select(models.Genre.key, models.Genre.id).where(models.Genre.key.in_(names))
+        genre_ids = dict(connection.execute(query).all())
+        missing = [{"key": key, "name": names[key]} for key in names if key not in genre_ids]
+        if missing:
+            connection.execute(insert(models.Genre), missing)
+            query = select(models.Genre.key, models.Genre.id).where(models.Genre.key.in_([genre["key"] for genre in missing]))
+            genre_ids.update(connection.execute(query).all())
+
+    connection.execute(delete(models.ShowGenre).where(models.ShowGenre.show_id.in_(parsed)))
+    links = [{"genre_id": genre_ids[key], "show_id": show_id} for show_id, genres in parsed.items() for key in genres]
+    if links:
+        connection.execute(insert(models.ShowGenre), links)
+
+
+def backfill_show_genres(connection: Connection, batch_size: int = 1000):
+    """Builds the genre associations of every show already in the database."""
+    last_id = 0
+    while True:
+        query = select(models.Show.id, models.Show.gender).where(models.Show.id > last_id).order_by(models.Show.id).limit(batch_size)
+        shows = connection.execute(query).all()
+        if not shows:
+            return
+        sync_show_genres(connection, shows)
+        last_id = shows[-1][0]
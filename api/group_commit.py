@@ -0,0 +1,176 @@
+from sqlalchemy.orm import Session, sessionmaker
+from fastapi import HTTPException
+
+from concurrent.futures import Future
+from queue import Empty, SimpleQueue
+from threading import Lock, Thread
+from time import monotonic
+from typing import Callable, Optional, TypeVar
+import logging
+
+from api.config import settings
+
+
+logger = logging.getLogger("group_commit")
+
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+class GroupCommitter:
+    """
+    Runs session mutations from concurrent requests in shared transactions.
+
+    Callers hand a job (a function of a db session) to `submit` and block until it is
+    done. A committer thread gathers the jobs that arrive within `window_us`
+    microseconds of the first one (up to `max_batch`), runs them one after another in a
+    single transaction and commits once, so N concurrent writes cost one fsync instead
+    of N. Each caller gets back its own job's result or exception.
+
+    Jobs must raise expected errors (HTTPException) before writing anything, so that a
+    failed job leaves nothing behind in the shared transaction. Any other exception
+    rolls the group back and its jobs are retried one transaction each, so a broken job
+    only fails its own caller.
+    """
+
+    def __init__(self, window_us: int = 500, max_batch: int = 64):
+        self.window_us = window_us
+        self.max_batch = max_batch
+        self.batches = 0
+        self.jobs = 0
+        self.max_batch_seen = 0
+        self.fallbacks = 0
+        self._queue: SimpleQueue = SimpleQueue()
+        self._session_factory: Optional[sessionmaker] = None
+        self._thread: Optional[Thread] = None
+        self._lock = Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, session_factory: sessionmaker):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._session_factory = session_factory
+            self._thread = Thread(target=self._run, name="group-committer", daemon=True)
+            self._thread.start()
+        logger.info("Group commit enabled (window=%sus, max_batch=%s)", self.window_us, self.max_batch)
+
+    def stop(self):
+        """Runs the jobs already submitted and stops the committer thread."""
+        # held until the thread is gone: a concurrent submit either queues before _STOP or
+        # sees the committer stopped, and a concurrent start can't pick up this _STOP
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+            thread.join()
+            self._fail_pending()
+        logger.info("Group commit stopped (%s)", self.stats())
+
+    def submit(self, job: Callable[[Session], T]) -> T:
+        """Runs `job` in the next group, or alone in its own transaction once the committer is stopped."""
+        future: Future = Future()
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put((job, future))
+                queued = True
+            else:
+                queued = False
+        if not queued:
+            if self._session_factory is None:
+                raise RuntimeError("Group committer was never started")
+            self._commit_one(job, future)
+        return future.result()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "mean_batch_size": self.jobs / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "fallbacks": self.fallbacks,
+        }
+
+    def _collect(self, first) -> tuple[list, bool]:
+        batch, stopping = [first], False
+        deadline = monotonic() + self.window_us / 1_000_000
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(deadline - monotonic(), 0))
+            except Empty:
+                break
+            if item is _STOP:
+                stopping = True
+                break
+            batch.append(item)
+        return batch, stopping
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch, stopping = self._collect(first)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _fail_pending(self):
+        # nothing is queued after _STOP, this only catches jobs left by a thread that died
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                return
+            if item is not _STOP:
+                item[1].set_exception(RuntimeError("Group committer stopped before running the job"))
+
+    def _commit(self, batch: list):
+        outcomes = []
+        # one write transaction for the whole group
+        with self._session_factory() as db:
+            try:
+                for job, future in batch:
+                    db.expire_all()
+                    try:
+                        outcomes.append((future, job(db), None))
+                    except HTTPException as e:
+                        outcomes.append((future, None, e))
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.exception("Group of %s jobs failed, retrying them one transaction each", len(batch))
+                self.fallbacks += 1
+                for job, future in batch:
+                    self._commit_one(job, future)
+                return
+
+        self.batches += 1
+        self.jobs += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        logger.debug("Committed a group of %s jobs", len(batch))
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _commit_one(self, job: Callable[[Session], T], future: Future):
+        with self._session_factory() as db:
+            try:
+                result = job(db)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                future.set_exception(e)
+                return
+        future.set_result(result)
+
+
+group_committer = GroupCommitter(window_us=settings.group_commit_window_us, max_batch=settings.group_commit_max_batch)
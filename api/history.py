@@ -0,0 +1,142 @@
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Optional
+import logging
+
+from api import models
+from api.config import settings
+
+
+logger = logging.getLogger("history")
+
+
+_STOP = object()
+
+
+class WatchEventBuffer:
+    """
+    Batches watch events in memory and appends them to watch_events from a writer thread.
+
+    A batch is written once it holds `batch_size` events or `flush_interval` seconds after
+    its first event, whichever comes first, so a busy server pays one INSERT per batch
+    instead of one per request. The queue is bounded: when the writer falls behind,
+    `record` blocks the caller for up to `put_timeout` seconds and then drops the event
+    (counted in `dropped`) rather than letting memory grow without limit.
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval: float = 1.0, max_pending: int = 10_000, put_timeout: float = 0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._queue: Queue = Queue(maxsize=max_pending)
+        self._engine: Optional[Engine] = None
+        self._thread: Optional[Thread] = None
+        self._lock = Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, engine: Engine):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._engine = engine
+            self._thread = Thread(target=self._run, name="watch-events-writer", daemon=True)
+            self._thread.start()
+        logger.debug("Watch event writer started (batch_size=%s, flush_interval=%ss)", self.batch_size, self.flush_interval)
+
+    def stop(self):
+        """Writes every pending event and stops the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+        logger.debug("Watch event writer stopped (written=%s, dropped=%s)", self.written, self.dropped)
+
+    def record(self, **event):
+        if not self.running:
+            self._drop(1, "writer not running")
+            return
+        try:
+            self._queue.put(event, timeout=self.put_timeout)
+        except Full:
+            self._drop(1, "buffer full")
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Waits until every event recorded before the call is written. Returns False on timeout."""
+        if not self.running:
+            return True
+        done = Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {"pending": self.pending(), "written": self.written, "dropped": self.dropped, "batches": self.batches}
+
+    def _drop(self, count: int, reason: str):
+        self.dropped += count
+        logger.warning("Dropped %s watch events (%s)", count, reason)
+
+    def _write(self, batch: list[dict]):
+        if not batch:
+            return
+        try:
+            with self._engine.begin() as connection:
+                connection.execute(insert(models.WatchEvent), batch)
+        except Exception:
+            logger.exception("Could not write a batch of %s watch events", len(batch))
+            self.dropped += len(batch)
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        batch, deadline = [], None
+        while True:
+            try:
+                item = self._queue.get(timeout=None if not batch else max(deadline - monotonic(), 0))
+            except Empty:
+                self._write(batch)
+                batch = []
+                continue
+            if item is _STOP:
+                self._write(batch)
+                return
+            if isinstance(item, Event):
+                self._write(batch)
+                batch = []
+                item.set()
+                continue
+            if not batch:
+                deadline = monotonic() + self.flush_interval
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+
+
+watch_events = WatchEventBuffer(
+    batch_size=settings.watch_events_batch_size,
+    flush_interval=settings.watch_events_flush_interval,
+    max_pending=settings.watch_events_max_pending,
+    put_timeout=settings.watch_events_put_timeout,
+)
+
+
+def flush_for_read():
+    """Read your own writes: writes the events still in the buffer before the history is read."""
+    if not watch_events.flush():
+        logger.warning("Watch event buffer not flushed in time, history may miss the latest events")
@@ -0,0 +1,127 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Optional
+import logging
+
+from api.config import settings
+
+
+logger = logging.getLogger("instrumentation")
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# Set per request by QueryStatsMiddleware. Sync endpoints run in a copy of the context,
+# so they share the same (mutable) QueryStats object.
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries():
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def query_budget(max_queries: int):
+    """Declares the maximum number of SQL statements a route is expected to issue."""
+    def decorator(endpoint):
+        endpoint.__query_budget__ = max_queries
+        return endpoint
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the statement's own context: after_cursor_execute never runs for a failed
+    # statement, and anything left on the connection would outlive it in the pool
+    context._query_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - context._query_started
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+    if elapsed * 1000 >= settings.slow_query_ms:
+        plan = None
+        if settings.explain_slow_queries and not executemany and conn.dialect.name == "sqlite":
+            plan = _explain(cursor, statement, parameters)
+        if plan:
+            logger.warning("Slow query (%.1fms): %s %s\nQuery plan:\n%s", elapsed * 1000, statement, parameters, plan)
+        else:
+            logger.warning("Slow query (%.1fms): %s %s", elapsed * 1000, statement, parameters)
+
+
+def _explain(cursor, statement: str, parameters) -> Optional[str]:
+    explain_cursor = cursor.connection.cursor()
+    try:
+        rows = explain_cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    except Exception as e:
+        logger.debug("Could not explain slow query: %s", e)
+        return None
+    finally:
+        explain_cursor.close()
+    return "\n".join(f"  {row[-1]}" for row in rows)
+
+
+def instrument_engine(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    Counts and times the SQL statements issued while serving each request. In debug mode
+    they are returned as X-Query-Count / X-Query-Time-Ms headers; routes over their
+    declared `query_budget` are logged, or fail the request when budgets are enforced.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and settings.debug:
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (b"x-query-count", str(stats.count).encode()),
+                    (b"x-query-time-ms", f"{stats.seconds * 1000:.3f}".encode()),
+                ]
+            await send(message)
+
+        with track_queries() as stats:
+            await self.app(scope, receive, send_wrapper)
+
+        route = scope.get("route")
+        budget = getattr(getattr(route, "endpoint", None), "__query_budget__", None)
+        if budget is not None and stats.count > budget:
+            message = f"{scope['method']} {route.path} issued {stats.count} queries (budget {budget})"
+            if settings.enforce_query_budget:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
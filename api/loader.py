@@ -0,0 +1,183 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO
+import json
+import logging
+import time
+
+from api import models
+from api.cache import catalog_cache
+from api.genres import sync_show_genres
+
+
+logger = logging.getLogger("loader")
+
+
+CHUNK_SIZE = 1 << 16
+
+
+def iter_json_array(stream: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Yields the elements of a top-level JSON array without reading the whole document."""
+    decoder = json.JSONDecoder()
+    buffer, position, started, eof = "", 0, False, False
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+
+        if position >= len(buffer) - 1 and not eof:
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+
+        if position >= len(buffer):
+            raise ValueError("Unexpected end of input: JSON array not closed")
+
+        if not started:
+            if buffer[position] != "[":
+                raise ValueError("Expected a JSON array")
+            started, position = True, position + 1
+            continue
+
+        if buffer[position] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+        if end is None or (end == len(buffer) and not eof):
+            # element cut by the chunk boundary: read more and retry
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+
+        yield item
+        position = end
+
+
+def iter_ndjson(stream: TextIO) -> Iterator[dict]:
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_show_records(stream: TextIO) -> Iterator[dict]:
+    """Detects the input format (JSON array or NDJSON) and yields normalized show rows."""
+    head = stream.read(1)
+    while head and head.isspace():
+        head = stream.read(1)
+
+    if head == "[":
+        records = iter_json_array(_prepend(head, stream))
+    else:
+        records = iter_ndjson(_prepend(head, stream))
+
+    for record in records:
+        yield normalize_show(record)
+
+
+class _prepend:
+    def __init__(self, head: str, stream: TextIO):
+        self.head, self.stream = head, stream
+
+    def read(self, size: int = -1) -> str:
+        head, self.head = self.head, ""
+        return head + self.stream.read(size)
+
+    def __iter__(self):
+        head, self.head = self.head, ""
+        lines = iter(self.stream)
+        yield head + next(lines, "")
+        yield from lines
+
+
+def normalize_show(record: dict) -> dict:
+    episodes = record["episodes"]
+    if isinstance(episodes, dict):
+        episodes = [episodes[season] for season in sorted(episodes, key=int)]
+    return {
+        "name": record["name"],
+        "description": record["description"],
+        "gender": record["gender"],
+        "episodes": list(episodes),
+    }
+
+
+def _upsert_statement(engine: Engine):
+    dialects = {"sqlite": sqlite, "postgresql": postgresql}
+    if engine.dialect.name not in dialects:
+        raise NotImplementedError(f"Bulk upsert not supported for dialect '{engine.dialect.name}'")
+    statement = dialects[engine.dialect.name].insert(models.Show)
+    return statement.on_conflict_do_update(
+        index_elements=[models.Show.name],
+        set_={column: statement.excluded[column] for column in ("description", "gender", "episodes")},
+    )
+
+
+@dataclass
+class LoadReport:
+    records: int
+    skipped: int
+    batches: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.records / self.seconds if self.seconds else 0.0
+
+
+def load_catalog(
+    engine: Engine,
+    records: Iterable[dict],
+    batch_size: int = 1000,
+    skip: int = 0,
+    checkpoint: Optional[Path] = None,
+) -> LoadReport:
+    """
+    Upserts shows (keyed on name) in batches of `batch_size`, one transaction per batch.
+
+    After every committed batch the number of records consumed so far is written to
+    `checkpoint`, so an interrupted load can be resumed by passing it back as `skip`.
+    Upserts are idempotent, so replaying a partially committed batch is harmless.
+    The genre index of every upserted show is rebuilt in the same transaction.
+    """
+    statement = _upsert_statement(engine)
+    records = iter(records)
+    for _ in islice(records, skip):
+        pass
+
+    started = time.perf_counter()
+    loaded, batches = 0, 0
+    while batch := list(islice(records, batch_size)):
+        with engine.begin() as connection:
+            connection.execute(statement, batch)
+            names = [record["name"] for record in batch]
+            shows = connection.execute(select(models.Show.id, models.Show.gender).where(models.Show.name.in_(names)))
+            sync_show_genres(connection, shows.all())
+        loaded += len(batch)
+        batches += 1
+        if checkpoint is not None:
+            checkpoint.write_text(json.dumps({"records": skip + loaded}))
+        if batches % 100 == 0:
+            logger.info("Loaded %s shows (%.0f rows/s)", loaded, loaded / (time.perf_counter() - started))
+
+    catalog_cache.invalidate()
+    report = LoadReport(records=loaded, skipped=skip, batches=batches, seconds=time.perf_counter() - started)
+    logger.info("Catalog loaded: %s shows in %.2fs (%.0f rows/s)", report.records, report.seconds, report.rows_per_second)
+    return report
+
+
+def read_checkpoint(checkpoint: Path) -> int:
+    if not checkpoint.exists():
+        return 0
+    return json.loads(checkpoint.read_text())["records"]
@@ -0,0 +1,96 @@
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Optional
+import atexit
+import logging
+import random
+import sys
+
+from api.config import Settings
+
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s"
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues records untouched so message formatting also happens on the listener thread.
+
+    The stock QueueHandler formats every record in the calling thread before enqueueing it.
+    Log arguments in this code base are immutable values (ids, counts, enums), so they can
+    safely be formatted later.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class StderrHandler(logging.StreamHandler):
+    """Writes to the current sys.stderr, which may be swapped after logging is configured (e.g. by pytest)."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction `rate` of the records at or below `max_level`; higher levels always pass."""
+
+    def __init__(self, rate: float, max_level: int = logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.max_level or random.random() < self.rate
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """Parses 'crud:session=WARNING,routers:show=INFO' into {logger name: level}."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.rpartition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(settings: Settings):
+    global _listener
+    stop_logging()
+
+    stream_handler = StderrHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    if settings.log_async:
+        queue = SimpleQueue()
+        _listener = QueueListener(queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        handler = DeferredQueueHandler(queue)
+    else:
+        handler = stream_handler
+
+    if settings.log_sample_rate < 1.0:
+        handler.addFilter(SamplingFilter(settings.log_sample_rate))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(settings.log_level.upper())
+    for name, level in parse_levels(settings.log_levels).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def stop_logging():
+    """Flushes the queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -1,26 +1,66 @@
+from time import perf_counter
+
+# measured first, so the reported import time includes the imports below
+IMPORT_STARTED = perf_counter()
+
 from fastapi import FastAPI
-from fastapi.responses import Response
+from fastapi.responses import PlainTextResponse, Response
+from contextlib import asynccontextmanager
 import uvicorn
 import logging
 
-from api.database import engine
-from api.models import DecBase
+from api.config import settings
+from api.logs import configure_logging, stop_logging
+from api.database import SessionLocal, engine, read_sqlite_pragmas
+from api.cache import catalog_cache
+from api.history import watch_events
+from api.group_commit import group_committer
+from api.metrics import MetricsMiddleware, metrics, stats_collector
+from api.instrumentation import QueryStatsMiddleware
 from api.routers.show import router as shows_router
 from api.routers.session import router as sessions_router
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s"
-)
+from api.routers.genre import router as genres_router
+from api.routers.user import router as users_router
+from api.shards import session_store
+from api.startup import prepare_database, warm_up
 
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = perf_counter()
+    # set up here and not at import: importing the app (tests, tools) starts no listener thread
+    configure_logging(settings)
+    logger.info("Starting with settings: %s", settings.describe())
+    prepare_database(settings)
+    if settings.is_sqlite:
+        logger.info("Active SQLite pragmas: %s", read_sqlite_pragmas(engine))
+    if settings.warm_up:
+        warm_up()
+    watch_events.start(engine)
+    if settings.group_commit:
+        group_committer.start(SessionLocal)
+        session_store.start()
+    logger.info(
+        "Ready in %.1fms (import %.1fms, startup %.1fms)",
+        (perf_counter() - IMPORT_STARTED) * 1000, (IMPORTED - IMPORT_STARTED) * 1000, (perf_counter() - started) * 1000,
+    )
+    yield
+    group_committer.stop()
+    session_store.stop()
+    # pending watch events are written before the process exits
+    watch_events.stop()
+    stop_logging()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware, registry=metrics)
 app.include_router(shows_router)
 app.include_router(sessions_router)
-
-DecBase.metadata.create_all(bind=engine)
+app.include_router(genres_router)
+app.include_router(users_router)
 
 
 @app.get("/")
@@ -29,5 +69,32 @@ def index():
     return Response({"msg": "This is the SHOWS api"})
 
 
+@app.get("/cache/stats")
+def cache_stats():
+    return catalog_cache.stats()
+
+
+metrics.register_collector(stats_collector(
+    "catalog_cache", catalog_cache.stats,
+    (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("entries", "gauge")),
+))
+metrics.register_collector(stats_collector(
+    "watch_events", watch_events.stats,
+    (("written", "counter"), ("dropped", "counter"), ("batches", "counter"), ("pending", "gauge")),
+))
+metrics.register_collector(stats_collector(
+    "group_commit", group_committer.stats,
+    (("batches", "counter"), ("jobs", "counter"), ("fallbacks", "counter"), ("max_batch_size", "gauge"), ("mean_batch_size", "gauge")),
+))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+IMPORTED = perf_counter()
+
+
 if __name__ == "__main__":
     uvicorn.run("api.main:app", host="localhost", port=8000)
\ No newline at end of file
@@ -0,0 +1,145 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Iterable
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterable[tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            yield repr(bound), total
+        yield "+Inf", total + self.counts[-1]
+
+
+class MetricsRegistry:
+    """
+    In-process HTTP metrics.
+
+    Only touched from the event loop thread (the middleware and the /metrics endpoint
+    are both async), so plain dicts and ints are enough: no locks on the hot path.
+    """
+
+    def __init__(self):
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.response_size: dict[tuple[str, str], Histogram] = {}
+        self.responses: dict[tuple[str, str, int], int] = {}
+        self.in_flight = 0
+        self.collectors: list[Callable[[], Iterable[str]]] = []
+
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int):
+        key = (method, route)
+        latency = self.latency.get(key)
+        if latency is None:
+            latency = self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.response_size[key] = Histogram(SIZE_BUCKETS)
+        latency.observe(seconds)
+        self.response_size[key].observe(size)
+        status_key = (method, route, status)
+        self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]):
+        """Adds a callable returning extra exposition lines (e.g. cache counters)."""
+        self.collectors.append(collector)
+
+    def reset(self):
+        self.latency.clear()
+        self.response_size.clear()
+        self.responses.clear()
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+        ]
+        lines += _render_histograms("http_request_duration_seconds", "Request latency by route.", self.latency)
+        lines += _render_histograms("http_response_size_bytes", "Response body size by route.", self.response_size)
+        lines += [
+            "# HELP http_responses_total Responses by route and status code.",
+            "# TYPE http_responses_total counter",
+        ]
+        for (method, route, status), count in sorted(self.responses.items()):
+            lines.append(f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+        for collector in self.collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+def _render_histograms(name: str, description: str, histograms: dict) -> list[str]:
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in sorted(histograms.items()):
+        labels = f'method="{method}",route="{route}"'
+        for bound, count in histogram.cumulative():
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def stats_collector(prefix: str, stats: Callable[[], dict], fields: Iterable[tuple[str, str]]) -> Callable[[], Iterable[str]]:
+    """Builds a collector exposing the (name, "counter" | "gauge") `fields` of `stats()` as `<prefix>_<name>` metrics."""
+    fields = tuple(fields)
+
+    def collector():
+        values = stats()
+        for name, kind in fields:
+            metric = f"{prefix}_{name}_total" if kind == "counter" else f"{prefix}_{name}"
+            yield f"# TYPE {metric} {kind}"
+            yield f"{metric} {values[name]}"
+
+    return collector
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, registry: "MetricsRegistry"):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        status, size = 500, 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        registry.in_flight += 1
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_flight -= 1
+            # the router stores the matched route in the scope; label by its template to keep cardinality bounded
+            route = scope.get("route")
+            registry.observe(scope["method"], getattr(route, "path", "unmatched"), status, perf_counter() - started, size)
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,268 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from datetime import datetime
+import logging
+
+from api.genres import backfill_show_genres
+
+
+logger = logging.getLogger("migrations")
+
+
+# Ordered, append-only list of (version, name, statements). Every statement must be
+# idempotent so an interrupted upgrade can simply be run again. Dialect specific
+# statements go in a {dialect name: statements} dict; other dialects skip them. Data
+# steps that need Python are callables that receive the migration's connection.
+MIGRATIONS = [
+    (1, "initial schema", [
+        """
+        CREATE TABLE IF NOT EXISTS shows (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            description VARCHAR NOT NULL,
+            gender VARCHAR NOT NULL,
+            episodes JSON NOT NULL,
+            PRIMARY KEY (id)
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_shows_name ON shows (name)",
+        "CREATE INDEX IF NOT EXISTS ix_shows_id ON shows (id)",
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER NOT NULL,
+            show_id INTEGER NOT NULL,
+            season INTEGER,
+            episode INTEGER,
+            state VARCHAR(8) NOT NULL,
+            start_date DATETIME,
+            end_date DATETIME,
+            PRIMARY KEY (id),
+            FOREIGN KEY(show_id) REFERENCES shows (id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_sessions_id ON sessions (id)",
+    ]),
+    (2, "session hot path indexes", [
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_sessions_show_id ON sessions (show_id)",
+        "CREATE INDEX IF NOT EXISTS ix_sessions_state ON sessions (state)",
+    ]),
+    (3, "show full-text search", {"sqlite": [
+        # external content table: the index stores only the tokens, rows stay in shows
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS shows_fts USING fts5(
+            name, description, gender,
+            content='shows', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS shows_fts_insert AFTER INSERT ON shows BEGIN
+            INSERT INTO shows_fts (rowid, name, description, gender) VALUES (new.id, new.name, new.description, new.gender);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS shows_fts_delete AFTER DELETE ON shows BEGIN
+            INSERT INTO shows_fts (shows_fts, rowid, name, description, gender) VALUES ('delete', old.id, old.name, old.description, old.gender);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS shows_fts_update AFTER UPDATE ON shows BEGIN
+            INSERT INTO shows_fts (shows_fts, rowid, name, description, gender) VALUES ('delete', old.id, old.name, old.description, old.gender);
+            INSERT INTO shows_fts (rowid, name, description, gender) VALUES (new.id, new.name, new.description, new.gender);
+        END
+        """,
+        # index the shows loaded before this migration
+        "INSERT INTO shows_fts (shows_fts) VALUES ('rebuild')",
+    ]}),
+    (4, "normalized genres", [
+        """
+        CREATE TABLE IF NOT EXISTS genres (
+            id INTEGER NOT NULL,
+            "key" VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            PRIMARY KEY (id)
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_genres_key ON genres (\"key\")",
+        """
+        CREATE TABLE IF NOT EXISTS show_genres (
+            genre_id INTEGER NOT NULL,
+            show_id INTEGER NOT NULL,
+            PRIMARY KEY (genre_id, show_id),
+            FOREIGN KEY(genre_id) REFERENCES genres (id) ON DELETE CASCADE,
+            FOREIGN KEY(show_id) REFERENCES shows (id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_show_genres_show_id ON show_genres (show_id)",
+        # parse the genres of the shows loaded before this migration
+        backfill_show_genres,
+    ]),
+    (5, "session last activity", [
+        lambda connection: _add_column(connection, "sessions", "last_watched_at", "DATETIME"),
+        "UPDATE sessions SET last_watched_at = COALESCE(end_date, start_date) WHERE last_watched_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_sessions_state_last_watched_at ON sessions (state, last_watched_at)",
+    ]),
+    (6, "watch history", [
+        """
+        CREATE TABLE IF NOT EXISTS watch_events (
+            id INTEGER NOT NULL,
+            session_id INTEGER NOT NULL,
+            show_id INTEGER NOT NULL,
+            action VARCHAR NOT NULL,
+            season INTEGER NOT NULL,
+            episode INTEGER NOT NULL,
+            state VARCHAR(8) NOT NULL,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_watch_events_session_id_id ON watch_events (session_id, id)",
+    ]),
+    (7, "multi-user sessions", [
+        lambda connection: _add_column(connection, "sessions", "user_id", "INTEGER DEFAULT '0' NOT NULL"),
+        lambda connection: _add_column(connection, "watch_events", "user_id", "INTEGER DEFAULT '0' NOT NULL"),
+        # uniqueness moves from show_id to (user_id, show_id)
+        "DROP INDEX IF EXISTS ix_sessions_show_id",
+        "CREATE INDEX IF NOT EXISTS ix_sessions_show_id ON sessions (show_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_sessions_user_id_show_id ON sessions (user_id, show_id)",
+        "DROP INDEX IF EXISTS ix_watch_events_session_id_id",
+        "CREATE INDEX IF NOT EXISTS ix_watch_events_user_id_session_id_id ON watch_events (user_id, session_id, id)",
+    ]),
+    (8, "persisted catalog version", {"sqlite": [
+        # bumped by triggers on every catalog write, whichever process makes it, so every worker
+        # can tell its cached catalog is stale
+        "CREATE TABLE IF NOT EXISTS catalog_version (id INTEGER NOT NULL PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+        # random start: a rebuilt database never hands out the tags of the one it replaces
+        "INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, abs(random() % 1000000000))",
+        *(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS catalog_version_{table}_{event} AFTER {event.upper()} ON {table} BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+            """
+            for table in ("shows", "show_genres") for event in ("insert", "update", "delete")
+        ),
+    ]}),
+    (9, "continue watching per user", [
+        # continue watching filters on the user first, then walks state + last activity in order
+        "DROP INDEX IF EXISTS ix_sessions_state_last_watched_at",
+        "CREATE INDEX IF NOT EXISTS ix_sessions_user_id_state_last_watched_at ON sessions (user_id, state, last_watched_at)",
+    ]),
+    (10, "never reuse session ids", {"sqlite": [
+        # a plain INTEGER PRIMARY KEY hands the id of a deleted last session to the next one,
+        # which would then inherit its watch history
+        lambda connection: _autoincrement_sessions(connection),
+    ]}),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _add_column(connection: Connection, table: str, column: str, ddl: str):
+    # ADD COLUMN has no IF NOT EXISTS on SQLite
+    if column not in {existing["name"] for existing in inspect(connection).get_columns(table)}:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _autoincrement_sessions(connection: Connection):
+    # SQLite can't alter a primary key: the table is rebuilt with AUTOINCREMENT
+    ddl = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'sessions'")).scalar()
+    if "AUTOINCREMENT" in ddl.upper():
+        return
+    columns = "id, user_id, show_id, season, episode, state, start_date, end_date, last_watched_at"
+    connection.execute(text("DROP TABLE IF EXISTS sessions_new"))
+    connection.execute(text("""
+        CREATE TABLE sessions_new (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER DEFAULT '0' NOT NULL,
+            show_id INTEGER NOT NULL,
+            season INTEGER,
+            episode INTEGER,
+            state VARCHAR(8) NOT NULL,
+            start_date DATETIME,
+            end_date DATETIME,
+            last_watched_at DATETIME,
+            FOREIGN KEY(show_id) REFERENCES shows (id) ON DELETE CASCADE
+        )
+    """))
+    connection.execute(text(f"INSERT INTO sessions_new ({columns}) SELECT {columns} FROM sessions"))
+    connection.execute(text("DROP TABLE sessions"))
+    connection.execute(text("ALTER TABLE sessions_new RENAME TO sessions"))
+    for statement in (
+        "CREATE INDEX ix_sessions_id ON sessions (id)",
+        "CREATE INDEX ix_sessions_show_id ON sessions (show_id)",
+        "CREATE INDEX ix_sessions_state ON sessions (state)",
+        "CREATE UNIQUE INDEX ix_sessions_user_id_show_id ON sessions (user_id, show_id)",
+        "CREATE INDEX ix_sessions_user_id_state_last_watched_at ON sessions (user_id, state, last_watched_at)",
+    ):
+        connection.execute(text(statement))
+
+
+def _ensure_version_table(connection: Connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL, applied_at DATETIME NOT NULL)"
+    ))
+
+
+def current_version(connection: Connection) -> int:
+    _ensure_version_table(connection)
+    return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def check_schema(engine: Engine) -> int:
+    """Cheap startup check for a schema migrated elsewhere: reads the version without any DDL."""
+    with engine.connect() as connection:
+        version = 0
+        if inspect(connection).has_table("schema_migrations"):
+            version = connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+    if version < LATEST_VERSION:
+        raise RuntimeError(f"Database schema is at version {version}, expected {LATEST_VERSION}: run the migrations")
+    return version
+
+
+def _lock_schema(connection: Connection):
+    """Takes the database write lock for the rest of the transaction."""
+    if connection.dialect.name == "sqlite":
+        # a plain BEGIN only locks at the first write, after the version was read
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    elif connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))"))
+
+
+def upgrade(engine: Engine, target: int = LATEST_VERSION) -> int:
+    """
+    Applies the pending migrations up to `target`. Safe to run from several processes at
+    once (every worker migrates on startup): each migration is applied under the write
+    lock, after reading the version again, so whoever gets the lock second finds it
+    applied and skips it.
+    """
+    with engine.begin() as connection:
+        version = current_version(connection)
+
+    for migration_version, name, statements in MIGRATIONS:
+        if migration_version <= version or migration_version > target:
+            continue
+        if isinstance(statements, dict):
+            statements = statements.get(engine.dialect.name, [])
+        with engine.begin() as connection:
+            _lock_schema(connection)
+            version = current_version(connection)
+            if migration_version <= version:
+                logger.debug("Migration %s (%s) already applied by another process", migration_version, name)
+                continue
+            logger.info("Applying migration %s (%s)", migration_version, name)
+            for statement in statements:
+                if callable(statement):
+                    statement(connection)
+                else:
+                    connection.execute(text(statement))
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {"version": migration_version, "name": name, "applied_at": datetime.today()},
+            )
+        version = migration_version
+
+    logger.debug("Database schema at version %s", version)
+    return version
@@ -1,7 +1,7 @@
 from sqlalchemy.orm import DeclarativeBase, relationship
-from sqlalchemy import Integer, String, Column, ForeignKey, DateTime, Enum, JSON
+from sqlalchemy import Integer, String, Column, ForeignKey, DateTime, Enum, Index, JSON
 
-from api.core import SessionState
+from api.core import DEFAULT_USER_ID, SessionState
 
 
 class DecBase(DeclarativeBase):
@@ -20,15 +20,62 @@ class Show(DecBase):
     sessions = relationship("Session", back_populates="show", cascade="all, delete")
 
 
+class WatchEvent(DecBase):
+    __tablename__ = "watch_events"
+
+    # append-only and kept after its session is deleted, so no foreign key
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, default=DEFAULT_USER_ID, server_default=str(DEFAULT_USER_ID), nullable=False)
+    session_id = Column(Integer, nullable=False)
+    show_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)
+    season = Column(Integer, nullable=False)
+    episode = Column(Integer, nullable=False)
+    state = Column(Enum(SessionState), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # session ids are only unique within a shard, so history is looked up per user
+        Index("ix_watch_events_user_id_session_id_id", "user_id", "session_id", "id"),
+    )
+
+
+class Genre(DecBase):
+    __tablename__ = "genres"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String, unique=True, index=True, nullable=False)
+    name = Column(String, nullable=False)
+
+
+class ShowGenre(DecBase):
+    __tablename__ = "show_genres"
+
+    # (genre_id, show_id) primary key doubles as the index for genre filters
+    genre_id = Column(Integer, ForeignKey("genres.id", ondelete="CASCADE"), primary_key=True)
+    show_id = Column(Integer, ForeignKey("shows.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
 class Session(DecBase):
     __tablename__ = "sessions"
 
     id = Column(Integer, primary_key=True, index=True)
-    show_id = Column(Integer, ForeignKey("shows.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, default=DEFAULT_USER_ID, server_default=str(DEFAULT_USER_ID), nullable=False)
+    show_id = Column(Integer, ForeignKey("shows.id", ondelete="CASCADE"), index=True, nullable=False)
     season = Column(Integer, default=1)
     episode = Column(Integer, default=1)
-    state = Column(Enum(SessionState), default=SessionState.watching, nullable=False)
+    state = Column(Enum(SessionState), default=SessionState.watching, index=True, nullable=False)
     start_date = Column(DateTime)
     end_date = Column(DateTime)
+    last_watched_at = Column(DateTime)
+
+    show = relationship("Show", back_populates="sessions", lazy="joined")
 
-    show = relationship("Show", back_populates="sessions")
\ No newline at end of file
+    __table_args__ = (
+        # "continue watching": top-K watching sessions by last activity, read straight from the index
+        Index("ix_sessions_user_id_state_last_watched_at", "user_id", "state", "last_watched_at"),
+        # one session per show and user
+        Index("ix_sessions_user_id_show_id", "user_id", "show_id", unique=True),
+        # ids of deleted sessions are never handed out again (their watch history stays)
+        {"sqlite_autoincrement": True},
+    )
\ No newline at end of file
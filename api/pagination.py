@@ -0,0 +1,25 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(value: int, key: str = "id") -> str:
+    raw = json.dumps({key: value}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str = "id") -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded.encode()))[key]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail=f"Invalid pagination cursor '{cursor}'")
+    if not isinstance(value, int):
+        raise HTTPException(status_code=400, detail=f"Invalid pagination cursor '{cursor}'")
+    return value
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.orm import Session
+
+import logging
+
+from api.database import get_read_db
+from api.etags import CATALOG_CACHE_CONTROL, catalog_etag, check_etag
+from api.instrumentation import query_budget
+from api import schemas
+import api.crud.show as crud_show
+
+
+logger = logging.getLogger("routers:genre")
+
+
+router = APIRouter(prefix="/genres")
+
+
+@router.get("", response_model=list[schemas.Genre])
+@query_budget(2)
+def get_genres(request: Request, response: Response, db: Session = Depends(get_read_db)):
+    logger.info("Received request to get all genres")
+    not_modified = check_etag(request, response, catalog_etag(request, db), CATALOG_CACHE_CONTROL)
+    if not_modified:
+        logger.info("Genre list not modified since the client copy")
+        return not_modified
+    genres = crud_show.get_genres(db)
+    logger.info("Returned %s genres", len(genres))
+    return genres
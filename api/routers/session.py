@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, status, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from typing import Optional
+from typing import Annotated, List, Optional, Union
 import logging
 
-from api.database import get_db
-from api.core import SessionState
+from api.config import settings
+from api.database import get_db, get_read_db
+from api.history import flush_for_read
+from api.etags import SESSION_CACHE_CONTROL, check_etag, session_etag
+from api.instrumentation import query_budget
+from api.serialization import fast_response, session_rows_to_dicts
+from api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from api.core import DEFAULT_USER_ID, SessionState
 from api import schemas, models
 import api.crud.session as crud_session
 
@@ -13,64 +19,163 @@ import api.crud.session as crud_session
 logger = logging.getLogger("routers:session")
 
 
+# routes without a user work on the sessions of DEFAULT_USER_ID only, see api/routers/user.py for the rest
+# budgets of the routes that read shows from the catalog cache include its version check
 router = APIRouter(prefix="/sessions")
 
 
-@router.get("", response_model=list[schemas.Session])
+@router.get("", response_model=Union[list[schemas.Session], schemas.SessionPage])
+@query_budget(1)
 def get_sessions(
+    response: Response,
     state: Optional[SessionState] = Query(None, title="state", description="Filter by state: 'watching' or 'finished'"), 
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size. Enables cursor pagination"),
+    after: Optional[str] = Query(None, description="Opaque cursor returned as 'next_cursor' by the previous page"),
+    ids: Optional[List[int]] = Query(None, max_length=MAX_PAGE_SIZE, description="Fetch only these session ids (repeat the param for each id)"),
+    db: Session = Depends(get_read_db)
 ):
-    logger.info(f"Received request to get all session with filter state={state}")
-    sessions = crud_session.get_sessions(db, state)
-    logger.info(f"Returned {len(sessions)} sessions")
+    if ids:
+        logger.info("Received request to get %s sessions by id with filter state=%s", len(ids), state)
+        if limit is not None or after is not None:
+            raise HTTPException(status_code=422, detail="'ids' can't be combined with 'limit' or 'after'")
+        sessions = crud_session.get_sessions_by_ids(db, ids, DEFAULT_USER_ID, state)
+        logger.info("Returned %s sessions", len(sessions))
+        return sessions
+
+    if limit is None and after is None:
+        logger.info("Received request to get all session with filter state=%s", state)
+        if settings.fast_serialization:
+            sessions = session_rows_to_dicts(crud_session.get_session_rows(db, state, user_id=DEFAULT_USER_ID))
+            logger.info("Returned %s sessions", len(sessions))
+            return fast_response(sessions, response)
+        sessions = crud_session.get_sessions(db, state, DEFAULT_USER_ID)
+        logger.info("Returned %s sessions", len(sessions))
+        return sessions
+
+    logger.info("Received request to get a page of sessions with filter state=%s (limit=%s, after=%s)", state, limit, after)
+    limit = limit or DEFAULT_PAGE_SIZE
+    if settings.fast_serialization:
+        rows = crud_session.get_session_rows(db, state, limit, decode_cursor(after) if after else None, DEFAULT_USER_ID)
+        sessions, has_more = session_rows_to_dicts(rows[:limit]), len(rows) > limit
+        next_cursor = encode_cursor(sessions[-1]["id"]) if has_more else None
+        logger.info("Returned page with %s sessions", len(sessions))
+        return fast_response({"items": sessions, "next_cursor": next_cursor}, response)
+
+    sessions, has_more = crud_session.get_sessions_page(db, limit, decode_cursor(after) if after else None, state, DEFAULT_USER_ID)
+    next_cursor = encode_cursor(sessions[-1].id) if has_more else None
+    logger.info("Returned page with %s sessions", len(sessions))
+    return {"items": sessions, "next_cursor": next_cursor}
+
+
+@router.get("/continue", response_model=list[schemas.Session])
+@query_budget(1)
+def continue_watching(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Number of sessions to return"), db: Session = Depends(get_read_db)):
+    logger.info("Received request to get the %s most recently watched sessions", limit)
+    sessions = crud_session.get_continue_watching(db, limit, DEFAULT_USER_ID)
+    logger.info("Returned %s sessions", len(sessions))
     return sessions
 
 
+@router.post("/batch", response_model=list[schemas.SessionOperationResult])
+def apply_batch(
+    operations: Annotated[List[schemas.SessionOperation], Body(max_length=MAX_PAGE_SIZE)],
+    db: Session = Depends(get_db)
+):
+    logger.info("Received request to apply a batch of %s session operations", len(operations))
+    results = crud_session.apply_batch(db, operations, DEFAULT_USER_ID)
+    logger.info("Batch applied: %s/%s operations succeeded", sum(result.ok for result in results), len(results))
+    return results
+
+
 @router.get("/{session_id}", response_model=schemas.Session)
-def get_session_id_by_id(session_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Received request to get session with id={session_id}")
-    session = crud_session.get_session_by_id(db, session_id)
-    logger.info(f"Session with id={session.id} returned succesfully")
+@query_budget(1)
+def get_session_id_by_id(session_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
+    logger.info("Received request to get session with id=%s", session_id)
+    session = crud_session.get_session_by_id(db, session_id, DEFAULT_USER_ID)
+    not_modified = check_etag(request, response, session_etag(session), SESSION_CACHE_CONTROL)
+    if not_modified:
+        logger.info("Session with id=%s not modified since the client copy", session_id)
+        return not_modified
+    logger.info("Session with id=%s returned succesfully", session.id)
     return session
 
 
+@router.get("/{session_id}/history", response_model=schemas.WatchEventPage)
+@query_budget(2)
+def get_session_history(
+    session_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    after: Optional[str] = Query(None, description="Opaque cursor returned as 'next_cursor' by the previous page"),
+    db: Session = Depends(get_read_db)
+):
+    logger.info("Received request to get history of session with id=%s (limit=%s, after=%s)", session_id, limit, after)
+    crud_session.get_session_by_id(db, session_id, DEFAULT_USER_ID)
+    flush_for_read()
+    events, has_more = crud_session.get_session_history(db, session_id, limit, decode_cursor(after) if after else None, DEFAULT_USER_ID)
+    next_cursor = encode_cursor(events[-1].id) if has_more else None
+    logger.info("Returned %s watch events", len(events))
+    return {"items": events, "next_cursor": next_cursor}
+
+
 @router.post("/{session_id}/next", response_model=schemas.Session)
+@query_budget(4)
 def next_episode(session_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Received request to advance session with id={session_id}")
-    session = crud_session.next_episode(db, session_id)
-    logger.info(f"Session with id={session.id} updated succesfully")
+    logger.info("Received request to advance session with id=%s", session_id)
+    session = crud_session.next_episode(db, session_id, user_id=DEFAULT_USER_ID)
+    logger.info("Session with id=%s updated succesfully", session.id)
     return session
 
 
 @router.post("/{session_id}/previous", response_model=schemas.Session)
+@query_budget(4)
 def previous_episode(session_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Received request to move back session with id={session_id}")
-    session = crud_session.previous_episode(db, session_id)
-    logger.info(f"Session with id={session.id} updated succesfully")
+    logger.info("Received request to move back session with id=%s", session_id)
+    session = crud_session.previous_episode(db, session_id, user_id=DEFAULT_USER_ID)
+    logger.info("Session with id=%s updated succesfully", session.id)
     return session
 
 
 @router.post("/{session_id}/goto", response_model=schemas.Session)
+@query_budget(4)
 def goto_episode(session_id: int, data: schemas.SessionUpdate, db: Session = Depends(get_db)):
-    logger.info(f"Received request to go to S{data.season}E{data.episode} in session with id={session_id}")
-    session =  crud_session.goto_episode(db, session_id, data.season, data.episode)
-    logger.info(f"Session with id={session.id} updated succesfully")
+    logger.info("Received request to go to S%sE%s in session with id=%s", data.season, data.episode, session_id)
+    session =  crud_session.goto_episode(db, session_id, data.season, data.episode, user_id=DEFAULT_USER_ID)
+    logger.info("Session with id=%s updated succesfully", session.id)
+    return session
+
+
+@router.post("/{session_id}/skip", response_model=schemas.Session)
+@query_budget(4)
+def skip_episodes(session_id: int, n: int = Query(1, description="Number of episodes to move (negative to move back)"), db: Session = Depends(get_db)):
+    logger.info("Received request to skip %s episodes in session with id=%s", n, session_id)
+    session = crud_session.skip_episodes(db, session_id, n, user_id=DEFAULT_USER_ID)
+    logger.info("Session with id=%s updated succesfully", session.id)
+    return session
+
+
+@router.post("/{session_id}/seek", response_model=schemas.Session)
+@query_budget(4)
+def seek_episode(session_id: int, absolute: int = Query(..., ge=1, description="Absolute episode number within the show"), db: Session = Depends(get_db)):
+    logger.info("Received request to seek absolute episode %s in session with id=%s", absolute, session_id)
+    session = crud_session.seek_episode(db, session_id, absolute, user_id=DEFAULT_USER_ID)
+    logger.info("Session with id=%s updated succesfully", session.id)
     return session
 
 
 @router.post("/{session_id}/restart", response_model=schemas.Session)
+@query_budget(4)
 def restart_session(session_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Received request to restart session with id={session_id}")
-    session = crud_session.restart_show(db, session_id)
-    logger.info(f"Session with id={session.id} updated succesfully")
+    logger.info("Received request to restart session with id=%s", session_id)
+    session = crud_session.restart_show(db, session_id, user_id=DEFAULT_USER_ID)
+    logger.info("Session with id=%s updated succesfully", session.id)
     return session
 
 @router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(2)
 def delete_session_by_id(session_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Received request to delete session with id={session_id}")
-    crud_session.delete_session_by_id(db, session_id)
-    logger.info(f"Session with id={session_id} deleted succesfully")
+    logger.info("Received request to delete session with id=%s", session_id)
+    crud_session.delete_session_by_id(db, session_id, DEFAULT_USER_ID)
+    logger.info("Session with id=%s deleted succesfully", session_id)
     return
 
 
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy.orm import Session
 
+from typing import List, Literal, Optional, Union
 from datetime import datetime
 import logging
 
-from api.database import get_db
+from api.config import settings
+from api.database import get_db, get_read_db
+from api.etags import CATALOG_CACHE_CONTROL, catalog_etag, check_etag
+from api.instrumentation import query_budget
+from api.serialization import fast_response, shows_to_dicts
+from api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from api.core import DEFAULT_USER_ID
 from api import models, schemas
 import api.crud.show as crud_show
 import api.crud.session as crud_session
@@ -16,26 +23,99 @@ logger = logging.getLogger("routers:show")
 router = APIRouter(prefix="/shows")
 
 
-@router.get("", response_model=list[schemas.Show])
-def get_shows(db: Session = Depends(get_db)):
-    logger.info(f"Received request to get all shows from database")
-    shows = crud_show.get_all_shows(db)
-    logger.info(f"Returned {len(shows)} shows")
-    return shows
+@router.get("", response_model=Union[list[schemas.Show], schemas.ShowPage])
+@query_budget(2)
+def get_shows(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size. Enables cursor pagination"),
+    after: Optional[str] = Query(None, description="Opaque cursor returned as 'next_cursor' by the previous page"),
+    ids: Optional[List[int]] = Query(None, max_length=MAX_PAGE_SIZE, description="Fetch only these show ids (repeat the param for each id)"),
+    genre: Optional[List[str]] = Query(None, max_length=20, description="Only shows with these genres (repeat the param for each genre). Case and accents are ignored"),
+    genre_match: Literal["any", "all"] = Query("any", description="Whether shows need 'any' or 'all' of the requested genres"),
+    db: Session = Depends(get_read_db)
+):
+    not_modified = check_etag(request, response, catalog_etag(request, db), CATALOG_CACHE_CONTROL)
+    if not_modified:
+        logger.info("Show list not modified since the client copy")
+        return not_modified
+
+    if ids:
+        logger.info("Received request to get %s shows by id", len(ids))
+        shows = crud_show.get_shows_by_ids(db, ids)
+        logger.info("Returned %s shows", len(shows))
+        return fast_response(shows_to_dicts(shows), response) if settings.fast_serialization else shows
+
+    if genre:
+        logger.info("Received request to get shows by genre (genre=%s, match=%s, limit=%s, after=%s)", genre, genre_match, limit, after)
+        paginated = limit is not None or after is not None
+        limit = (limit or DEFAULT_PAGE_SIZE) if paginated else None
+        shows, has_more = crud_show.get_shows_by_genre(db, genre, genre_match == "all", limit, decode_cursor(after) if after else None)
+        logger.info("Returned %s shows", len(shows))
+        if not paginated:
+            return fast_response(shows_to_dicts(shows), response) if settings.fast_serialization else shows
+        next_cursor = encode_cursor(shows[-1].id) if has_more else None
+        if settings.fast_serialization:
+            return fast_response({"items": shows_to_dicts(shows), "next_cursor": next_cursor}, response)
+        return {"items": shows, "next_cursor": next_cursor}
+
+    if limit is None and after is None:
+        logger.info("Received request to get all shows from database")
+        shows = crud_show.get_all_shows(db)
+        logger.info("Returned %s shows", len(shows))
+        return fast_response(shows_to_dicts(shows), response) if settings.fast_serialization else shows
+
+    logger.info("Received request to get a page of shows (limit=%s, after=%s)", limit, after)
+    limit = limit or DEFAULT_PAGE_SIZE
+    shows, has_more = crud_show.get_shows_page(db, limit, decode_cursor(after) if after else None)
+    next_cursor = encode_cursor(shows[-1].id) if has_more else None
+    logger.info("Returned page with %s shows", len(shows))
+    if settings.fast_serialization:
+        return fast_response({"items": shows_to_dicts(shows), "next_cursor": next_cursor}, response)
+    return {"items": shows, "next_cursor": next_cursor}
+
+
+@router.get("/search", response_model=schemas.ShowPage)
+@query_budget(2)
+def search_shows(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for in the name, description or genres. The last word also matches as a prefix"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    after: Optional[str] = Query(None, description="Opaque cursor returned as 'next_cursor' by the previous page"),
+    db: Session = Depends(get_read_db)
+):
+    logger.info("Received request to search shows (q=%s, limit=%s, after=%s)", q, limit, after)
+    not_modified = check_etag(request, response, catalog_etag(request, db), CATALOG_CACHE_CONTROL)
+    if not_modified:
+        logger.info("Search results not modified since the client copy")
+        return not_modified
+
+    offset = decode_cursor(after, key="offset") if after else 0
+    shows, has_more = crud_show.search_shows(db, q, limit, offset)
+    next_cursor = encode_cursor(offset + limit, key="offset") if has_more else None
+    logger.info("Returned %s shows matching the search", len(shows))
+    return {"items": shows, "next_cursor": next_cursor}
 
 
 @router.get("/{show_id}", response_model=schemas.Show)
-def get_show_by_id(show_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Received request to get show with id={show_id}")
+@query_budget(2)
+def get_show_by_id(show_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
+    logger.info("Received request to get show with id=%s", show_id)
+    not_modified = check_etag(request, response, catalog_etag(request, db), CATALOG_CACHE_CONTROL)
+    if not_modified:
+        logger.info("Show with id=%s not modified since the client copy", show_id)
+        return not_modified
     show = crud_show.get_show_by_id(db, show_id)
-    logger.info(f"Show with id={show.id} returned succesfully")
+    logger.info("Show with id=%s returned succesfully", show.id)
     return show
 
 
 @router.post("/{show_id}/start", response_model=schemas.Session)
+@query_budget(2)
 def start_show(show_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Received request to start show with id={show_id}")
-    session = crud_session.create_session(db, schemas.SessionCreate(show_id=show_id, start_date=datetime.today()))
-    logger.info(f"Show with id={show_id} succesfully started")
+    logger.info("Received request to start show with id=%s", show_id)
+    session = crud_session.create_session(db, schemas.SessionCreate(user_id=DEFAULT_USER_ID, show_id=show_id, start_date=datetime.today()))
+    logger.info("Show with id=%s succesfully started", show_id)
     return session
 
@@ -0,0 +1,143 @@
+from fastapi import APIRouter, Depends, status, Query
+from sqlalchemy.orm import Session
+
+from typing import Optional, Union
+from datetime import datetime
+import logging
+
+from api.database import get_read_db
+from api.shards import get_user_db
+from api.history import flush_for_read
+from api.instrumentation import query_budget
+from api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from api.core import SessionState
+from api import schemas
+import api.crud.session as crud_session
+import api.crud.show as crud_show
+
+
+logger = logging.getLogger("routers:user")
+
+
+# budgets of the routes that read shows from the catalog cache include its version check
+router = APIRouter(prefix="/users/{user_id}")
+
+
+@router.get("/sessions", response_model=Union[list[schemas.Session], schemas.SessionPage])
+@query_budget(3)
+def get_user_sessions(
+    user_id: int,
+    state: Optional[SessionState] = Query(None, title="state", description="Filter by state: 'watching' or 'finished'"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size. Enables cursor pagination"),
+    after: Optional[str] = Query(None, description="Opaque cursor returned as 'next_cursor' by the previous page"),
+    db: Session = Depends(get_user_db)
+):
+    logger.info("Received request to get sessions of user=%s with filter state=%s (limit=%s, after=%s)", user_id, state, limit, after)
+    paginated = limit is not None or after is not None
+    limit = (limit or DEFAULT_PAGE_SIZE) if paginated else None
+    sessions, has_more = crud_session.get_user_sessions(db, user_id, state, limit, decode_cursor(after) if after else None)
+    logger.info("Returned %s sessions", len(sessions))
+    if not paginated:
+        return sessions
+    return {"items": sessions, "next_cursor": encode_cursor(sessions[-1].id) if has_more else None}
+
+
+@router.post("/shows/{show_id}/start", response_model=schemas.Session)
+@query_budget(4)
+def start_show(user_id: int, show_id: int, db: Session = Depends(get_user_db)):
+    logger.info("Received request to start show with id=%s for user=%s", show_id, user_id)
+    crud_show.get_show_by_id(db, show_id)
+    session = crud_session.create_session(db, schemas.SessionCreate(user_id=user_id, show_id=show_id, start_date=datetime.today()))
+    logger.info("Show with id=%s succesfully started for user=%s", show_id, user_id)
+    return crud_session.get_user_session(db, user_id, session.id)
+
+
+@router.get("/sessions/{session_id}", response_model=schemas.Session)
+@query_budget(3)
+def get_user_session(user_id: int, session_id: int, db: Session = Depends(get_user_db)):
+    logger.info("Received request to get session with id=%s of user=%s", session_id, user_id)
+    session = crud_session.get_user_session(db, user_id, session_id)
+    logger.info("Session with id=%s returned succesfully", session_id)
+    return session
+
+
+@router.get("/sessions/{session_id}/history", response_model=schemas.WatchEventPage)
+@query_budget(3)
+def get_user_session_history(
+    user_id: int,
+    session_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    after: Optional[str] = Query(None, description="Opaque cursor returned as 'next_cursor' by the previous page"),
+    db: Session = Depends(get_user_db),
+    history_db: Session = Depends(get_read_db)
+):
+    logger.info("Received request to get history of session with id=%s of user=%s (limit=%s, after=%s)", session_id, user_id, limit, after)
+    crud_session.get_user_session(db, user_id, session_id)
+    flush_for_read()
+    events, has_more = crud_session.get_session_history(history_db, session_id, limit, decode_cursor(after) if after else None, user_id)
+    next_cursor = encode_cursor(events[-1].id) if has_more else None
+    logger.info("Returned %s watch events", len(events))
+    return {"items": events, "next_cursor": next_cursor}
+
+
+@router.post("/sessions/{session_id}/next", response_model=schemas.Session)
+@query_budget(4)
+def next_episode(user_id: int, session_id: int, db: Session = Depends(get_user_db)):
+    logger.info("Received request to advance session with id=%s of user=%s", session_id, user_id)
+    session = crud_session.next_episode(db, session_id, user_id=user_id)
+    logger.info("Session with id=%s updated succesfully", session.id)
+    return session
+
+
+@router.post("/sessions/{session_id}/previous", response_model=schemas.Session)
+@query_budget(4)
+def previous_episode(user_id: int, session_id: int, db: Session = Depends(get_user_db)):
+    logger.info("Received request to move back session with id=%s of user=%s", session_id, user_id)
+    session = crud_session.previous_episode(db, session_id, user_id=user_id)
+    logger.info("Session with id=%s updated succesfully", session.id)
+    return session
+
+
+@router.post("/sessions/{session_id}/goto", response_model=schemas.Session)
+@query_budget(4)
+def goto_episode(user_id: int, session_id: int, data: schemas.SessionUpdate, db: Session = Depends(get_user_db)):
+    logger.info("Received request to go to S%sE%s in session with id=%s of user=%s", data.season, data.episode, session_id, user_id)
+    session = crud_session.goto_episode(db, session_id, data.season, data.episode, user_id=user_id)
+    logger.info("Session with id=%s updated succesfully", session.id)
+    return session
+
+
+@router.post("/sessions/{session_id}/skip", response_model=schemas.Session)
+@query_budget(4)
+def skip_episodes(user_id: int, session_id: int, n: int = Query(1, description="Number of episodes to move (negative to move back)"), db: Session = Depends(get_user_db)):
+    logger.info("Received request to skip %s episodes in session with id=%s of user=%s", n, session_id, user_id)
+    session = crud_session.skip_episodes(db, session_id, n, user_id=user_id)
+    logger.info("Session with id=%s updated succesfully", session.id)
+    return session
+
+
+@router.post("/sessions/{session_id}/seek", response_model=schemas.Session)
+@query_budget(4)
+def seek_episode(user_id: int, session_id: int, absolute: int = Query(..., ge=1, description="Absolute episode number within the show"), db: Session = Depends(get_user_db)):
+    logger.info("Received request to seek absolute episode %s in session with id=%s of user=%s", absolute, session_id, user_id)
+    session = crud_session.seek_episode(db, session_id, absolute, user_id=user_id)
+    logger.info("Session with id=%s updated succesfully", session.id)
+    return session
+
+
+@router.post("/sessions/{session_id}/restart", response_model=schemas.Session)
+@query_budget(4)
+def restart_session(user_id: int, session_id: int, db: Session = Depends(get_user_db)):
+    logger.info("Received request to restart session with id=%s of user=%s", session_id, user_id)
+    session = crud_session.restart_show(db, session_id, user_id=user_id)
+    logger.info("Session with id=%s updated succesfully", session.id)
+    return session
+
+
+@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(1)
+def delete_user_session(user_id: int, session_id: int, db: Session = Depends(get_user_db)):
+    logger.info("Received request to delete session with id=%s of user=%s", session_id, user_id)
+    crud_session.delete_user_session(db, user_id, session_id)
+    logger.info("Session with id=%s deleted succesfully", session_id)
+    return
@@ -1,8 +1,9 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, computed_field, model_validator
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
 
-from api.core import SessionState
+from api.core import DEFAULT_USER_ID, SessionState
+from api.episodes import episode_index
 
 
 # ======== SHOWS ======== 
@@ -20,9 +21,21 @@ class Show(ShowBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class ShowPage(BaseModel):
+    items: List[Show]
+    next_cursor: Optional[str] = None
+
+class Genre(BaseModel):
+    name: str
+    key: str
+    shows: int
+
+    model_config = ConfigDict(from_attributes=True)
+
 
 # ======== SESSIONS ========
 class SessionBase(BaseModel):
+    user_id: int = Field(DEFAULT_USER_ID, ge=0)
     show_id: Optional[int]
     season: int = Field(1, ge=1)
     episode: int = Field(1, ge=1)
@@ -41,8 +54,80 @@ class SessionUpdate(BaseModel):
     state: Optional[SessionState] = None
     end_date: datetime = Field(None)
 
+def session_progress(state: SessionState, season: int, episode: int, episodes: List[int]) -> Optional[float]:
+    if state == SessionState.finished:
+        return 1.0
+    index = episode_index(tuple(episodes))
+    if not index.has_episode(season, episode):
+        return None
+    return index.progress(season, episode)
+
 class Session(SessionBase):
     id: int
+    last_watched_at: Optional[datetime] = None
     show: Optional[Show] = None
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+    @computed_field
+    @property
+    def progress(self) -> Optional[float]:
+        if self.show is None:
+            return None
+        return session_progress(self.state, self.season, self.episode, self.show.episodes)
+
+class SessionPage(BaseModel):
+    items: List[Session]
+    next_cursor: Optional[str] = None
+
+
+# ======== HISTORY ========
+class WatchEvent(BaseModel):
+    id: int
+    session_id: int
+    show_id: int
+    action: str
+    season: int
+    episode: int
+    state: SessionState
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class WatchEventPage(BaseModel):
+    items: List[WatchEvent]
+    next_cursor: Optional[str] = None
+
+
+# ======== BATCH ========
+SESSION_ACTION_ARGS = {
+    "next": set(),
+    "previous": set(),
+    "restart": set(),
+    "goto": {"season", "episode"},
+    "skip": {"n"},
+    "seek": {"absolute"},
+}
+
+class SessionOperation(BaseModel):
+    id: int = Field(...)
+    action: Literal["next", "previous", "goto", "skip", "seek", "restart"] = Field(...)
+    args: Dict[str, int] = Field(default_factory=dict)
+
+    @model_validator(mode="after")
+    def check_args(self):
+        expected = SESSION_ACTION_ARGS[self.action]
+        if set(self.args) != expected:
+            raise ValueError(f"Action '{self.action}' expects args {sorted(expected)}, got {sorted(self.args)}")
+        return self
+
+class SessionOperationResult(BaseModel):
+    id: int
+    status_code: int
+    session: Optional[Session] = None
+    error: Optional[str] = None
+
+    @computed_field
+    @property
+    def ok(self) -> bool:
+        return self.error is None
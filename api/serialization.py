@@ -0,0 +1,78 @@
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from datetime import datetime
+from typing import Any, Iterable
+import json
+
+from api.cache import CachedShow
+from api.schemas import session_progress
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used instead
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_response(content: Any, response: Response) -> FastJSONResponse:
+    """Wraps already serializable content, keeping the headers set on the endpoint's `response`."""
+    return FastJSONResponse(content, headers=dict(response.headers))
+
+
+# The builders below produce exactly what schemas.Show / schemas.Session dump to, from
+# values that already come validated from the database, skipping pydantic entirely.
+
+def show_to_dict(show: CachedShow) -> dict:
+    return {
+        "name": show.name,
+        "description": show.description,
+        "gender": show.gender,
+        "episodes": list(show.episodes),
+        "id": show.id,
+    }
+
+
+def shows_to_dicts(shows: Iterable[CachedShow]) -> list[dict]:
+    return [show_to_dict(show) for show in shows]
+
+
+def session_rows_to_dicts(rows: Iterable[tuple]) -> list[dict]:
+    """Rows as returned by crud.session.get_session_rows."""
+    sessions = []
+    for id, user_id, show_id, season, episode, state, start_date, end_date, last_watched_at, show_pk, name, description, gender, episodes in rows:
+        if show_pk is None:
+            show, progress = None, None
+        else:
+            show = {"name": name, "description": description, "gender": gender, "episodes": episodes, "id": show_pk}
+            progress = session_progress(state, season, episode, episodes)
+        sessions.append({
+            "user_id": user_id,
+            "show_id": show_id,
+            "season": season,
+            "episode": episode,
+            "state": state.value,
+            "start_date": start_date,
+            "end_date": end_date,
+            "id": id,
+            "last_watched_at": last_watched_at,
+            "show": show,
+            "progress": progress,
+        })
+    return sessions
@@ -0,0 +1,92 @@
+from sqlalchemy.orm import Session, sessionmaker
+from fastapi import Path
+
+from dataclasses import replace
+from typing import Optional
+import hashlib
+import logging
+
+from api import models
+from api.config import Settings, settings
+from api.database import SessionLocal, create_db_engine
+from api.group_commit import GroupCommitter
+from api.migrations import upgrade
+
+
+logger = logging.getLogger("shards")
+
+
+def shard_for(user_id: int, shards: int) -> int:
+    """Stable shard number of a user: the same on every process and restart."""
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+class SessionStore:
+    """
+    Hands out db sessions for the sessions of a given user.
+
+    With `session_shards` = 0 every user lives in the main database. Otherwise sessions are
+    spread over that many databases (`session_shard_url` with a '{shard}' placeholder) by a
+    hash of the user id, so writes from users on different shards never wait on the same
+    SQLite write lock. Only the sessions table is routed to the shard: shows, genres and the
+    watch history stay shared in the main database. Each shard gets its own group committer.
+    """
+
+    def __init__(self, main: sessionmaker, settings: Settings):
+        self.main = main
+        self.engines = [
+            create_db_engine(replace(settings, database_url=settings.session_shard_url.format(shard=shard)))
+            for shard in range(settings.session_shards)
+        ]
+        self.committers = [
+            GroupCommitter(window_us=settings.group_commit_window_us, max_batch=settings.group_commit_max_batch)
+            for _ in self.engines
+        ]
+        self.sessionmakers = [
+            sessionmaker(
+                bind=main.kw["bind"], binds={models.Session: engine},
+                autoflush=False, autocommit=False, info={"group_committer": committer},
+            )
+            for engine, committer in zip(self.engines, self.committers)
+        ]
+
+    @property
+    def shards(self) -> int:
+        return len(self.engines)
+
+    def shard_of(self, user_id: int) -> Optional[int]:
+        return shard_for(user_id, self.shards) if self.shards else None
+
+    def session(self, user_id: int) -> Session:
+        shard = self.shard_of(user_id)
+        return self.main() if shard is None else self.sessionmakers[shard]()
+
+    def upgrade(self):
+        for shard, engine in enumerate(self.engines):
+            logger.debug("Upgrading session shard %s", shard)
+            upgrade(engine)
+
+    def start(self):
+        for committer, factory in zip(self.committers, self.sessionmakers):
+            committer.start(factory)
+
+    def stop(self):
+        for committer in self.committers:
+            committer.stop()
+
+    def dispose(self):
+        self.stop()
+        for engine in self.engines:
+            engine.dispose()
+
+
+session_store = SessionStore(SessionLocal, settings)
+
+
+def get_user_db(user_id: int = Path(..., ge=1)):
+    db = session_store.session(user_id)
+    try:
+        yield db
+    finally:
+        db.close()
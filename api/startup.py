@@ -0,0 +1,56 @@
+from sqlalchemy.engine import Engine
+
+from contextlib import ExitStack
+from time import perf_counter
+import logging
+
+from api.config import Settings
+from api.database import ReadSessionLocal, engine, read_engine
+from api.migrations import check_schema, upgrade
+from api.pagination import DEFAULT_PAGE_SIZE
+from api.shards import session_store
+import api.crud.show as crud_show
+
+
+logger = logging.getLogger("startup")
+
+
+def prepare_database(settings: Settings):
+    """
+    Runs at application startup, never at import: applies the pending migrations to the
+    main database and the session shards, or with `schema_upgrade` off (schema migrated by
+    a deploy step) only checks that they are at the latest version.
+    """
+    started = perf_counter()
+    engines = [engine, *session_store.engines]
+    for each in engines:
+        if settings.schema_upgrade:
+            upgrade(each)
+        else:
+            check_schema(each)
+    logger.info(
+        "Database schema %s in %.1fms", "upgraded" if settings.schema_upgrade else "checked",
+        (perf_counter() - started) * 1000,
+    )
+
+
+def _open_pool(engine: Engine) -> int:
+    # holding them all at once makes the pool open `pool_size` connections, which it keeps
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    with ExitStack() as stack:
+        for _ in range(size):
+            stack.enter_context(engine.connect())
+    return size
+
+
+def warm_up():
+    """Opens the pool connections and preloads the catalog cache, so first requests don't pay for them."""
+    started = perf_counter()
+    connections = sum(_open_pool(each) for each in dict.fromkeys([engine, read_engine, *session_store.engines]))
+    with ReadSessionLocal() as db:
+        shows = crud_show.get_all_shows(db)
+        crud_show.get_shows_page(db, DEFAULT_PAGE_SIZE, None)
+    logger.info(
+        "Warmed up in %.1fms (%s pool connections, %s shows cached)",
+        (perf_counter() - started) * 1000, connections, len(shows),
+    )
@@ -0,0 +1,231 @@
+"""
+Compares SQLite's default settings against the tuned settings from api.config
+(WAL, synchronous=NORMAL, busy_timeout, cache/mmap sizes) under mixed
+read/write traffic going through the crud layer. With --group-commit-window-us
+the tuned settings also run with group commit, reporting the batch sizes reached
+and the throughput gain over one commit per write. With --shards N it instead
+measures per-user writes with sessions in 1 and in N shard databases.
+
+    python -m benchmarks.bench_database --threads 8 --seconds 5 --write-ratio 0.2
+    python -m benchmarks.bench_database --threads 32 --write-ratio 1 --group-commit-window-us 1000
+    python -m benchmarks.bench_database --threads 32 --shards 8
+"""
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from fastapi import HTTPException
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Optional
+import argparse
+import json
+import logging
+import random
+import tempfile
+import time
+
+from api.config import Settings
+from api.database import create_db_engine, read_sqlite_pragmas
+from api.migrations import upgrade
+from api.cache import catalog_cache
+from api.group_commit import group_committer
+from api.shards import SessionStore
+from api import models
+import api.crud.session as crud_session
+from benchmarks.common import latency_summary, seed_catalog
+
+
+DEFAULT_SETTINGS = Settings(
+    sqlite_journal_mode=None,
+    sqlite_synchronous=None,
+    sqlite_busy_timeout=None,
+    sqlite_cache_size=None,
+    sqlite_mmap_size=None,
+)
+TUNED_SETTINGS = Settings()
+
+
+def run_workload(
+    settings: Settings, workdir: Path, threads: int, seconds: float, write_ratio: float, n_sessions: int,
+    group_commit_window_us: Optional[int] = None,
+) -> dict:
+    settings = replace(settings, database_url=f"sqlite:///{workdir / 'bench.db'}", pool_size=threads)
+    engine = create_db_engine(settings)
+    upgrade(engine)
+    seed_catalog(engine, n_shows=n_sessions, n_sessions=n_sessions)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    catalog_cache.clear()
+    if group_commit_window_us is not None:
+        group_committer.window_us = group_commit_window_us
+        group_committer.start(SessionLocal)
+
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        reads, writes, errors = [], [], {}
+        while time.perf_counter() < deadline:
+            session_id = rng.randint(1, n_sessions)
+            is_write = rng.random() < write_ratio
+            started = time.perf_counter()
+            try:
+                with SessionLocal() as db:
+                    if is_write:
+                        try:
+                            crud_session.next_episode(db, session_id)
+                        except HTTPException as e:
+                            if e.status_code != 400:
+                                raise
+                            crud_session.restart_show(db, session_id)
+                    else:
+                        crud_session.get_session_by_id(db, session_id)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            (writes if is_write else reads).append(time.perf_counter() - started)
+        return reads, writes, errors
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(worker, range(threads)))
+    group_commit = None
+    if group_commit_window_us is not None:
+        group_committer.stop()
+        group_commit = group_committer.stats()
+
+    reads = [latency for result in results for latency in result[0]]
+    writes = [latency for result in results for latency in result[1]]
+    errors = {}
+    for _, _, worker_errors in results:
+        for name, count in worker_errors.items():
+            errors[name] = errors.get(name, 0) + count
+
+    pragmas = read_sqlite_pragmas(engine)
+    engine.dispose()
+    return {
+        "pragmas": pragmas,
+        "throughput_ops_s": (len(reads) + len(writes)) / seconds,
+        "reads": latency_summary(reads),
+        "writes": latency_summary(writes),
+        "errors": errors,
+        "group_commit": group_commit,
+    }
+
+
+def run_sharded_workload(settings: Settings, workdir: Path, threads: int, seconds: float, shards: int, users: int) -> dict:
+    """Every operation is a `next` by a random user on their own session, in the user's shard."""
+    settings = replace(
+        settings, database_url=f"sqlite:///{workdir / 'bench.db'}", pool_size=threads,
+        session_shards=shards, session_shard_url=f"sqlite:///{workdir}/sessions-{{shard}}.db",
+    )
+    engine = create_db_engine(settings)
+    upgrade(engine)
+    seed_catalog(engine, n_shows=users, n_sessions=0)
+    store = SessionStore(sessionmaker(bind=engine, autoflush=False, autocommit=False), settings)
+    store.upgrade()
+    catalog_cache.clear()
+
+    session_ids = {}
+    for user_id in range(1, users + 1):
+        with store.session(user_id) as db:
+            session_ids[user_id] = db.execute(
+                insert(models.Session).returning(models.Session.id),
+                {"user_id": user_id, "show_id": user_id, "state": "watching"},
+            ).scalar()
+            db.commit()
+
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        writes, errors = [], {}
+        while time.perf_counter() < deadline:
+            user_id = rng.randint(1, users)
+            started = time.perf_counter()
+            try:
+                with store.session(user_id) as db:
+                    try:
+                        crud_session.next_episode(db, session_ids[user_id], user_id=user_id)
+                    except HTTPException as e:
+                        if e.status_code != 400:
+                            raise
+                        crud_session.restart_show(db, session_ids[user_id], user_id=user_id)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            writes.append(time.perf_counter() - started)
+        return writes, errors
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(worker, range(threads)))
+
+    writes = [latency for result in results for latency in result[0]]
+    errors = {}
+    for _, worker_errors in results:
+        for name, count in worker_errors.items():
+            errors[name] = errors.get(name, 0) + count
+
+    store.dispose()
+    engine.dispose()
+    return {
+        "shards": shards,
+        "throughput_ops_s": len(writes) / seconds,
+        "writes": latency_summary(writes),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--group-commit-window-us", type=int, help="Also run the tuned settings with group commit and this window")
+    parser.add_argument("--shards", type=int, help="Compare per-user writes on 1 shard against this many shards")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    if args.shards:
+        results = {}
+        for shards in dict.fromkeys((1, args.shards)):
+            with tempfile.TemporaryDirectory() as workdir:
+                results[f"shards={shards}"] = run_sharded_workload(TUNED_SETTINGS, Path(workdir), args.threads, args.seconds, shards, args.users)
+        baseline = results["shards=1"]["throughput_ops_s"]
+        for name, result in results.items():
+            summary = result["writes"]
+            gain = result["throughput_ops_s"] / baseline if baseline else 0.0
+            print(f"[{name}] throughput: {result['throughput_ops_s']:.0f} ops/s (x{gain:.2f}), errors: {result['errors'] or 'none'}")
+            print(f"  writes n={summary['count']:<7} p50={summary['p50_ms']:.2f}ms p95={summary['p95_ms']:.2f}ms p99={summary['p99_ms']:.2f}ms")
+        if args.output:
+            args.output.write_text(json.dumps(results, indent=2))
+        return
+
+    runs = [("default", DEFAULT_SETTINGS, None), ("tuned", TUNED_SETTINGS, None)]
+    if args.group_commit_window_us is not None:
+        runs.append(("tuned+group_commit", TUNED_SETTINGS, args.group_commit_window_us))
+
+    results = {}
+    for name, settings, window_us in runs:
+        with tempfile.TemporaryDirectory() as workdir:
+            results[name] = run_workload(settings, Path(workdir), args.threads, args.seconds, args.write_ratio, args.sessions, window_us)
+
+    for name, result in results.items():
+        print(f"\n[{name}] pragmas={result['pragmas']}")
+        print(f"  throughput: {result['throughput_ops_s']:.0f} ops/s, errors: {result['errors'] or 'none'}")
+        for kind in ("reads", "writes"):
+            summary = result[kind]
+            print(f"  {kind:<6} n={summary['count']:<7} p50={summary['p50_ms']:.2f}ms p95={summary['p95_ms']:.2f}ms p99={summary['p99_ms']:.2f}ms")
+        if result["group_commit"]:
+            stats = result["group_commit"]
+            gain = result["throughput_ops_s"] / results["tuned"]["throughput_ops_s"] if results["tuned"]["throughput_ops_s"] else 0.0
+            print(f"  group commit: {stats['batches']} commits for {stats['jobs']} writes, batch size mean={stats['mean_batch_size']:.1f} max={stats['max_batch_size']}, throughput x{gain:.2f} vs tuned")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+In-process benchmark of every /shows and /sessions route.
+
+Builds a synthetic catalog (one file database per size, half of the shows with a
+session), drives the app through TestClient with the same dependency override
+as tests/conftest.py and reports p50/p95/p99 latency, SQL statements per request
+and peak memory allocated by a single request.
+
+    python -m benchmarks.bench_endpoints --sizes 1000 100000 --output bench.json
+    python -m benchmarks.bench_endpoints --sizes 1000 --compare bench.json
+"""
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from dataclasses import replace
+from itertools import count
+from pathlib import Path
+from typing import Callable
+import argparse
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from api import models
+from api.config import settings
+from api.core import SessionState
+from api.database import create_db_engine, get_db, get_read_db
+from api.cache import catalog_cache
+from api.episodes import episode_index
+from api.history import watch_events
+from api.migrations import upgrade
+from api.main import app
+from benchmarks.common import latency_summary, seed_catalog
+
+
+class SessionPositions:
+    """
+    Absolute episode and episode count of every watching session, kept in step with the
+    requests the cases send, so navigation cases only pick sessions that can move that way.
+    """
+
+    def __init__(self, engine: Engine, rng: random.Random):
+        query = (
+            select(models.Session.id, models.Session.season, models.Session.episode, models.Show.episodes)
+            .join(models.Show, models.Show.id == models.Session.show_id)
+            .where(models.Session.state == SessionState.watching)
+        )
+        self.positions = {}
+        with engine.connect() as connection:
+            for session_id, season, episode, episodes in connection.execute(query):
+                index = episode_index(tuple(episodes))
+                self.positions[session_id] = [index.to_absolute(season, episode), index.total]
+        self.ids = list(self.positions)
+        self.rng = rng
+
+    def pick(self, can_move: Callable[[int, int], bool] = lambda position, total: True) -> int:
+        while True:
+            session_id = self.rng.choice(self.ids)
+            position = self.positions.get(session_id)
+            if position is not None and can_move(*position):
+                return session_id
+
+    def move(self, session_id: int, position: Callable[[int], int]) -> int:
+        self.positions[session_id][0] = position(self.positions[session_id][0])
+        return session_id
+
+    def forget(self, session_id: int) -> int:
+        self.positions.pop(session_id, None)
+        return session_id
+
+
+def build_cases(engine: Engine, size: int, rng: random.Random) -> dict:
+    """Request factories keyed by (method, route path). Each call returns (method, url, kwargs)."""
+    n_sessions = size // 2
+    unstarted_shows = count(n_sessions + 1)
+    deletable_sessions = count(n_sessions, -1)
+    sessions = SessionPositions(engine, rng)
+
+    def show_id():
+        return rng.randint(1, size)
+
+    def session_id():
+        return rng.randint(1, n_sessions)
+
+    # the target moves as the request will move it: never past the last episode (that finishes the session) or before the first
+    def forward(n: int = 1) -> int:
+        return sessions.move(sessions.pick(lambda position, total: position + n <= total), lambda position: position + n)
+
+    def backward() -> int:
+        return sessions.move(sessions.pick(lambda position, total: position > 1), lambda position: position - 1)
+
+    def moved_to(absolute: int) -> int:
+        return sessions.move(sessions.pick(), lambda position: absolute)
+
+    return {
+        ("GET", "/shows"): lambda: ("GET", "/shows", {}),
+        ("GET", "/shows/search"): lambda: ("GET", "/shows/search", {"params": {"q": f"show {show_id()}"}}),
+        ("GET", "/shows/{show_id}"): lambda: ("GET", f"/shows/{show_id()}", {}),
+        ("POST", "/shows/{show_id}/start"): lambda: ("POST", f"/shows/{next(unstarted_shows)}/start", {}),
+        ("GET", "/sessions"): lambda: ("GET", "/sessions", {}),
+        ("GET", "/sessions/continue"): lambda: ("GET", "/sessions/continue", {"params": {"limit": 20}}),
+        ("POST", "/sessions/batch"): lambda: ("POST", "/sessions/batch", {"json": [{"id": forward(), "action": "next"} for _ in range(50)]}),
+        ("GET", "/sessions/{session_id}"): lambda: ("GET", f"/sessions/{session_id()}", {}),
+        ("GET", "/sessions/{session_id}/history"): lambda: ("GET", f"/sessions/{session_id()}/history", {"params": {"limit": 20}}),
+        ("POST", "/sessions/{session_id}/next"): lambda: ("POST", f"/sessions/{forward()}/next", {}),
+        ("POST", "/sessions/{session_id}/previous"): lambda: ("POST", f"/sessions/{backward()}/previous", {}),
+        # every season has at least 6 episodes (benchmarks.common.seed_catalog): S1E2 is absolute episode 2
+        ("POST", "/sessions/{session_id}/goto"): lambda: ("POST", f"/sessions/{moved_to(2)}/goto", {"json": {"season": 1, "episode": 2}}),
+        ("POST", "/sessions/{session_id}/skip"): lambda: ("POST", f"/sessions/{forward(3)}/skip", {"params": {"n": 3}}),
+        ("POST", "/sessions/{session_id}/seek"): lambda: ("POST", f"/sessions/{moved_to(4)}/seek", {"params": {"absolute": 4}}),
+        ("POST", "/sessions/{session_id}/restart"): lambda: ("POST", f"/sessions/{moved_to(1)}/restart", {}),
+        ("DELETE", "/sessions/{session_id}"): lambda: ("DELETE", f"/sessions/{sessions.forget(next(deletable_sessions))}", {}),
+    }
+
+
+def _check(response, method: str, url: str):
+    # a benchmark of the error path would be meaningless: every case must succeed
+    if not response.is_success:
+        raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.text[:200]}")
+    if url == "/sessions/batch":
+        failed = [result for result in response.json() if not result["ok"]]
+        if failed:
+            raise RuntimeError(f"{method} {url}: {len(failed)} operations failed, first: {failed[0]}")
+
+
+# variants of list routes that are worth tracking on their own
+EXTRA_CASES = {
+    ("GET", "/shows?limit=100"): lambda: ("GET", "/shows", {"params": {"limit": 100}}),
+    ("GET", "/shows/search?q=<genre>&limit=20"): lambda: ("GET", "/shows/search", {"params": {"q": "drama", "limit": 20}}),
+    ("GET", "/shows?genre=<a>&genre=<b>&genre_match=all&limit=100"): lambda: ("GET", "/shows", {"params": {"genre": ["drama", "accion"], "genre_match": "all", "limit": 100}}),
+    ("GET", "/sessions?limit=100"): lambda: ("GET", "/sessions", {"params": {"limit": 100}}),
+    ("GET", "/sessions?state=watching&limit=100"): lambda: ("GET", "/sessions", {"params": {"state": "watching", "limit": 100}}),
+}
+
+# full table scans: a handful of iterations is enough and keeps 1M-row runs bearable
+FULL_LIST_CASES = {("GET", "/shows"), ("GET", "/sessions")}
+
+
+def uncovered_routes(cases: dict) -> set:
+    routes = {
+        (method, route.path)
+        for route in app.routes if isinstance(route, APIRoute) and route.path.startswith(("/shows", "/sessions"))
+        for method in route.methods
+    }
+    return routes - set(cases)
+
+
+def bench_size(size: int, iterations: int, workdir: Path, seed: int) -> dict:
+    engine = create_db_engine(replace(settings, database_url=f"sqlite:///{workdir / f'bench-{size}.db'}"))
+    upgrade(engine)
+    started = time.perf_counter()
+    seed_catalog(engine, n_shows=size, n_sessions=size // 2)
+    print(f"[{size}] seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    BenchSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    def get_db_override():
+        db = BenchSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(1))
+    # the watch event writer gets its own engine so its batches don't count as request queries
+    history_engine = create_db_engine(replace(settings, database_url=str(engine.url)))
+    watch_events.start(history_engine)
+
+    app.dependency_overrides[get_db] = get_db_override
+    app.dependency_overrides[get_read_db] = get_db_override
+    client = TestClient(app)
+    rng = random.Random(seed)
+    cases = build_cases(engine, size, rng)
+    missing = uncovered_routes(cases)
+    if missing:
+        print(f"[{size}] WARNING: routes without benchmark case: {sorted(missing)}", file=sys.stderr)
+    cases.update(EXTRA_CASES)
+
+    results = {}
+    try:
+        for key, make_request in cases.items():
+            catalog_cache.clear()
+            runs = min(iterations, 5) if key in FULL_LIST_CASES else iterations
+            latencies, query_counts, statuses = [], [], {}
+            for _ in range(runs):
+                method, url, kwargs = make_request()
+                statements.clear()
+                request_started = time.perf_counter()
+                response = client.request(method, url, **kwargs)
+                latencies.append(time.perf_counter() - request_started)
+                _check(response, method, url)
+                query_counts.append(len(statements))
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            method, url, kwargs = make_request()
+            tracemalloc.start()
+            response = client.request(method, url, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            _check(response, method, url)
+
+            results[" ".join(key)] = {
+                **latency_summary(latencies),
+                "queries_per_request": sum(query_counts) / len(query_counts),
+                "peak_memory_kb": peak / 1024,
+                "status_codes": {str(code): n for code, n in sorted(statuses.items())},
+            }
+            print(f"[{size}] {' '.join(key):<45} p50={results[' '.join(key)]['p50_ms']:8.2f}ms p99={results[' '.join(key)]['p99_ms']:8.2f}ms", file=sys.stderr)
+    finally:
+        app.dependency_overrides.clear()
+        watch_events.stop()
+        history_engine.dispose()
+        engine.dispose()
+
+    return results
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for size, routes in current.items():
+        for route, result in routes.items():
+            previous = baseline.get(size, {}).get(route)
+            if not previous:
+                continue
+            for metric in ("p95_ms", "queries_per_request"):
+                if result[metric] > previous[metric] * (1 + tolerance) and result[metric] - previous[metric] > 0.05:
+                    regressions.append(f"[{size}] {route}: {metric} {previous[metric]:.2f} -> {result[metric]:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000], help="Number of shows per run (e.g. 1000 100000 1000000)")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-level", default="ERROR")
+    parser.add_argument("--output", type=Path, help="Save the results as JSON")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON to compare against; exits with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative increase before flagging a regression")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(args.log_level)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            results[str(size)] = bench_size(size, args.iterations, Path(workdir), args.seed)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
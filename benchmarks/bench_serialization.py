@@ -0,0 +1,101 @@
+"""
+Standard vs fast (FAST_SERIALIZATION) list responses.
+
+Seeds a file database with `--rows` shows and as many sessions, then times the full
+list routes through TestClient in both modes, with the stdlib JSON encoder and with
+orjson (when installed). Shows come from the (warm) catalog cache, as in steady state;
+sessions are always read from the database.
+
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from dataclasses import replace
+from pathlib import Path
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+
+from api import serialization
+from api.config import settings
+from api.database import create_db_engine, get_db, get_read_db
+from api.migrations import upgrade
+from api.main import app
+import api.routers.show as show_router
+import api.routers.session as session_router
+from benchmarks.common import latency_summary, seed_catalog
+
+
+ROUTES = ("/shows", "/sessions", "/sessions?limit=1000")
+
+
+def _modes():
+    orjson = serialization.orjson
+    yield "standard", False, orjson
+    yield "fast+json", True, None
+    if orjson is not None:
+        yield "fast+orjson", True, orjson
+
+
+def bench(rows: int, iterations: int, workdir: Path) -> dict:
+    engine = create_db_engine(replace(settings, database_url=f"sqlite:///{workdir / 'bench-serialization.db'}"))
+    upgrade(engine)
+    seed_catalog(engine, n_shows=rows, n_sessions=rows)
+    BenchSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    def get_db_override():
+        db = BenchSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_db_override
+    app.dependency_overrides[get_read_db] = get_db_override
+    client = TestClient(app)
+    orjson = serialization.orjson
+    results = {}
+    try:
+        for mode, fast, encoder in _modes():
+            mode_settings = replace(settings, fast_serialization=fast)
+            show_router.settings = session_router.settings = mode_settings
+            serialization.orjson = encoder
+            for route in ROUTES:
+                latencies = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    response = client.get(route)
+                    latencies.append(time.perf_counter() - started)
+                    assert response.status_code == 200, response.text
+                results.setdefault(route, {})[mode] = latency_summary(latencies)
+                print(f"{route:<22} {mode:<12} p50={results[route][mode]['p50_ms']:8.2f}ms", file=sys.stderr)
+    finally:
+        show_router.settings = session_router.settings = settings
+        serialization.orjson = orjson
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+    for route, modes in results.items():
+        for mode in modes:
+            modes[mode]["speedup"] = modes["standard"]["p50_ms"] / modes[mode]["p50_ms"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel("ERROR")
+    with tempfile.TemporaryDirectory() as workdir:
+        results = bench(args.rows, args.iterations, Path(workdir))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
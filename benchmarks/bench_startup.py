@@ -0,0 +1,129 @@
+"""
+Cold start of the API, as an autoscaled worker sees it: each run is a fresh
+interpreter on a seeded file database (already migrated, like after a deploy).
+
+- import: time to `import api.main`.
+- first request: time from spawning uvicorn to the first successful response, and
+  the latency of that first request and of a few more after it.
+
+Runs with the default startup and with WARM_UP, and with SCHEMA_UPGRADE on and off.
+
+    python -m benchmarks.bench_startup --runs 5 --shows 10000
+"""
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from api.config import Settings
+from api.database import create_db_engine
+from api.migrations import upgrade
+from benchmarks.common import seed_catalog
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_CODE = "import time; started = time.perf_counter(); import api.main; print(time.perf_counter() - started)"
+
+VARIANTS = {
+    "default": {},
+    "warm_up": {"WARM_UP": "1"},
+    "check_only": {"SCHEMA_UPGRADE": "0"},
+    "check_only+warm_up": {"SCHEMA_UPGRADE": "0", "WARM_UP": "1"},
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(environ: dict) -> float:
+    result = subprocess.run([sys.executable, "-c", IMPORT_CODE], cwd=ROOT, env=environ, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure_first_request(environ: dict, path: str, follow_up: int) -> dict:
+    port = _free_port()
+    url = f"http://localhost:{port}{path}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=environ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with requests.Session() as session:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited before serving a request")
+                try:
+                    request_started = time.perf_counter()
+                    response = session.get(url, timeout=30)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.005)
+            ready = time.perf_counter()
+            response.raise_for_status()
+            latencies = []
+            for _ in range(follow_up):
+                request_started_again = time.perf_counter()
+                session.get(url, timeout=30).raise_for_status()
+                latencies.append(time.perf_counter() - request_started_again)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "time_to_first_request": ready - started,
+        "first_request": ready - request_started,
+        "next_requests": statistics.median(latencies) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--shows", type=int, default=10_000)
+    parser.add_argument("--path", default="/shows", help="Route of the first request")
+    parser.add_argument("--follow-up", type=int, default=5, help="Requests timed after the first one")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        database_url = f"sqlite:///{Path(workdir) / 'shows.db'}"
+        engine = create_db_engine(Settings(database_url=database_url))
+        upgrade(engine)
+        seed_catalog(engine, n_shows=args.shows, n_sessions=0)
+        engine.dispose()
+
+        base = {**os.environ, "DATABASE_URL": database_url, "LOG_LEVEL": "WARNING"}
+        results["import"] = {"median_ms": statistics.median(measure_import(base) for _ in range(args.runs)) * 1000}
+        for name, extra in VARIANTS.items():
+            runs = [measure_first_request({**base, **extra}, args.path, args.follow_up) for _ in range(args.runs)]
+            results[name] = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+
+    print(f"import api.main: {results['import']['median_ms']:.0f}ms (median of {args.runs})")
+    for name in VARIANTS:
+        result = results[name]
+        print(
+            f"[{name}] time to first request={result['time_to_first_request']:.0f}ms "
+            f"first request={result['first_request']:.1f}ms next requests={result['next_requests']:.1f}ms"
+        )
+
+    if args.output:
+        args.output.write_text(json.dumps({name: {k: round(v, 2) for k, v in result.items()} for name, result in results.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
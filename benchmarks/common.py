@@ -0,0 +1,64 @@
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from datetime import datetime, timedelta
+import random
+
+from api import models
+from api.core import SessionState
+from api.genres import backfill_show_genres
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[position]
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    """Summarizes latencies given in seconds as milliseconds."""
+    return {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+
+def seed_catalog(engine: Engine, n_shows: int, n_sessions: int, batch_size: int = 10_000, seed: int = 42):
+    """Fills an empty database with `n_shows` synthetic shows and `n_sessions` sessions (one per show at most)."""
+    rng = random.Random(seed)
+    genres = ["Acción", "Drama", "Comedia", "Ciencia ficción", "Terror", "Fantasía", "Thriller", "Crimen"]
+    now = datetime.today()
+
+    with engine.begin() as connection:
+        for start in range(0, n_shows, batch_size):
+            connection.execute(insert(models.Show), [
+                {
+                    "id": i,
+                    "name": f"Show {i}",
+                    "description": f"Synthetic show number {i}",
+                    "gender": " / ".join(rng.sample(genres, rng.randint(1, 3))),
+                    "episodes": [rng.randint(6, 12) for _ in range(rng.randint(1, 6))],
+                }
+                for i in range(start + 1, min(start + batch_size, n_shows) + 1)
+            ])
+        backfill_show_genres(connection, batch_size)
+
+        for start in range(0, min(n_sessions, n_shows), batch_size):
+            connection.execute(insert(models.Session), [
+                {
+                    "id": i,
+                    "show_id": i,
+                    # every season has at least 6 episodes: spread sessions over the first ones
+                    "season": 1,
+                    "episode": rng.randint(1, 6),
+                    "state": SessionState.watching if rng.random() < 0.8 else SessionState.finished,
+                    "start_date": now,
+                    "last_watched_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+                }
+                for i in range(start + 1, min(start + batch_size, n_sessions, n_shows) + 1)
+            ])
@@ -1,6 +1,12 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import argparse
 import cmd
+import io
+import random
 import requests
 import sys
+import time
 
 API_URL = "http://localhost:8000"
 
@@ -8,10 +14,93 @@ BLUE_COLOR = "\033[94m"
 RESET_COLOR = "\033[0m"
 
 
+def pooled_session(size):
+    """requests session that keeps up to `size` keep-alive connections open, to be shared by `size` threads"""
+    http = requests.Session()
+    http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=size))
+    http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=size))
+    return http
+
+
+def percentile(values, q):
+    """`q` percentile of the sorted list `values` (nearest rank)"""
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+def run_viewer(http, user_id, shows, deadline, rng):
+    """
+    One simulated viewer until `deadline`: starts shows, watches them with next, jumps
+    with goto and lists its sessions. Returns {endpoint: [(seconds, ok)]}.
+    """
+    results = {}
+
+    def call(method, endpoint, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            r = http.request(method, f"{API_URL}{url}", timeout=30, **kwargs)
+            ok = r.status_code < 400
+        except requests.RequestException:
+            r, ok = None, False
+        results.setdefault(f"{method} {endpoint}", []).append((time.perf_counter() - started, ok))
+        return r if ok else None
+
+    # sessions left by earlier runs for this user
+    r = call("GET", "/users/{user_id}/sessions", f"/users/{user_id}/sessions")
+    sessions = {session["show_id"]: session for session in r.json()} if r else {}
+
+    while time.perf_counter() < deadline:
+        show = rng.choice(shows)
+        session = sessions.get(show["id"])
+        if session is None:
+            r = call("POST", "/users/{user_id}/shows/{show_id}/start", f"/users/{user_id}/shows/{show['id']}/start")
+            if r is None:
+                continue
+            session = sessions[show["id"]] = r.json()
+
+        for _ in range(rng.randint(1, 5)):
+            if time.perf_counter() >= deadline:
+                break
+            action = "restart" if session["state"] == "finished" else "next"
+            r = call("POST", f"/users/{{user_id}}/sessions/{{session_id}}/{action}", f"/users/{user_id}/sessions/{session['id']}/{action}")
+            if r is None:
+                break
+            session = sessions[show["id"]] = r.json()
+
+        # seasons without episodes can't be jumped to
+        seasons = [season for season, episodes in enumerate(show["episodes"], 1) if episodes]
+        if seasons and session["state"] != "finished" and rng.random() < 0.3:
+            season = rng.choice(seasons)
+            episode = rng.randint(1, show["episodes"][season - 1])
+            r = call("POST", "/users/{user_id}/sessions/{session_id}/goto", f"/users/{user_id}/sessions/{session['id']}/goto", json={"season": season, "episode": episode})
+            if r is not None:
+                sessions[show["id"]] = r.json()
+
+        if rng.random() < 0.2:
+            call("GET", "/users/{user_id}/sessions", f"/users/{user_id}/sessions")
+
+    return results
+
+
 class NotflixCLI(cmd.Cmd):
     intro = "\n🎬 Welcome to Notflix CLI. Write 'help' or '?' to see available commands.\n"
     prompt = f"{BLUE_COLOR}notflix> {RESET_COLOR}"
 
+    def __init__(self, *args, http=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # keep-alive connections reused by every command (and shared between commands in batch mode)
+        self.http = http or pooled_session(1)
+        self.cached_responses = {}
+
+    def get(self, url):
+        """GET that revalidates the last copy of `url` with its ETag instead of downloading it again"""
+        cached = self.cached_responses.get(url)
+        r = self.http.get(url, headers={"If-None-Match": cached.headers["ETag"]} if cached else {})
+        if r.status_code == 304:
+            return cached
+        if r.status_code == 200 and "ETag" in r.headers:
+            self.cached_responses[url] = r
+        return r
+
     # ----------------------------
     # COMANDOS DE SHOWS
     # ----------------------------
@@ -24,29 +113,29 @@ class NotflixCLI(cmd.Cmd):
 
         tokens = arg.strip().split()
         if not tokens:
-            print("Not valid format")
-            print(self.do_show.__doc__)
+            print("Not valid format", file=self.stdout)
+            print(self.do_show.__doc__, file=self.stdout)
             return
         
         if not tokens[0].isdigit():
             if tokens[0] == "list":
 
-                r = requests.get(f"{API_URL}/shows")
+                r = self.get(f"{API_URL}/shows")
 
                 if r.status_code != 200:
-                    print("Error:", r.text)
+                    print("Error:", r.text, file=self.stdout)
                 
                 for show in r.json():
-                    print(f"{show['id']}: {show['name']} ({show['gender']})")
+                    print(f"{show['id']}: {show['name']} ({show['gender']})", file=self.stdout)
             else:
-                print(f"Unknown action: {tokens[0]}")
-                print(self.do_show.__doc__)
+                print(f"Unknown action: {tokens[0]}", file=self.stdout)
+                print(self.do_show.__doc__, file=self.stdout)
 
             return
         
         if len(tokens) < 2:
-            print("Not valid format")
-            print(self.do_show.__doc__)
+            print("Not valid format", file=self.stdout)
+            print(self.do_show.__doc__, file=self.stdout)
             return
         
         show_id = int(tokens[0])
@@ -54,33 +143,33 @@ class NotflixCLI(cmd.Cmd):
 
         if action == "info":
 
-            r = requests.get(f"{API_URL}/shows/{show_id}")
+            r = self.get(f"{API_URL}/shows/{show_id}")
 
             if r.status_code != 200:
-                print("Show not found in catalog")
+                print("Show not found in catalog", file=self.stdout)
                 return
             
             show = r.json()
-            print(f"\n{show['name']}")
-            print(f"Description: {show['description']}")
-            print(f"Gender: {show['gender']}")
-            print(f"Seasons: {len(show['episodes'])} {show['episodes']}\n")
+            print(f"\n{show['name']}", file=self.stdout)
+            print(f"Description: {show['description']}", file=self.stdout)
+            print(f"Gender: {show['gender']}", file=self.stdout)
+            print(f"Seasons: {len(show['episodes'])} {show['episodes']}\n", file=self.stdout)
 
         elif action == "start":
 
-            r = requests.post(f"{API_URL}/shows/{show_id}/start")
+            r = self.http.post(f"{API_URL}/shows/{show_id}/start")
 
             if r.status_code != 200:
-                print("Error:", r.text)
+                print("Error:", r.text, file=self.stdout)
                 return
             
             data = r.json()
-            print(f"Session initialized (id={data['id']}) for {data['show']['name']}")
-            print(f"Starting on season {data['season']}, episode {data['episode']}")
+            print(f"Session initialized (id={data['id']}) for {data['show']['name']}", file=self.stdout)
+            print(f"Starting on season {data['season']}, episode {data['episode']}", file=self.stdout)
 
         else:
-            print(f"Unknown action: {action}")
-            print(self.do_show.__doc__)
+            print(f"Unknown action: {action}", file=self.stdout)
+            print(self.do_show.__doc__, file=self.stdout)
 
         return
 
@@ -97,8 +186,8 @@ class NotflixCLI(cmd.Cmd):
         
         tokens = arg.strip().split()
         if not tokens:
-            print("Not valid format")
-            print(self.do_show.__doc__)
+            print("Not valid format", file=self.stdout)
+            print(self.do_show.__doc__, file=self.stdout)
             return
         
         if not tokens[0].isdigit():
@@ -109,22 +198,22 @@ class NotflixCLI(cmd.Cmd):
                 if len(tokens) > 1 and tokens[1] in {"finished", "watching"}:
                     state = tokens[1]
 
-                r = requests.get(f"{API_URL}/sessions", params={"state": state} if state else {})
+                r = self.http.get(f"{API_URL}/sessions", params={"state": state} if state else {})
                 if r.status_code != 200:
-                    print("Error:", r.text)
+                    print("Error:", r.text, file=self.stdout)
                     return
                 
                 data = r.json()
                 if not data:
-                    print("No sessions")
+                    print("No sessions", file=self.stdout)
                     return
                 
                 for session in data:
-                    print(f"{session['id']} | {session['show']['name']} | S{session['season']}E{session['episode']} | {session['state']}")
+                    print(f"{session['id']} | {session['show']['name']} | S{session['season']}E{session['episode']} | {session['state']}", file=self.stdout)
                 
             else:
-                print("Not valid format")
-                print(self.do_session.__doc__)
+                print("Not valid format", file=self.stdout)
+                print(self.do_session.__doc__, file=self.stdout)
             
             return
         
@@ -132,111 +221,223 @@ class NotflixCLI(cmd.Cmd):
         action = tokens[1]
 
         if action == "info":
-            r = requests.get(f"{API_URL}/sessions/{session_id}")
+            r = self.get(f"{API_URL}/sessions/{session_id}")
 
             if r.status_code == 404:
-                print("That session does not exists!")
+                print("That session does not exists!", file=self.stdout)
                 return
             elif r.status_code != 200:
-                print("Error:", r.text)
+                print("Error:", r.text, file=self.stdout)
                 return
             
             session = r.json()
-            print("\nSession ID:", session["id"])
-            print("Show id:", session["show_id"])
-            print("State:", session["state"])
-            print("Season:", session["season"])
-            print("Episode:", session["episode"])
-            print("Started at:", session["start_date"])
-            print("Finished at:", session["end_date"], "\n")
+            print("\nSession ID:", session["id"], file=self.stdout)
+            print("Show id:", session["show_id"], file=self.stdout)
+            print("State:", session["state"], file=self.stdout)
+            print("Season:", session["season"], file=self.stdout)
+            print("Episode:", session["episode"], file=self.stdout)
+            print("Started at:", session["start_date"], file=self.stdout)
+            print("Finished at:", session["end_date"], "\n", file=self.stdout)
 
         elif action == "next":
-            r = requests.post(f"{API_URL}/sessions/{session_id}/next")
+            r = self.http.post(f"{API_URL}/sessions/{session_id}/next")
 
             if r.status_code == 400:
-                print("Show already finished! Restart session to watch again")
+                print("Show already finished! Restart session to watch again", file=self.stdout)
                 return
             elif r.status_code != 200:
-                print("Error:", r.text)
+                print("Error:", r.text, file=self.stdout)
                 return
             
             session = r.json()
             if session["state"] == "watching":
-                print(f"Episode watched. Next again to watch S{session['season']}E{session['episode']}")
+                print(f"Episode watched. Next again to watch S{session['season']}E{session['episode']}", file=self.stdout)
             else:
-                print(f"Episode watched. Show finished, congratulations!!")
+                print(f"Episode watched. Show finished, congratulations!!", file=self.stdout)
         
         elif action == "previous":
-            r = requests.post(f"{API_URL}/sessions/{session_id}/previous")
+            r = self.http.post(f"{API_URL}/sessions/{session_id}/previous")
 
             if r.status_code == 400:
-                print("Show already finished or this is the first episode and you can't go further!")
+                print("Show already finished or this is the first episode and you can't go further!", file=self.stdout)
                 return
             elif r.status_code != 200:
-                print("Error:", r.text)
+                print("Error:", r.text, file=self.stdout)
                 return
             
             session = r.json()
-            print(f"Moved back one episode to S{session['season']}E{session['episode']}")
+            print(f"Moved back one episode to S{session['season']}E{session['episode']}", file=self.stdout)
 
         elif action == "restart":
-            r = requests.post(f"{API_URL}/sessions/{session_id}/restart")
+            r = self.http.post(f"{API_URL}/sessions/{session_id}/restart")
 
             if r.status_code == 404:
-                print("Session does not exists!")
+                print("Session does not exists!", file=self.stdout)
                 return
             elif r.status_code != 200:
-                print("Error:", r.text)
+                print("Error:", r.text, file=self.stdout)
                 return
             
             session = r.json()
-            print(f"Restarted to S{session['season']}E{session['episode']}")
+            print(f"Restarted to S{session['season']}E{session['episode']}", file=self.stdout)
         
         elif action == "goto":
 
             if len(tokens[2:]) != 2:
-                print("Not valid format")
-                print(self.do_session.__doc__)
+                print("Not valid format", file=self.stdout)
+                print(self.do_session.__doc__, file=self.stdout)
                 return
             
             season, episode = tokens[2:]
 
-            r = requests.post(f"{API_URL}/sessions/{session_id}/goto", json={"season": season, "episode": episode})
+            r = self.http.post(f"{API_URL}/sessions/{session_id}/goto", json={"season": season, "episode": episode})
 
             if r.status_code == 400:
-                print("Show already finished! Restart session to watch again")
+                print("Show already finished! Restart session to watch again", file=self.stdout)
                 return
             elif r.status_code == 404:
-                print(f"S{season}E{episode} not found")
+                print(f"S{season}E{episode} not found", file=self.stdout)
                 return
             elif r.status_code != 200:
-                print("Error:", r.text)
+                print("Error:", r.text, file=self.stdout)
                 return
             
             session = r.json()
-            print(f"Moved to S{session['season']}E{session['episode']}")
+            print(f"Moved to S{session['season']}E{session['episode']}", file=self.stdout)
         
         elif action == "delete":
 
-            r = requests.delete(f"{API_URL}/sessions/{session_id}")
+            r = self.http.delete(f"{API_URL}/sessions/{session_id}")
 
             if r.status_code == 404:
-                print(f"That session does not exists!")
+                print(f"That session does not exists!", file=self.stdout)
                 return
             elif r.status_code != 204:
-                print("Error:", r.text)
+                print("Error:", r.text, file=self.stdout)
                 return
 
-            print(f"Session removed succesfully!")
+            print(f"Session removed succesfully!", file=self.stdout)
 
         else:
-            print(f"Unknown action: {action}")
+            print(f"Unknown action: {action}", file=self.stdout)
 
         return
 
+    # ----------------------------
+    # CARGA
+    # ----------------------------
+    def do_bench(self, arg):
+        """
+        bench [viewers] [seconds]   -> load test the API with concurrent viewers (default 10 viewers, 10 seconds)
+        """
+
+        tokens = arg.strip().split()
+        if len(tokens) > 2 or not all(token.isdigit() and int(token) > 0 for token in tokens):
+            print("Not valid format", file=self.stdout)
+            print(self.do_bench.__doc__, file=self.stdout)
+            return
+
+        viewers = int(tokens[0]) if tokens else 10
+        seconds = int(tokens[1]) if len(tokens) > 1 else 10
+
+        http = pooled_session(viewers)
+        r = http.get(f"{API_URL}/shows", params={"limit": 1000})
+        if r.status_code != 200:
+            print("Error:", r.text, file=self.stdout)
+            return
+
+        shows = [show for show in r.json()["items"] if show["episodes"]]
+        if not shows:
+            print("No shows in catalog", file=self.stdout)
+            return
+
+        print(f"Running {viewers} viewers for {seconds}s against {API_URL} ...", file=self.stdout)
+        deadline = time.perf_counter() + seconds
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=viewers) as executor:
+            runs = list(executor.map(lambda user_id: run_viewer(http, user_id, shows, deadline, random.Random(user_id)), range(1, viewers + 1)))
+        elapsed = time.perf_counter() - started
+        http.close()
+
+        endpoints = {}
+        for run in runs:
+            for endpoint, calls in run.items():
+                endpoints.setdefault(endpoint, []).extend(calls)
+
+        total = sum(len(calls) for calls in endpoints.values())
+        errors = sum(not ok for calls in endpoints.values() for _, ok in calls)
+        print(f"\n{total} requests in {elapsed:.1f}s -> {total / elapsed:.0f} req/s, errors: {errors} ({errors / max(total, 1):.1%})\n", file=self.stdout)
+        print(f"{'endpoint':<50} {'requests':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}", file=self.stdout)
+        for endpoint, calls in sorted(endpoints.items()):
+            latencies = sorted(seconds * 1000 for seconds, _ in calls)
+            failed = sum(not ok for _, ok in calls)
+            print(
+                f"{endpoint:<50} {len(calls):>8} {len(calls) / elapsed:>7.0f} {percentile(latencies, 50):>8.1f} "
+                f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} {failed / len(calls):>7.1%}",
+                file=self.stdout,
+            )
+        print(file=self.stdout)
+
     def emptyline(self):
         pass
 
 
+def ordering_key(command):
+    """Commands on the same session must keep their input order, so they share its id as key"""
+    tokens = command.split()
+    if len(tokens) > 1 and tokens[0] == "session" and tokens[1].isdigit():
+        return int(tokens[1])
+    return None
+
+
+def run_batch(lines, workers=16, out=sys.stdout, http=None):
+    """
+    Runs CLI commands without the prompt, one per line ('#' starts a comment). Independent
+    commands are sent concurrently over one pooled session, commands on the same session id
+    run one after another in input order, and the output of each command is printed in input
+    order as soon as it and all the commands before it are done.
+    """
+    commands = [line.strip() for line in lines]
+    commands = [command for command in commands if command and not command.startswith("#")]
+    shared = http or pooled_session(workers)
+    outputs = [Future() for _ in commands]
+
+    chains = {}
+    for index, command in enumerate(commands):
+        key = ordering_key(command)
+        chains.setdefault(("session", key) if key is not None else ("command", index), []).append(index)
+
+    def run_chain(indexes):
+        for index in indexes:
+            output = io.StringIO()
+            try:
+                NotflixCLI(stdout=output, http=shared).onecmd(commands[index])
+            except Exception as e:
+                print("Error:", e, file=output)
+            outputs[index].set_result(output.getvalue())
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for indexes in chains.values():
+            executor.submit(run_chain, indexes)
+        for command, output in zip(commands, outputs):
+            out.write(f"notflix> {command}\n{output.result()}")
+            out.flush()
+
+    if http is None:
+        shared.close()
+
+
 if __name__ == "__main__":
-    NotflixCLI().cmdloop()
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Notflix CLI: interactive prompt, or batch mode when given a script")
+    parser.add_argument("script", nargs="?", help="Run the commands in this file ('-' for stdin) and exit")
+    parser.add_argument("--workers", type=int, default=16, help="Commands sent concurrently in batch mode")
+    args = parser.parse_args()
+
+    if args.script is None:
+        NotflixCLI().cmdloop()
+    elif args.script == "-":
+        run_batch(sys.stdin, args.workers)
+    else:
+        with open(args.script, "r", encoding="utf-8") as f:
+            run_batch(f, args.workers)
\ No newline at end of file
@@ -1,34 +1,29 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from pathlib import Path
+import argparse
+import logging
 
-from api.database import SessionLocal
-from api.models import Show
+from api.database import engine
+from api.loader import iter_show_records, load_catalog, read_checkpoint
+from api.migrations import upgrade
 
-import json
 
+if __name__ == "__main__":
 
-db = SessionLocal()
+    parser = argparse.ArgumentParser(description="Load (or update) the show catalog from a JSON array or NDJSON file")
+    parser.add_argument("source", nargs="?", default="./source.json", type=Path)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--resume", action="store_true", help="Skip the records already committed by a previous interrupted run")
+    args = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
 
-if __name__ == "__main__":
+    upgrade(engine)
+
+    checkpoint = args.source.with_name(args.source.name + ".checkpoint")
+    skip = read_checkpoint(checkpoint) if args.resume else 0
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        report = load_catalog(engine, iter_show_records(f), batch_size=args.batch_size, skip=skip, checkpoint=checkpoint)
 
-    with open("./source.json", "r", encoding="utf-8") as f:
-        shows = json.loads(f.read())
-    
-    # print(shows)
-
-    shows_db = []
-    
-    for show in shows:
-        
-        show_db = Show(
-            name=show["name"],
-            description=show["description"],
-            gender=show["gender"],
-            episodes=[v for v in show["episodes"].values()]
-        )
-
-        shows_db.append(show_db)
-    
-    db.add_all(shows_db)
-    db.commit()
\ No newline at end of file
+    checkpoint.unlink(missing_ok=True)
+    print(f"{report.records} shows loaded ({report.skipped} skipped) in {report.seconds:.2f}s -> {report.rows_per_second:.0f} rows/s")
@@ -1,11 +1,20 @@
+import os
+
+# fail any test whose request goes over the route's declared query budget
+os.environ.setdefault("ENFORCE_QUERY_BUDGET", "1")
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from api.database import get_db
-from api.models import DecBase
+from api.database import get_db, get_read_db
+from api.shards import get_user_db
+from api.instrumentation import instrument_engine
+from api.migrations import upgrade
+from api.cache import catalog_cache
+from api.history import watch_events
 from api.main import app
 
 
@@ -16,12 +25,16 @@ def db_fixture():
         "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
     )
     TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-    DecBase.metadata.create_all(bind=engine)
+    instrument_engine(engine)
+    upgrade(engine)
+    catalog_cache.clear()
+    watch_events.start(engine)
 
     db = TestingSessionLocal()
     try:
         yield db
     finally:
+        watch_events.stop()
         db.close()
 
 
@@ -31,6 +44,49 @@ def client_fixture(db):
         yield db
 
     app.dependency_overrides[get_db] = get_db_override
+    app.dependency_overrides[get_user_db] = get_db_override
+    app.dependency_overrides[get_read_db] = get_db_override
     client = TestClient(app)
     yield client
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(name="file_sessionmaker")
+def file_sessionmaker_fixture(tmp_path):
+    # unlike the in-memory database, a file lets concurrent requests each use their own connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'shows.db'}", connect_args={"check_same_thread": False})
+    upgrade(engine)
+    catalog_cache.clear()
+    watch_events.start(engine)
+    try:
+        yield sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    finally:
+        watch_events.stop()
+        engine.dispose()
+
+
+@pytest.fixture(name="file_client")
+def file_client_fixture(file_sessionmaker):
+    def get_db_override():
+        with file_sessionmaker() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_db_override
+    app.dependency_overrides[get_user_db] = get_db_override
+    app.dependency_overrides[get_read_db] = get_db_override
+    client = TestClient(app)
+    yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(name="queries")
+def queries_fixture(db):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
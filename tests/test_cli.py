@@ -0,0 +1,75 @@
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+
+import io
+import random
+import time
+
+from cli import ordering_key, run_batch, run_viewer
+from tests.test_show import _add_show_to_db
+from tests.test_session import _add_session_to_db
+
+
+def test_ordering_key():
+
+    assert ordering_key("session 12 next") == 12
+    assert ordering_key("session 12 goto 1 2") == 12
+    assert ordering_key("session list watching") is None
+    assert ordering_key("show 3 start") is None
+
+
+def test_run_batch_keeps_order_per_session_and_prints_in_input_order(file_client: TestClient, file_sessionmaker: sessionmaker):
+
+    with file_sessionmaker() as db:
+        first = _add_show_to_db(db, "First show", "This is a dummy show", "dummy", [20])
+        second = _add_show_to_db(db, "Second show", "This is a dummy show", "dummy", [20])
+        first_id = _add_session_to_db(db, show_id=first.id).id
+        second_id = _add_session_to_db(db, show_id=second.id).id
+
+    script = [
+        "# advance both sessions",
+        *[f"session {first_id} next\n" for _ in range(5)],
+        "",
+        f"session {second_id} goto 1 10",
+        *[f"session {second_id} next" for _ in range(3)],
+        "show list",
+        f"session {first_id} info",
+        f"session {second_id} info",
+    ]
+    out = io.StringIO()
+    run_batch(script, workers=8, out=out, http=file_client)
+
+    blocks = out.getvalue().split("notflix> ")[1:]
+    assert [block.splitlines()[0] for block in blocks] == [line.strip() for line in script if line.strip() and not line.startswith("#")]
+    assert [block.splitlines()[1] for block in blocks[:5]] == [f"Episode watched. Next again to watch S1E{episode}" for episode in range(2, 7)]
+    assert [block.splitlines()[1] for block in blocks[6:9]] == [f"Episode watched. Next again to watch S1E{episode}" for episode in range(11, 14)]
+    assert "Episode: 6" in blocks[-2]
+    assert "Episode: 13" in blocks[-1]
+
+
+def test_run_viewer_never_jumps_to_a_season_without_episodes():
+
+    class FakeResponse:
+        status_code = 200
+
+        def __init__(self, content):
+            self.content = content
+
+        def json(self):
+            return self.content
+
+    gotos = []
+    session = {"id": 1, "show_id": 1, "state": "watching"}
+
+    class FakeHttp:
+        def request(self, method, url, json=None, **kwargs):
+            if url.endswith("/goto"):
+                gotos.append(json)
+            return FakeResponse([] if method == "GET" else session)
+
+    shows = [{"id": 1, "episodes": [0, 3, 0]}, {"id": 2, "episodes": []}]
+    results = run_viewer(FakeHttp(), 1, shows, time.perf_counter() + 0.05, random.Random(0))
+
+    assert gotos
+    assert {goto["season"] for goto in gotos} == {2}
+    assert all(ok for timings in results.values() for _, ok in timings)
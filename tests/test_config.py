@@ -0,0 +1,63 @@
+from sqlalchemy.exc import OperationalError
+import pytest
+
+from api.config import Settings
+from api.database import create_db_engine, read_sqlite_pragmas
+
+
+def test_settings_from_env():
+
+    settings = Settings.from_env({
+        "DATABASE_URL": "sqlite:///./other.db",
+        "POOL_SIZE": "20",
+        "POOL_TIMEOUT": "2.5",
+        "SQLITE_JOURNAL_MODE": "none",
+        "SQLITE_BUSY_TIMEOUT": "100",
+    })
+
+    assert settings.database_url == "sqlite:///./other.db"
+    assert settings.pool_size == 20
+    assert settings.pool_timeout == 2.5
+    assert settings.sqlite_journal_mode is None
+    assert settings.sqlite_busy_timeout == 100
+    assert settings.max_overflow == Settings().max_overflow
+
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+
+    engine = create_db_engine(Settings(database_url=f"sqlite:///{tmp_path / 'shows.db'}", sqlite_busy_timeout=1234))
+
+    pragmas = read_sqlite_pragmas(engine)
+    engine.dispose()
+
+    assert pragmas["journal_mode"] == "wal"
+    assert pragmas["synchronous"] == 1 # NORMAL
+    assert pragmas["busy_timeout"] == 1234
+
+
+def test_read_database_url_defaults_to_database_url():
+
+    settings = Settings.from_env({"DATABASE_URL": "sqlite:///./other.db", "READ_POOL_SIZE": "4"})
+    assert settings.effective_read_database_url == "sqlite:///./other.db"
+    assert settings.read_pool_size == 4
+
+    settings = Settings.from_env({"DATABASE_URL": "sqlite:///./other.db", "READ_DATABASE_URL": "sqlite:///./replica.db"})
+    assert settings.effective_read_database_url == "sqlite:///./replica.db"
+
+
+def test_read_engine_rejects_writes(tmp_path):
+
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'shows.db'}")
+    engine = create_db_engine(settings)
+    read_engine = create_db_engine(settings, read_only=True)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        connection.exec_driver_sql("INSERT INTO t VALUES (1)")
+
+    with read_engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT x FROM t").scalar() == 1
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        with pytest.raises(OperationalError, match="readonly"):
+            connection.exec_driver_sql("INSERT INTO t VALUES (2)")
+    read_engine.dispose()
+    engine.dispose()
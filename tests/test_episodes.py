@@ -0,0 +1,25 @@
+import pytest
+
+from api.episodes import EpisodeIndex
+
+
+def test_episode_index_converts_between_relative_and_absolute_positions():
+
+    index = EpisodeIndex((3, 0, 2, 4))
+
+    assert index.total == 9
+    positions = [(season, episode) for season, count in enumerate(index.episodes, start=1) for episode in range(1, count + 1)]
+    for absolute, (season, episode) in enumerate(positions, start=1):
+        assert index.to_absolute(season, episode) == absolute
+        assert index.from_absolute(absolute) == (season, episode)
+
+
+def test_episode_index_out_of_range_throws_error():
+
+    index = EpisodeIndex((3, 4))
+
+    with pytest.raises(ValueError):
+        index.from_absolute(0)
+
+    with pytest.raises(ValueError):
+        index.from_absolute(8)
@@ -0,0 +1,117 @@
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from fastapi import HTTPException
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import pytest
+
+from api import models
+from api.core import SessionState
+from api.group_commit import GroupCommitter, group_committer
+import api.crud.session as crud_session
+
+
+def test_jobs_share_a_transaction_and_get_their_own_outcome(file_sessionmaker: sessionmaker):
+
+    committer = GroupCommitter(window_us=50_000, max_batch=10)
+    committer.start(file_sessionmaker)
+
+    def insert(name):
+        def job(db):
+            db.add(models.Show(name=name, description="Dummy", gender="dummy", episodes=[1]))
+            return name
+        return job
+
+    def reject(db):
+        raise HTTPException(status_code=400, detail="rejected")
+
+    def broken(db):
+        db.execute(text("SELECT * FROM missing_table"))
+
+    jobs = [insert("A"), reject, insert("B"), broken, insert("C")]
+    barrier = Barrier(len(jobs))
+
+    def submit(job):
+        barrier.wait()
+        try:
+            return committer.submit(job)
+        except Exception as e:
+            return type(e).__name__
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            outcomes = list(executor.map(submit, jobs))
+    finally:
+        committer.stop()
+
+    assert outcomes == ["A", "HTTPException", "B", "OperationalError", "C"]
+    with file_sessionmaker() as db:
+        assert sorted(show.name for show in db.query(models.Show)) == ["A", "B", "C"]
+
+
+def test_concurrent_next_calls_are_group_committed(file_sessionmaker: sessionmaker):
+
+    with file_sessionmaker() as db:
+        shows = [models.Show(name=f"Show {i}", description="Dummy", gender="dummy", episodes=[3]) for i in range(8)]
+        db.add_all(shows)
+        db.flush()
+        db.add_all([models.Session(show_id=show.id, state=SessionState.watching) for show in shows])
+        db.commit()
+
+    window_us = group_committer.window_us
+    group_committer.window_us = 50_000
+    group_committer.start(file_sessionmaker)
+    barrier = Barrier(9)
+
+    def advance(session_id):
+        barrier.wait()
+        with file_sessionmaker() as db:
+            return crud_session.next_episode(db, session_id).episode
+
+    try:
+        with ThreadPoolExecutor(max_workers=9) as executor:
+            episodes = list(executor.map(advance, [1, 2, 3, 4, 5, 6, 7, 8, 1]))
+        with file_sessionmaker() as db, pytest.raises(HTTPException) as error:
+            crud_session.goto_episode(db, 1, season=2, episode=1)
+        assert error.value.status_code == 404
+        stats = group_committer.stats()
+    finally:
+        group_committer.stop()
+        group_committer.window_us = window_us
+
+    # session 1 was moved twice within the same group
+    assert sorted(episodes) == [2, 2, 2, 2, 2, 2, 2, 2, 3]
+    assert stats["jobs"] == 10
+    assert stats["batches"] < stats["jobs"]
+    with file_sessionmaker() as db:
+        assert db.get(models.Session, 1).episode == 3
+
+
+def test_jobs_submitted_while_stopping_are_not_lost(file_sessionmaker: sessionmaker):
+
+    committer = GroupCommitter(window_us=1_000, max_batch=4)
+    committer.start(file_sessionmaker)
+
+    def insert(i):
+        def job(db):
+            db.add(models.Show(name=f"Show {i}", description="Dummy", gender="dummy", episodes=[1]))
+            return i
+        return job
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(committer.submit, insert(i)) for i in range(100)]
+        committer.stop()
+        # no job may be left in the queue with nobody to run it
+        results = [future.result(timeout=5) for future in futures]
+
+    assert results == list(range(100))
+    with file_sessionmaker() as db:
+        assert db.query(models.Show).count() == 100
+
+
+def test_submit_before_start_throws_error():
+
+    with pytest.raises(RuntimeError):
+        GroupCommitter().submit(lambda db: None)
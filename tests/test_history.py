@@ -0,0 +1,88 @@
+from sqlalchemy import create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from datetime import datetime
+from threading import Event
+import time
+
+from api import models
+from api.core import SessionState
+from api.history import WatchEventBuffer
+from api.migrations import upgrade
+
+
+def _engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    upgrade(engine)
+    return engine
+
+
+def _event(session_id: int = 1, episode: int = 1):
+    return dict(session_id=session_id, show_id=1, action="next", season=1, episode=episode, state=SessionState.watching, created_at=datetime.today())
+
+
+def _episodes(engine):
+    with engine.connect() as connection:
+        return list(connection.execute(select(models.WatchEvent.episode).order_by(models.WatchEvent.id)).scalars())
+
+
+def test_buffer_writes_full_batches_and_flushes_on_stop():
+
+    engine = _engine()
+    buffer = WatchEventBuffer(batch_size=3, flush_interval=60)
+    buffer.start(engine)
+
+    for episode in range(1, 8):
+        buffer.record(**_event(episode=episode))
+    buffer.flush()
+    buffer.record(**_event(episode=8))
+    buffer.stop()
+
+    assert _episodes(engine) == list(range(1, 9))
+    # two full batches, the rest written by flush, then stop
+    assert buffer.stats() == {"pending": 0, "written": 8, "dropped": 0, "batches": 4}
+
+
+def test_buffer_writes_partial_batch_after_interval():
+
+    engine = _engine()
+    buffer = WatchEventBuffer(batch_size=100, flush_interval=0.05)
+    buffer.start(engine)
+    try:
+        buffer.record(**_event())
+        deadline = time.monotonic() + 2
+        while buffer.written < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert _episodes(engine) == [1]
+    finally:
+        buffer.stop()
+
+
+def test_buffer_drops_events_when_full():
+
+    engine = _engine()
+    buffer = WatchEventBuffer(batch_size=10, flush_interval=60, max_pending=2, put_timeout=0.01)
+    buffer.start(engine)
+    # park the writer thread so nothing leaves the queue
+    release = Event()
+    buffer._write = lambda batch, write=buffer._write: (release.wait(), write(batch))
+    buffer._queue.put(Event())
+    while buffer.pending():
+        time.sleep(0.01)
+
+    for episode in range(1, 5):
+        buffer.record(**_event(episode=episode))
+
+    assert buffer.dropped == 2
+    release.set()
+    buffer.stop()
+    assert _episodes(engine) == [1, 2]
+
+
+def test_record_without_writer_is_counted_as_dropped():
+
+    buffer = WatchEventBuffer()
+    buffer.record(**_event())
+
+    assert buffer.dropped == 1
+    assert buffer.flush()
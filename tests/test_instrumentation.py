@@ -0,0 +1,59 @@
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from fastapi.testclient import TestClient
+
+from copy import deepcopy
+from dataclasses import replace
+from time import sleep
+import logging
+
+import pytest
+
+import api.instrumentation as instrumentation
+from tests.test_show import _add_show_to_db
+
+
+def test_query_stats_headers_in_debug_mode(client: TestClient, db: Session, monkeypatch):
+
+    show = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+    show_id = show.id
+
+    response = client.get(f"/shows/{show_id}")
+    assert "x-query-count" not in response.headers
+
+    monkeypatch.setattr(instrumentation, "settings", replace(instrumentation.settings, debug=True))
+
+    response = client.post(f"/shows/{show_id}/start")
+
+    assert response.status_code == 200
+    assert response.headers["x-query-count"] == "2"
+    assert float(response.headers["x-query-time-ms"]) > 0
+
+
+def test_slow_queries_are_logged_with_query_plan(client: TestClient, db: Session, monkeypatch, caplog):
+
+    show = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+    monkeypatch.setattr(instrumentation, "settings", replace(instrumentation.settings, slow_query_ms=0))
+
+    with caplog.at_level(logging.WARNING, logger="instrumentation"):
+        client.get(f"/shows/{show.id}")
+
+    assert any("Slow query" in record.message and "Query plan" in record.message for record in caplog.records)
+
+
+def test_failed_statements_do_not_skew_query_stats(db: Session):
+
+    connection = db.connection()
+    info = deepcopy(dict(connection.info))
+
+    with instrumentation.track_queries() as stats:
+        for _ in range(3):
+            # after_cursor_execute never runs for these
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("SELECT * FROM missing_table")
+        sleep(0.2)
+        connection.exec_driver_sql("SELECT 1")
+
+    assert stats.count == 1
+    assert 0 < stats.seconds < 0.2 # timed from its own start, not from a failed statement's
+    assert connection.info == info # nothing outlives the failed statements on the pooled connection
@@ -0,0 +1,119 @@
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.pool import StaticPool
+
+import io
+import json
+
+from api import models
+from api.loader import iter_json_array, iter_show_records, load_catalog, read_checkpoint
+from api.migrations import upgrade
+
+
+SHOWS = [
+    {"name": "House of the Dragon", "description": "Precuela de Game of Thrones ...", "gender": "Fantasía / Drama", "episodes": {"1": 10, "2": 8}},
+    {"name": "The Boys", "description": "Un grupo de vigilantes ...", "gender": "Acción / Satira", "episodes": {"1": 8, "2": 8, "3": 8}},
+    {"name": "Stranger Things", "description": "Un grupo de niños ...", "gender": "Ciencia ficción", "episodes": [8, 9]},
+]
+
+
+def _engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    upgrade(engine)
+    return engine
+
+
+def _catalog(engine):
+    with engine.connect() as connection:
+        return {row.name: (row.description, row.episodes) for row in connection.execute(select(models.Show))}
+
+
+def test_iter_json_array_across_chunk_boundaries():
+
+    document = json.dumps(SHOWS, indent=2)
+
+    for chunk_size in (1, 7, 64, len(document)):
+        assert list(iter_json_array(io.StringIO(document), chunk_size=chunk_size)) == SHOWS
+
+
+def test_iter_show_records_reads_json_array_and_ndjson():
+
+    array = list(iter_show_records(io.StringIO(json.dumps(SHOWS))))
+    ndjson = list(iter_show_records(io.StringIO("\n".join(json.dumps(show) for show in SHOWS))))
+
+    assert array == ndjson
+    assert array[0]["episodes"] == [10, 8]
+
+
+def test_load_catalog_is_idempotent_and_updates_by_name():
+
+    engine = _engine()
+
+    load_catalog(engine, iter_show_records(io.StringIO(json.dumps(SHOWS))), batch_size=2)
+    updated = [dict(SHOWS[1], description="Updated")]
+    report = load_catalog(engine, iter_show_records(io.StringIO(json.dumps(SHOWS + updated))), batch_size=2)
+
+    catalog = _catalog(engine)
+
+    assert report.records == 4
+    assert report.batches == 2
+    assert len(catalog) == 3
+    assert catalog["The Boys"] == ("Updated", [8, 8, 8])
+
+
+def test_load_catalog_resumes_from_checkpoint(tmp_path):
+
+    engine = _engine()
+    checkpoint = tmp_path / "source.json.checkpoint"
+
+    load_catalog(engine, iter_show_records(io.StringIO(json.dumps(SHOWS[:2]))), batch_size=1, checkpoint=checkpoint)
+    assert read_checkpoint(checkpoint) == 2
+
+    report = load_catalog(engine, iter_show_records(io.StringIO(json.dumps(SHOWS))), batch_size=1, skip=read_checkpoint(checkpoint), checkpoint=checkpoint)
+
+    assert report.records == 1
+    assert report.skipped == 2
+    assert read_checkpoint(checkpoint) == 3
+    assert len(_catalog(engine)) == 3
+
+
+def test_load_catalog_keeps_search_index_in_sync():
+
+    engine = _engine()
+
+    load_catalog(engine, iter_show_records(io.StringIO(json.dumps(SHOWS))))
+    load_catalog(engine, iter_show_records(io.StringIO(json.dumps([dict(SHOWS[1], description="Superhéroes corruptos")]))))
+
+    with engine.connect() as connection:
+        def search(match):
+            return [row.name for row in connection.execute(text(
+                "SELECT shows.name FROM shows_fts JOIN shows ON shows.id = shows_fts.rowid WHERE shows_fts MATCH :match"
+            ), {"match": match})]
+
+        assert search("superheroes") == ["The Boys"]
+        assert search("vigilantes") == []
+        assert search("fantasia") == ["House of the Dragon"]
+
+
+def test_load_catalog_keeps_genres_in_sync():
+
+    engine = _engine()
+
+    load_catalog(engine, iter_show_records(io.StringIO(json.dumps(SHOWS))))
+    load_catalog(engine, iter_show_records(io.StringIO(json.dumps([dict(SHOWS[1], gender="Acción / Comedia")]))))
+
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT genres.key, shows.name FROM show_genres "
+            "JOIN genres ON genres.id = show_genres.genre_id JOIN shows ON shows.id = show_genres.show_id"
+        ))
+        genres = {}
+        for key, name in rows:
+            genres.setdefault(key, set()).add(name)
+
+    assert genres == {
+        "fantasia": {"House of the Dragon"},
+        "drama": {"House of the Dragon"},
+        "accion": {"The Boys"},
+        "comedia": {"The Boys"},
+        "ciencia ficcion": {"Stranger Things"},
+    }
@@ -0,0 +1,46 @@
+from dataclasses import replace
+import logging
+
+from api.config import settings
+from api.logs import DeferredQueueHandler, SamplingFilter, configure_logging, parse_levels, stop_logging
+
+
+def test_parse_levels():
+
+    assert parse_levels("crud:session=WARNING, routers:show=info,") == {"crud:session": "WARNING", "routers:show": "INFO"}
+    assert parse_levels("") == {}
+
+
+def test_sampling_filter_only_drops_low_levels():
+
+    sampling = SamplingFilter(rate=0.0)
+
+    def record(level):
+        return logging.LogRecord("routers:show", level, __file__, 1, "message", None, None)
+
+    assert not sampling.filter(record(logging.INFO))
+    assert not sampling.filter(record(logging.DEBUG))
+    assert sampling.filter(record(logging.WARNING))
+
+
+def test_async_logging_writes_from_listener_thread(capsys):
+
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    configure_logging(replace(settings, log_async=True, log_level="INFO", log_levels="crud:session=WARNING"))
+    try:
+        assert isinstance(logging.getLogger().handlers[0], DeferredQueueHandler)
+        assert logging.getLogger("crud:session").getEffectiveLevel() == logging.WARNING
+
+        logging.getLogger("routers:show").info("Show with id=%s returned succesfully", 42)
+        logging.getLogger("crud:session").info("Filtered out by the per-logger level")
+        stop_logging()
+
+        output = capsys.readouterr().err
+        assert "Show with id=42 returned succesfully" in output
+        assert "Filtered out" not in output
+    finally:
+        stop_logging()
+        logging.getLogger("crud:session").setLevel(logging.NOTSET)
+        root.handlers[:] = handlers
+        root.setLevel(level)
@@ -0,0 +1,44 @@
+from sqlalchemy.orm import Session
+from fastapi.testclient import TestClient
+
+from api.metrics import Histogram, stats_collector
+from tests.test_show import _add_show_to_db
+
+
+def test_metrics_endpoint_reports_route_latency_and_status(client: TestClient, db: Session):
+
+    show = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+    client.get(f"/shows/{show.id}")
+    client.get("/shows/9999")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/shows/{show_id}"}' in body
+    assert 'http_responses_total{method="GET",route="/shows/{show_id}",status="404"}' in body
+    assert 'http_response_size_bytes_bucket{method="GET",route="/shows/{show_id}",le="+Inf"}' in body
+    assert "http_requests_in_flight 1" in body # the /metrics request itself
+    assert "catalog_cache_hits_total" in body
+    assert "watch_events_pending" in body
+    assert "group_commit_batches_total" in body
+
+
+def test_histogram_buckets_are_cumulative():
+
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert list(histogram.cumulative()) == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.count == 4
+
+
+def test_stats_collector_reads_stats_on_every_call():
+
+    stats = {"hits": 1, "entries": 2}
+    collector = stats_collector("cache", lambda: stats, (("hits", "counter"), ("entries", "gauge")))
+    stats["hits"] = 3
+
+    assert list(collector()) == ["# TYPE cache_hits_total counter", "cache_hits_total 3", "# TYPE cache_entries gauge", "cache_entries 2"]
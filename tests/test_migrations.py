@@ -0,0 +1,105 @@
+from sqlalchemy import create_engine, inspect, text
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import pytest
+
+from api.migrations import LATEST_VERSION, MIGRATIONS, check_schema, current_version, upgrade
+from api.models import DecBase
+
+
+def _schema(engine):
+    inspector = inspect(engine)
+    return {
+        table: (
+            sorted(column["name"] for column in inspector.get_columns(table)),
+            sorted((index["name"], tuple(index["column_names"]), bool(index["unique"])) for index in inspector.get_indexes(table)),
+        )
+        for table in DecBase.metadata.tables
+    }
+
+
+def test_migrations_match_models():
+
+    migrated = create_engine("sqlite://")
+    upgrade(migrated)
+
+    declared = create_engine("sqlite://")
+    DecBase.metadata.create_all(bind=declared)
+
+    assert _schema(migrated) == _schema(declared)
+
+
+def test_upgrade_existing_database_keeps_data_and_is_idempotent(tmp_path):
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'shows.db'}")
+    # database created before migrations existed: baseline tables, no version table
+    with engine.begin() as connection:
+        for statement in MIGRATIONS[0][2]:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO shows (id, name, description, gender, episodes) VALUES (1, 'Dummy', 'Dummy', 'dummy', '[1]')"))
+        connection.execute(text("INSERT INTO sessions (id, show_id, season, episode, state) VALUES (1, 1, 1, 1, 'watching')"))
+
+    assert upgrade(engine) == LATEST_VERSION
+    assert upgrade(engine) == LATEST_VERSION
+
+    with engine.connect() as connection:
+        assert current_version(connection) == LATEST_VERSION
+        assert connection.execute(text("SELECT COUNT(*) FROM sessions")).scalar() == 1
+        # existing sessions belong to the default user
+        assert connection.execute(text("SELECT user_id FROM sessions")).scalar() == 0
+        # and survive the rebuild that stops session ids from being reused
+        assert "AUTOINCREMENT" in connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'sessions'")).scalar()
+        # shows loaded before the search index existed are indexed by the migration
+        assert connection.execute(text("SELECT rowid FROM shows_fts WHERE shows_fts MATCH 'dummy'")).scalar() == 1
+        # and their genres are parsed into the genre tables
+        assert connection.execute(text("SELECT show_id FROM show_genres JOIN genres ON genres.id = genre_id WHERE key = 'dummy'")).scalar() == 1
+
+    indexes = {index["name"]: index for index in inspect(engine).get_indexes("sessions")}
+    assert not indexes["ix_sessions_show_id"]["unique"]
+    assert indexes["ix_sessions_user_id_show_id"]["unique"]
+    assert "ix_sessions_state" in indexes
+    assert "ix_sessions_state_last_watched_at" not in indexes
+    assert indexes["ix_sessions_user_id_state_last_watched_at"]["column_names"] == ["user_id", "state", "last_watched_at"]
+    engine.dispose()
+
+
+def test_check_schema_reads_the_version_without_migrating(tmp_path):
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'shows.db'}")
+    with pytest.raises(RuntimeError, match="version 0"):
+        check_schema(engine)
+    assert inspect(engine).get_table_names() == []
+
+    upgrade(engine, target=LATEST_VERSION - 1)
+    with pytest.raises(RuntimeError, match=f"version {LATEST_VERSION - 1}"):
+        check_schema(engine)
+
+    upgrade(engine)
+    assert check_schema(engine) == LATEST_VERSION
+    engine.dispose()
+
+
+def test_concurrent_upgrades_apply_each_migration_once(tmp_path):
+
+    # every worker migrates on startup: uvicorn --workers N runs N upgrades at once
+    engines = [create_engine(f"sqlite:///{tmp_path / 'shows.db'}") for _ in range(4)]
+    barrier = Barrier(len(engines))
+
+    def run(engine):
+        barrier.wait()
+        return upgrade(engine)
+
+    with ThreadPoolExecutor(max_workers=len(engines)) as executor:
+        versions = list(executor.map(run, engines))
+
+    assert versions == [LATEST_VERSION] * len(engines)
+    with engines[0].connect() as connection:
+        applied = connection.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    declared = create_engine("sqlite://")
+    DecBase.metadata.create_all(bind=declared)
+    assert _schema(engines[0]) == _schema(declared)
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,74 @@
+from sqlalchemy.orm import Session
+from fastapi.testclient import TestClient
+
+from dataclasses import replace
+from datetime import datetime
+import json
+
+import pytest
+
+from api import serialization
+from api.config import settings
+from api.core import SessionState
+import api.routers.show as show_router
+import api.routers.session as session_router
+from tests.test_session import _add_dummy_shows_to_db, _add_session_to_db
+
+
+@pytest.fixture
+def fast_serialization(monkeypatch):
+    def toggle(enabled: bool):
+        fast_settings = replace(settings, fast_serialization=enabled)
+        monkeypatch.setattr(show_router, "settings", fast_settings)
+        monkeypatch.setattr(session_router, "settings", fast_settings)
+    return toggle
+
+
+def _get_both_ways(client: TestClient, toggle, url: str, **kwargs):
+    toggle(False)
+    standard = client.get(url, **kwargs)
+    toggle(True)
+    fast = client.get(url, **kwargs)
+    assert standard.status_code == fast.status_code == 200
+    return standard.json(), fast.json()
+
+
+def test_fast_serialization_matches_response_models(client: TestClient, db: Session, fast_serialization):
+
+    show1, show2 = _add_dummy_shows_to_db(db)
+    _add_session_to_db(db, show_id=show1.id, season=2, episode=3)
+    session = _add_session_to_db(db, show_id=show2.id, state=SessionState.finished)
+    session.start_date, session.end_date = datetime(2024, 1, 1, 20, 30), datetime(2024, 2, 1, 21, 0, 0, 123456)
+    db.commit()
+
+    for url, params in [
+        ("/shows", {}),
+        ("/shows", {"limit": 1}),
+        ("/shows", {"ids": [show2.id, show1.id]}),
+        ("/sessions", {}),
+        ("/sessions", {"state": "finished"}),
+        ("/sessions", {"limit": 1}),
+    ]:
+        standard, fast = _get_both_ways(client, fast_serialization, url, params=params)
+        assert fast == standard, url
+
+
+def test_fast_serialization_falls_back_to_stdlib_json(monkeypatch):
+
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    encoded = serialization.dumps({"name": "Acción", "start_date": datetime(2024, 1, 1, 20, 30)})
+
+    assert json.loads(encoded) == {"name": "Acción", "start_date": "2024-01-01T20:30:00"}
+
+
+def test_orjson_and_stdlib_json_encode_the_same(monkeypatch):
+
+    pytest.importorskip("orjson")
+    content = {"name": "Acción", "episodes": [3, 4], "start_date": datetime(2024, 1, 1, 20, 30), "end_date": None}
+
+    assert serialization.orjson is not None
+    encoded = serialization.dumps(content)
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    assert json.loads(encoded) == json.loads(serialization.dumps(content))
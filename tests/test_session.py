@@ -1,8 +1,13 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session, sessionmaker
 from fastapi.testclient import TestClient
 
+from concurrent.futures import ThreadPoolExecutor
+
 from api import models, schemas
+from api.cache import catalog_cache
 from api.core import SessionState
+import api.crud.session as crud_session
 from tests.test_show import _add_show_to_db
 
 
@@ -40,6 +45,77 @@ def test_get_all_sessions(client: TestClient, db: Session):
         assert data[i]["show_id"] == shows[i].id
 
 
+def test_get_all_sessions_loads_shows_in_a_single_query(client: TestClient, db: Session, queries: list):
+
+    shows = [_add_show_to_db(db, f"Show {i}", "Dummy", "dummy", [1]) for i in range(20)]
+    for show in shows:
+        _add_session_to_db(db, show_id=show.id)
+    db.expunge_all()
+    queries.clear()
+
+    response = client.get("/sessions")
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert len(data) == len(shows)
+    assert all(session["show"]["name"] for session in data)
+    assert len(queries) == 1
+
+
+def test_continue_watching_orders_by_last_activity(client: TestClient, db: Session, queries: list):
+
+    shows = [_add_show_to_db(db, f"Show {i}", "Dummy", "dummy", [2, 2]) for i in range(4)]
+    sessions = [client.post(f"/shows/{show.id}/start").json() for show in shows]
+    client.post(f"/sessions/{sessions[1]['id']}/next")
+    client.post(f"/sessions/{sessions[3]['id']}/goto", json={"season": 2, "episode": 1})
+    client.post(f"/sessions/{sessions[0]['id']}/restart")
+    client.post(f"/sessions/{sessions[3]['id']}/goto", json={"season": 2, "episode": 2})
+    client.post(f"/sessions/{sessions[3]['id']}/next")
+    db.expunge_all()
+    queries.clear()
+
+    response = client.get("/sessions/continue", params={"limit": 2})
+
+    data = response.json()
+
+    assert response.status_code == 200
+    # session 3 finished the show, so it is not in the list
+    assert [session["id"] for session in data] == [sessions[0]["id"], sessions[1]["id"]]
+    assert data[0]["show"]["name"] == "Show 0"
+    assert data[0]["last_watched_at"] > data[1]["last_watched_at"]
+    assert len(queries) == 1
+
+    plan = " ".join(row[-1] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {queries[0]}", (0, "watching", 2, 0)))
+    assert "ix_sessions_user_id_state_last_watched_at" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_session_history_is_paginated_in_order(client: TestClient, db: Session):
+
+    show, *_ = _add_dummy_shows_to_db(db)
+    session = client.post(f"/shows/{show.id}/start").json()
+    client.post(f"/sessions/{session['id']}/next")
+    client.post(f"/sessions/{session['id']}/goto", json={"season": 3, "episode": 2})
+    client.post(f"/sessions/{session['id']}/previous")
+    client.post("/sessions/batch", json=[{"id": session["id"], "action": "restart"}, {"id": 999, "action": "next"}])
+
+    events, cursor = [], None
+    while True:
+        response = client.get(f"/sessions/{session['id']}/history", params={"limit": 2, **({"after": cursor} if cursor else {})})
+        assert response.status_code == 200
+        data = response.json()
+        events += data["items"]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [(event["action"], event["season"], event["episode"]) for event in events] == [
+        ("start", 1, 1), ("next", 1, 2), ("goto", 3, 2), ("previous", 3, 1), ("restart", 1, 1),
+    ]
+    assert client.get("/sessions/999/history").status_code == 404
+
+
 def test_get_sessions_filtered_by_state(client: TestClient, db: Session):
 
     show1, show2 = _add_dummy_shows_to_db(db)
@@ -74,6 +150,139 @@ def test_get_sessions_filtered_by_unknown_state_throws_error(client: TestClient,
     assert response.status_code == 422 # Unprocessable entity
 
 
+def test_get_sessions_paginated(client: TestClient, db: Session):
+
+    shows = [_add_show_to_db(db, f"Show {i}", "Dummy", "dummy", [1]) for i in range(5)]
+    sessions = [_add_session_to_db(db, show_id=show.id, state=SessionState.finished if i % 2 else SessionState.watching) for i, show in enumerate(shows)]
+
+    response = client.get("/sessions?state=watching&limit=2")
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [session["id"] for session in data["items"]] == [sessions[0].id, sessions[2].id]
+    assert data["next_cursor"] is not None
+
+    response = client.get(f"/sessions?state=watching&limit=2&after={data['next_cursor']}")
+
+    data = response.json()
+
+    assert [session["id"] for session in data["items"]] == [sessions[4].id]
+    assert data["next_cursor"] is None
+
+
+def test_get_sessions_by_ids(client: TestClient, db: Session):
+
+    shows = [_add_show_to_db(db, f"Show {i}", "Dummy", "dummy", [1]) for i in range(3)]
+    sessions = [_add_session_to_db(db, show_id=show.id) for show in shows]
+
+    response = client.get(f"/sessions?ids={sessions[0].id}&ids={sessions[2].id}&ids=999")
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [session["id"] for session in data] == [sessions[0].id, sessions[2].id]
+
+
+def test_get_sessions_by_ids_filters_state_in_the_query(client: TestClient, db: Session, queries: list):
+
+    shows = [_add_show_to_db(db, f"Show {i}", "Dummy", "dummy", [1]) for i in range(3)]
+    sessions = [_add_session_to_db(db, show_id=show.id, state=state) for show, state in zip(shows, [SessionState.watching, SessionState.finished, SessionState.watching])]
+    queries.clear()
+
+    response = client.get(f"/sessions?ids={sessions[0].id}&ids={sessions[1].id}&ids={sessions[2].id}&state=finished")
+
+    assert response.status_code == 200
+    assert [session["id"] for session in response.json()] == [sessions[1].id]
+    assert "state" in queries[-1].split("WHERE", 1)[1]
+
+
+def test_get_sessions_by_ids_with_pagination_throws_error(client: TestClient):
+
+    assert client.get("/sessions?ids=1&limit=10").status_code == 422
+    assert client.get("/sessions?ids=1&after=eyJpZCI6IDF9").status_code == 422
+
+
+def test_apply_batch_in_a_single_commit(client: TestClient, db: Session, queries: list):
+
+    show1, show2 = _add_dummy_shows_to_db(db)
+    session1 = _add_session_to_db(db, show_id=show1.id)
+    session2 = _add_session_to_db(db, show_id=show2.id)
+    session1_id, session2_id = session1.id, session2.id
+    queries.clear()
+
+    operations = [
+        {"id": session1_id, "action": "next"},
+        {"id": session1_id, "action": "next"},
+        {"id": session2_id, "action": "goto", "args": {"season": 2, "episode": 5}},
+        {"id": session2_id, "action": "previous"},
+        {"id": session1_id, "action": "seek", "args": {"absolute": 500}},
+        {"id": 999, "action": "restart"},
+    ]
+    response = client.post("/sessions/batch", json=operations)
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [result["status_code"] for result in data] == [200, 200, 200, 200, 404, 404]
+    assert [result["ok"] for result in data] == [True, True, True, True, False, False]
+    assert (data[0]["session"]["season"], data[0]["session"]["episode"]) == (1, 2)
+    assert (data[1]["session"]["season"], data[1]["session"]["episode"]) == (1, 3)
+    assert (data[3]["session"]["season"], data[3]["session"]["episode"]) == (2, 4)
+    assert sum(statement.startswith("UPDATE") for statement in queries) == 4 # one compare-and-swap per applied operation
+
+    db.expire_all()
+    assert (db.get(models.Session, session1_id).episode, db.get(models.Session, session2_id).episode) == (3, 4)
+
+
+def test_apply_batch_issues_one_update_per_operation(client: TestClient, db: Session, queries: list):
+
+    shows = [_add_show_to_db(db, f"Show {i}", "Dummy", "dummy", [100]) for i in range(5)]
+    session_ids = [_add_session_to_db(db, show_id=show.id).id for show in shows]
+
+    for size in (1, 10, 50):
+        queries.clear()
+        response = client.post("/sessions/batch", json=[{"id": session_ids[i % 5], "action": "next"} for i in range(size)])
+
+        assert all(result["ok"] for result in response.json())
+        # sessions + catalog version + shows, loaded once for the whole batch
+        assert len(queries) <= 3 + size
+
+
+def test_apply_batch_rereads_sessions_moved_after_the_bulk_load(file_sessionmaker: sessionmaker):
+
+    with file_sessionmaker() as db:
+        show = _add_show_to_db(db, "Dummy show", "This is a dummy show", "dummy", [100])
+        session_id = _add_session_to_db(db, show_id=show.id).id
+    engine = file_sessionmaker.kw["bind"]
+    moved = []
+
+    def move_before_first_update(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE") and not moved:
+            moved.append(True)
+            # another writer commits between the batch's read and its first write
+            with file_sessionmaker() as other:
+                other.execute(update(models.Session).where(models.Session.id == session_id).values(episode=10))
+                other.commit()
+
+    event.listen(engine, "before_cursor_execute", move_before_first_update)
+    try:
+        with file_sessionmaker() as db:
+            results = crud_session.apply_batch(db, [schemas.SessionOperation(id=session_id, action="next")] * 2)
+    finally:
+        event.remove(engine, "before_cursor_execute", move_before_first_update)
+
+    assert [result.status_code for result in results] == [200, 200]
+    assert [result.session.episode for result in results] == [11, 12]
+
+
+def test_apply_batch_with_invalid_args_throws_error(client: TestClient, db: Session):
+
+    response = client.post("/sessions/batch", json=[{"id": 1, "action": "goto", "args": {"season": 2}}])
+
+    assert response.status_code == 422
+
+
 def test_get_session_by_id(client: TestClient, db: Session):
 
     show, *_ = _add_dummy_shows_to_db(db)
@@ -90,6 +299,26 @@ def test_get_session_by_id(client: TestClient, db: Session):
     assert data["state"] == session.state
 
 
+def test_get_session_by_id_with_matching_etag_returns_not_modified(client: TestClient, db: Session):
+
+    show, *_ = _add_dummy_shows_to_db(db)
+    session = _add_session_to_db(db, show_id=show.id)
+
+    response = client.get(f"/sessions/{session.id}")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = client.get(f"/sessions/{session.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.post(f"/sessions/{session.id}/next")
+
+    response = client.get(f"/sessions/{session.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["episode"] == 2
+    assert response.headers["etag"] != etag
+
+
 def test_get_not_existing_session_throws_error(client: TestClient, db: Session):
 
     response = client.get(f"/sessions/200")
@@ -114,6 +343,69 @@ def test_next_episode(client: TestClient, db: Session):
     assert data["episode"] == 2
 
 
+def test_next_episode_loads_show_with_bounded_queries(client: TestClient, db: Session, queries: list):
+
+    show, *_ = _add_dummy_shows_to_db(db)
+    session = _add_session_to_db(db, show_id=show.id)
+    session_id, show_name = session.id, show.name
+    db.expunge_all()
+    queries.clear()
+
+    response = client.post(f"/sessions/{session_id}/next")
+
+    assert response.status_code == 200
+    assert response.json()["show"]["name"] == show_name
+    assert len(queries) <= 4 # select + catalog version + show (catalog cache miss) + update ... returning
+
+
+def test_next_episode_follows_catalog_changes_from_another_process(client: TestClient, db: Session, monkeypatch):
+
+    monkeypatch.setattr(catalog_cache, "sync_interval", 0)
+    show = _add_show_to_db(db, "Dummy show", "This is a dummy show", "dummy", [3])
+    session_id, show_id = _add_session_to_db(db, show_id=show.id).id, show.id
+    assert client.post(f"/sessions/{session_id}/next").json()["episode"] == 2
+
+    # another worker or a catalog load changes the show: this process is never told
+    db.execute(update(models.Show).where(models.Show.id == show_id).values(episodes=[2, 5]))
+    db.commit()
+
+    data = client.post(f"/sessions/{session_id}/next").json()
+    assert (data["season"], data["episode"]) == (2, 1)
+
+
+def test_concurrent_next_episode_does_not_lose_updates(file_client: TestClient, file_sessionmaker: sessionmaker):
+
+    with file_sessionmaker() as db:
+        show = _add_show_to_db(db, "Dummy show", "This is a dummy show", "dummy", [100])
+        session_id = _add_session_to_db(db, show_id=show.id).id
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(lambda _: file_client.post(f"/sessions/{session_id}/next"), range(40)))
+
+    assert {response.status_code for response in responses} <= {200, 409}
+    advanced = sum(response.status_code == 200 for response in responses)
+    assert max(response.json()["episode"] for response in responses if response.status_code == 200) == 1 + advanced
+
+
+def test_concurrent_batch_and_next_episode_do_not_lose_updates(file_client: TestClient, file_sessionmaker: sessionmaker):
+
+    with file_sessionmaker() as db:
+        show = _add_show_to_db(db, "Dummy show", "This is a dummy show", "dummy", [500])
+        session_id = _add_session_to_db(db, show_id=show.id).id
+
+    def advance(i):
+        if i % 2:
+            return [file_client.post(f"/sessions/{session_id}/next").status_code]
+        return [result["status_code"] for result in file_client.post("/sessions/batch", json=[{"id": session_id, "action": "next"}] * 3).json()]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        status_codes = [code for codes in executor.map(advance, range(40)) for code in codes]
+
+    assert set(status_codes) <= {200, 409}
+    with file_sessionmaker() as db:
+        assert db.get(models.Session, session_id).episode == 1 + status_codes.count(200)
+
+
 def test_next_episode_on_last_episode_set_session_finished(client: TestClient, db: Session):
 
     show = _add_show_to_db(db, "Dummy show", "This is a dummy show", "dummy", [1])
@@ -259,6 +551,73 @@ def test_goto_unexisting_episode_throws_error(client: TestClient, db: Session):
     assert response.status_code == 404
 
 
+def test_skip_episodes(client: TestClient, db: Session):
+
+    show = _add_show_to_db(db, "Dummy show", "This is a dummy show", "dummy", [2, 3, 4])
+    session = _add_session_to_db(db, show_id=show.id)
+
+    response = client.post(f"/sessions/{session.id}/skip?n=4")
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["season"] == 2
+    assert data["episode"] == 3
+    assert data["progress"] == 4 / 9
+
+    response = client.post(f"/sessions/{session.id}/skip?n=-3")
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["season"] == 1
+    assert data["episode"] == 2
+
+
+def test_skip_past_last_episode_set_session_finished(client: TestClient, db: Session):
+
+    show = _add_show_to_db(db, "Dummy show", "This is a dummy show", "dummy", [2, 3])
+    session = _add_session_to_db(db, show_id=show.id)
+
+    response = client.post(f"/sessions/{session.id}/skip?n=10")
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["season"] == 2
+    assert data["episode"] == 3
+    assert data["state"] == SessionState.finished
+    assert data["progress"] == 1.0
+
+
+def test_skip_before_first_episode_throws_error(client: TestClient, db: Session):
+
+    show = _add_show_to_db(db, "Dummy show", "This is a dummy show", "dummy", [2, 3])
+    session = _add_session_to_db(db, show_id=show.id, season=1, episode=2)
+
+    response = client.post(f"/sessions/{session.id}/skip?n=-2")
+
+    assert response.status_code == 400
+
+
+def test_seek_absolute_episode(client: TestClient, db: Session):
+
+    show = _add_show_to_db(db, "Dummy show", "This is a dummy show", "dummy", [2, 3])
+    session = _add_session_to_db(db, show_id=show.id)
+
+    response = client.post(f"/sessions/{session.id}/seek?absolute=3")
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["season"] == 2
+    assert data["episode"] == 1
+
+    response = client.post(f"/sessions/{session.id}/seek?absolute=6")
+
+    assert response.status_code == 404
+
+
 def test_restart_session(client: TestClient, db: Session):
 
     show, *_ = _add_dummy_shows_to_db(db)
@@ -1,7 +1,10 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from fastapi.testclient import TestClient
 
 from api import models, schemas
+from api.cache import catalog_cache
+import api.crud.show as crud_show
 
 
 def _add_show_to_db(db: Session, name: str, description: str, gender: str, episodes: list[int]):
@@ -28,6 +31,19 @@ def test_get_all_shows(client: TestClient, db: Session):
     assert data[1]["name"] == "Peaky Blinders"
 
 
+def test_get_shows_by_ids(client: TestClient, db: Session):
+
+    show1 = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+    show2 = _add_show_to_db(db, name="Peaky Blinders", description="Ambientada en Birmingham ...", gender="Mafia", episodes=[8, 7])
+
+    response = client.get(f"/shows?ids={show2.id}&ids={show1.id}&ids=999")
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [show["name"] for show in data] == ["Peaky Blinders", "Breaking Bad"]
+
+
 def test_get_show_by_id(client: TestClient, db: Session):
 
     show = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
@@ -70,4 +86,212 @@ def test_start_already_started_show_throws_error(client: TestClient, db: Session
 
     response = client.post(f"/shows/{show.id}/start")
 
-    assert response.status_code == 409
\ No newline at end of file
+    assert response.status_code == 409
+
+def test_get_shows_paginated(client: TestClient, db: Session):
+
+    for i in range(5):
+        _add_show_to_db(db, name=f"Show {i}", description="Dummy", gender="dummy", episodes=[1])
+
+    response = client.get("/shows?limit=2")
+
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [show["name"] for show in data["items"]] == ["Show 0", "Show 1"]
+    assert data["next_cursor"] is not None
+
+    response = client.get(f"/shows?limit=2&after={data['next_cursor']}")
+    data = response.json()
+
+    assert [show["name"] for show in data["items"]] == ["Show 2", "Show 3"]
+
+    response = client.get(f"/shows?limit=2&after={data['next_cursor']}")
+    data = response.json()
+
+    assert [show["name"] for show in data["items"]] == ["Show 4"]
+    assert data["next_cursor"] is None
+
+
+def test_get_shows_with_invalid_cursor_throws_error(client: TestClient, db: Session):
+
+    response = client.get("/shows?limit=2&after=not-a-cursor")
+
+    assert response.status_code == 400
+
+
+def test_get_show_by_id_is_served_from_catalog_cache(client: TestClient, db: Session, queries: list):
+
+    show = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+    show_id = show.id
+
+    response = client.get(f"/shows/{show_id}")
+    assert response.status_code == 200
+
+    queries.clear()
+    response = client.get(f"/shows/{show_id}")
+
+    assert response.status_code == 200
+    assert response.json()["episodes"] == [3, 4, 3]
+    assert len(queries) == 1 # only the catalog version check
+    assert catalog_cache.stats()["hits"] == 1
+
+
+def test_create_show_invalidates_catalog_cache(client: TestClient, db: Session):
+
+    _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+
+    response = client.get("/shows")
+    assert len(response.json()) == 1
+
+    crud_show.create_show(db, schemas.ShowCreate(name="Peaky Blinders", description="Ambientada en Birmingham ...", gender="Mafia", episodes=[8, 7]))
+
+    response = client.get("/shows")
+    assert len(response.json()) == 2
+
+
+def test_catalog_written_by_another_process_invalidates_catalog_cache(client: TestClient, db: Session):
+
+    _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+    assert len(client.get("/shows").json()) == 1
+    assert len(client.get("/shows", params={"limit": 10}).json()["items"]) == 1
+
+    # a catalog load or another worker: the local cache is never told
+    db.execute(insert(models.Show).values(name="Peaky Blinders", description="Ambientada en Birmingham ...", gender="Mafia", episodes=[8, 7]))
+    db.commit()
+
+    assert len(client.get("/shows").json()) == 2
+    assert len(client.get("/shows", params={"limit": 10}).json()["items"]) == 2
+
+
+
+def test_get_shows_with_matching_etag_returns_not_modified_with_only_the_version_check(client: TestClient, db: Session, queries: list):
+
+    _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+
+    response = client.get("/shows")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"].startswith("public")
+
+    queries.clear()
+    response = client.get("/shows", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert len(queries) == 1
+
+    response = client.get("/shows", params={"limit": 1}, headers={"If-None-Match": etag})
+    assert response.status_code == 200 # the tag covers the query string too
+
+
+def test_create_show_changes_catalog_etag(client: TestClient, db: Session):
+
+    show = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+
+    etag = client.get(f"/shows/{show.id}").headers["etag"]
+
+    crud_show.create_show(db, schemas.ShowCreate(name="Peaky Blinders", description="Ambientada en Birmingham ...", gender="Mafia", episodes=[8, 7]))
+
+    response = client.get(f"/shows/{show.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_search_shows_ranks_name_matches_first(client: TestClient, db: Session):
+
+    _add_show_to_db(db, name="Peaky Blinders", description="Una familia de gánsteres en Birmingham ...", gender="Mafia", episodes=[6, 6])
+    _add_show_to_db(db, name="Los Soprano", description="El jefe de una familia de la mafia ...", gender="Drama", episodes=[13, 13])
+    _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+
+    response = client.get("/shows/search", params={"q": "mafia"})
+
+    assert response.status_code == 200
+    assert [show["name"] for show in response.json()["items"]] == ["Peaky Blinders", "Los Soprano"]
+
+    # accents are ignored and the last word matches as a prefix
+    response = client.get("/shows/search", params={"q": "quimic"})
+    assert [show["name"] for show in response.json()["items"]] == ["Breaking Bad"]
+
+    response = client.get("/shows/search", params={"q": "?!"})
+    assert response.json() == {"items": [], "next_cursor": None}
+
+
+def test_search_shows_paginated(client: TestClient, db: Session):
+
+    for i in range(5):
+        _add_show_to_db(db, name=f"Show {i}", description="Una serie de prueba", gender="Drama", episodes=[1])
+
+    names, cursor = [], None
+    while True:
+        response = client.get("/shows/search", params={"q": "prueba", "limit": 2, **({"after": cursor} if cursor else {})})
+        assert response.status_code == 200
+        data = response.json()
+        names += [show["name"] for show in data["items"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(names) == [f"Show {i}" for i in range(5)]
+
+
+def test_create_show_is_searchable(client: TestClient, db: Session):
+
+    assert client.get("/shows/search", params={"q": "birmingham"}).json()["items"] == []
+
+    crud_show.create_show(db, schemas.ShowCreate(name="Peaky Blinders", description="Ambientada en Birmingham ...", gender="Mafia", episodes=[8, 7]))
+
+    assert [show["name"] for show in client.get("/shows/search", params={"q": "birmingham"}).json()["items"]] == ["Peaky Blinders"]
+
+
+def test_get_shows_by_genre(client: TestClient, db: Session):
+
+    crud_show.create_show(db, schemas.ShowCreate(name="The Boys", description="Un grupo de vigilantes ...", gender="Acción / Satira / Superhéroes", episodes=[8, 8]))
+    crud_show.create_show(db, schemas.ShowCreate(name="Breaking Bad", description="Walter White es un químico ...", gender="Acción / Drama", episodes=[3, 4, 3]))
+    crud_show.create_show(db, schemas.ShowCreate(name="Peaky Blinders", description="Ambientada en Birmingham ...", gender="Drama / Mafia", episodes=[8, 7]))
+
+    def names(**params):
+        response = client.get("/shows", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        return [show["name"] for show in (data["items"] if isinstance(data, dict) else data)]
+
+    # case and accents don't matter
+    assert names(genre="accion") == ["The Boys", "Breaking Bad"]
+    assert names(genre=["Acción", "mafia"]) == ["The Boys", "Breaking Bad", "Peaky Blinders"]
+    assert names(genre=["Acción", "drama"], genre_match="all") == ["Breaking Bad"]
+    assert names(genre="Terror") == []
+    assert names(genre=["drama", "acción"], limit=2) == ["The Boys", "Breaking Bad"]
+
+    cursor = client.get("/shows", params={"genre": ["drama", "acción"], "limit": 2}).json()["next_cursor"]
+    assert names(genre=["drama", "acción"], limit=2, after=cursor) == ["Peaky Blinders"]
+
+
+def test_get_genres_with_counts(client: TestClient, db: Session):
+
+    crud_show.create_show(db, schemas.ShowCreate(name="The Boys", description="Un grupo de vigilantes ...", gender="Acción / Superhéroes", episodes=[8, 8]))
+    crud_show.create_show(db, schemas.ShowCreate(name="Breaking Bad", description="Walter White es un químico ...", gender="accion / Drama", episodes=[3, 4, 3]))
+
+    response = client.get("/genres")
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"name": "Acción", "key": "accion", "shows": 2},
+        {"name": "Drama", "key": "drama", "shows": 1},
+        {"name": "Superhéroes", "key": "superheroes", "shows": 1},
+    ]
+
+
+def test_catalog_written_by_another_process_changes_catalog_etag(client: TestClient, db: Session):
+
+    _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+    etag = client.get("/shows").headers["etag"]
+    catalog_cache.clear() # a restarted worker, or another one, tags the same catalog alike
+    assert client.get("/shows", headers={"If-None-Match": etag}).status_code == 304
+
+    db.execute(insert(models.Show).values(name="Peaky Blinders", description="Ambientada en Birmingham ...", gender="Mafia", episodes=[8, 7]))
+    db.commit()
+
+    response = client.get("/shows", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
@@ -0,0 +1,64 @@
+from pathlib import Path
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _run(code: str, tmp_path, **env) -> str:
+    environ = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'shows.db'}", "LOG_ASYNC": "0", **env}
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=environ, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_import_does_not_touch_the_database(tmp_path):
+
+    _run("import api.main", tmp_path)
+
+    assert not (tmp_path / "shows.db").exists()
+
+
+def test_import_does_not_start_the_log_listener(tmp_path):
+
+    code = "import threading, api.main, api.logs; print(api.logs._listener is None, threading.active_count())"
+
+    assert _run(code, tmp_path, LOG_ASYNC="1").split() == ["True", "1"]
+
+
+def test_startup_upgrades_schema_and_warms_up(tmp_path):
+
+    code = """
+import json
+from fastapi.testclient import TestClient
+from api.main import app
+from api.cache import catalog_cache
+from api.database import engine
+from api.migrations import current_version
+with TestClient(app) as client:
+    with engine.connect() as connection:
+        version = current_version(connection)
+    print(json.dumps({"version": version, "cached": catalog_cache.get_list("all") is not None, "pool": engine.pool.checkedin()}))
+"""
+    report = json.loads(_run(code, tmp_path, WARM_UP="1", POOL_SIZE="3").splitlines()[-1])
+
+    assert report["version"] > 0
+    assert report["cached"]
+    assert report["pool"] == 3
+
+
+def test_startup_without_upgrade_fails_on_unmigrated_database(tmp_path):
+
+    code = """
+from fastapi.testclient import TestClient
+from api.main import app
+try:
+    with TestClient(app):
+        pass
+except RuntimeError as e:
+    print(e)
+"""
+    assert "run the migrations" in _run(code, tmp_path, SCHEMA_UPGRADE="0")
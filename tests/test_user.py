@@ -0,0 +1,114 @@
+from sqlalchemy.orm import Session, sessionmaker
+from fastapi.testclient import TestClient
+
+from collections import Counter
+from dataclasses import replace
+
+from api import models
+from api.config import settings
+from api.main import app
+from api.shards import SessionStore, get_user_db, shard_for
+from tests.test_show import _add_show_to_db
+
+
+def test_users_have_their_own_sessions(client: TestClient, db: Session):
+
+    show = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+
+    alice = client.post(f"/users/1/shows/{show.id}/start").json()
+    bob = client.post(f"/users/2/shows/{show.id}/start").json()
+
+    assert alice["user_id"] == 1 and bob["user_id"] == 2
+    assert alice["show"]["name"] == "Breaking Bad"
+    # the same show can be started once per user
+    assert client.post(f"/users/1/shows/{show.id}/start").status_code == 409
+    assert client.post("/users/1/shows/999/start").status_code == 404
+
+    response = client.post(f"/users/1/sessions/{alice['id']}/next")
+    assert response.status_code == 200
+    assert response.json()["episode"] == 2
+
+    # a user can't see nor touch someone else's sessions
+    assert client.get(f"/users/2/sessions/{alice['id']}").status_code == 404
+    assert client.post(f"/users/2/sessions/{alice['id']}/next").status_code == 404
+    assert client.delete(f"/users/2/sessions/{alice['id']}").status_code == 404
+
+    assert [session["id"] for session in client.get("/users/1/sessions").json()] == [alice["id"]]
+    assert client.get("/users/2/sessions", params={"limit": 10}).json()["items"][0]["episode"] == 1
+    history = client.get(f"/users/1/sessions/{alice['id']}/history").json()["items"]
+    assert [event["action"] for event in history] == ["start", "next"]
+
+    assert client.delete(f"/users/1/sessions/{alice['id']}").status_code == 204
+    assert client.get("/users/1/sessions").json() == []
+
+
+def test_routes_without_user_only_see_the_default_user(client: TestClient, db: Session):
+
+    show = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+    other = client.post(f"/users/5/shows/{show.id}/start").json()
+    own = client.post(f"/shows/{show.id}/start").json()
+    assert own["user_id"] == 0
+
+    assert [session["id"] for session in client.get("/sessions").json()] == [own["id"]]
+    assert [session["id"] for session in client.get("/sessions", params={"limit": 10}).json()["items"]] == [own["id"]]
+    assert [session["id"] for session in client.get("/sessions/continue").json()] == [own["id"]]
+    assert client.get("/sessions", params={"ids": [other["id"]]}).json() == []
+    assert client.get(f"/sessions/{other['id']}").status_code == 404
+    assert client.get(f"/sessions/{other['id']}/history").status_code == 404
+    assert client.post(f"/sessions/{other['id']}/next").status_code == 404
+    assert client.post("/sessions/batch", json=[{"id": other["id"], "action": "next"}]).json()[0]["status_code"] == 404
+    assert client.delete(f"/sessions/{other['id']}").status_code == 404
+    assert client.get(f"/users/5/sessions/{other['id']}").json()["episode"] == 1
+
+    client.post(f"/sessions/{own['id']}/next")
+    history = client.get(f"/sessions/{own['id']}/history").json()["items"]
+    assert [event["action"] for event in history] == ["start", "next"]
+
+
+def test_sharded_store_keeps_sessions_out_of_the_main_database(file_client: TestClient, file_sessionmaker: sessionmaker, tmp_path):
+
+    store = SessionStore(file_sessionmaker, replace(settings, session_shards=4, session_shard_url=f"sqlite:///{tmp_path}/sessions-{{shard}}.db"))
+    store.upgrade()
+
+    with file_sessionmaker() as db:
+        show_id = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3]).id
+
+    def get_user_db_override(user_id: int):
+        db = store.session(user_id)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_user_db] = get_user_db_override
+    users = range(1, 21)
+    for user_id in users:
+        session = file_client.post(f"/users/{user_id}/shows/{show_id}/start").json()
+        response = file_client.post(f"/users/{user_id}/sessions/{session['id']}/next")
+        assert response.status_code == 200
+        assert response.json()["show"]["name"] == "Breaking Bad"
+
+    with file_sessionmaker() as db:
+        assert db.query(models.Session).count() == 0
+    expected = Counter(shard_for(user_id, 4) for user_id in users)
+    for shard, engine in enumerate(store.engines):
+        with sessionmaker(bind=engine)() as db:
+            owners = [session.user_id for session in db.query(models.Session)]
+        assert len(owners) == expected[shard]
+        assert all(shard_for(user_id, 4) == shard for user_id in owners)
+    store.dispose()
+
+
+def test_deleted_session_id_is_not_reused(client: TestClient, db: Session):
+
+    first = _add_show_to_db(db, name="Breaking Bad", description="Walter White es un químico ...", gender="Acción", episodes=[3, 4, 3])
+    second = _add_show_to_db(db, name="Peaky Blinders", description="Ambientada en Birmingham ...", gender="Mafia", episodes=[8, 7])
+    deleted = client.post(f"/users/1/shows/{first.id}/start").json()
+    client.post(f"/users/1/sessions/{deleted['id']}/next")
+    assert client.delete(f"/users/1/sessions/{deleted['id']}").status_code == 204
+
+    started = client.post(f"/users/1/shows/{second.id}/start").json()
+
+    assert started["id"] != deleted["id"]
+    history = client.get(f"/users/1/sessions/{started['id']}/history").json()["items"]
+    assert [(event["action"], event["show_id"]) for event in history] == [("start", second.id)]